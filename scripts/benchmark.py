@@ -0,0 +1,497 @@
+"""Benchmark ascent database operations against synthetic databases.
+
+Usage: python scripts/benchmark.py [--size N] [benchmark ...]
+"""
+
+import argparse
+import datetime
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+from ascents._analyze import analyze_ascent_db
+from ascents._backup import backup_ascent_db
+from ascents._init import (
+    GRADE_RANK_SQL,
+    convert_date_storage,
+    generate_grade_info_data,
+    init_ascent_db,
+)
+from ascents import _models
+from ascents._merge import merge_ascent_dbs
+from ascents._models import TOP_K_GROUPS, Ascent, AscentDB, Route, Search
+from ascents._profiles import PROFILES
+
+GRADES = [grade for grade, _, _ in generate_grade_info_data()]
+FIRST_DATE = datetime.date(2000, 1, 1)
+
+
+def synthetic_rows(
+    size: int,
+    seed: int = 0,
+) -> Iterator[tuple[str, str, str, datetime.date]]:
+    rng = random.Random(seed)
+    crag_count = max(size // 100, 1)
+    days = (datetime.date.today() - FIRST_DATE).days
+
+    for i in range(size):
+        yield (
+            f"Route {i}",
+            rng.choice(GRADES),
+            f"Crag {rng.randrange(crag_count)}",
+            FIRST_DATE + datetime.timedelta(days=rng.randrange(days)),
+        )
+
+
+def make_synthetic_db(database: Path, size: int, seed: int = 0) -> None:
+    init_ascent_db(database)
+
+    connection = sqlite3.connect(database, autocommit=False)
+
+    try:
+        connection.executemany(
+            """
+            INSERT INTO ascents(route, grade, crag, date)
+            VALUES(?, ?, ?, ?)
+            """,
+            synthetic_rows(size, seed),
+        )
+
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def report(name: str, **metrics: object) -> None:
+    print(f"{name}:")
+
+    for metric, value in metrics.items():
+        if isinstance(value, float):
+            value = f"{value * 1000:.2f} ms"
+
+        print(f"  {metric.replace('_', ' ')}: {value}")
+
+
+def bench_backup(workdir: Path, size: int) -> None:
+    database = workdir / "backup-source.db"
+    make_synthetic_db(database, size)
+
+    latencies: list[tuple[float, float]] = []
+    running = threading.Event()
+    running.set()
+
+    def write() -> None:
+        with AscentDB(database) as db:
+            i = 0
+
+            while running.is_set():
+                ascent = Ascent(
+                    Route(f"Concurrent Route {i}", "5.9", "Crag 0"),
+                    datetime.date.today(),
+                )
+
+                start = time.perf_counter()
+                db.log_ascent(ascent)
+                latencies.append((start, time.perf_counter() - start))
+                i += 1
+
+                # Steady stream of writes rather than a tight loop, which
+                # would never let the backup copy a consistent snapshot
+                time.sleep(0.005)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+
+    # Let the writer settle to get its latency without a backup running
+    time.sleep(0.5)
+    backup_start = time.perf_counter()
+    backup_ascent_db(database, workdir / "backup.db")
+    backup_end = time.perf_counter()
+
+    running.clear()
+    writer.join()
+
+    baseline = [latency for start, latency in latencies if start < backup_start]
+    during = [
+        latency
+        for start, latency in latencies
+        if backup_start <= start + latency and start <= backup_end
+    ]
+
+    report(
+        "backup",
+        ascents=size,
+        wall_time=backup_end - backup_start,
+        writer_median_latency_without_backup=statistics.median(baseline),
+        writer_commits_during_backup=len(during),
+        writer_max_stall_during_backup=max(during, default=0.0),
+    )
+
+
+def bench_profiles(workdir: Path, size: int) -> None:
+    database = workdir / "profiles.db"
+    make_synthetic_db(database, size)
+
+    for name in PROFILES:
+        db = AscentDB(database, profile=name)
+        log_count = 200
+
+        with db:
+            start = time.perf_counter()
+
+            for i in range(log_count):
+                route = Route(f"{name} Route {i}", "5.9", "Crag 0")
+                db.log_ascent(Ascent(route, datetime.date.today()))
+
+            log_time = (time.perf_counter() - start) / log_count
+
+        # Warm up the OS page cache so every profile starts from the same
+        # state, then time a fresh connection
+        analyze_ascent_db(db)
+        start = time.perf_counter()
+        analyze_ascent_db(db)
+        analyze_time = time.perf_counter() - start
+
+        report(
+            f"profile {name}",
+            ascents=size,
+            log_ascent=log_time,
+            analyze=analyze_time,
+        )
+
+
+def bench_date_storage(workdir: Path, size: int) -> None:
+    text_database = workdir / "text-dates.db"
+    julian_database = workdir / "julian-dates.db"
+
+    make_synthetic_db(text_database, size)
+    shutil.copy(text_database, julian_database)
+
+    start = time.perf_counter()
+    convert_date_storage(julian_database, "julian")
+    report("convert to julian", ascents=size, time=time.perf_counter() - start)
+
+    operations: dict[str, Callable[[AscentDB], object]] = {
+        "scan": lambda db: db.ascents(),
+        "stream dates": lambda db: list(db.dated_grades()),
+        "latest date": lambda db: db.latest_date(),
+        "year counts": lambda db: db.year_counts(),
+        "month counts": lambda db: db.counts_by("month"),
+    }
+
+    for database in (text_database, julian_database):
+        timings = {}
+
+        with AscentDB(database) as db:
+            for name, operation in operations.items():
+                operation(db)
+                start = time.perf_counter()
+                operation(db)
+                timings[name.replace(" ", "_")] = time.perf_counter() - start
+
+        report(f"dates in {database.stem}", ascents=size, **timings)
+
+
+def bench_merge(workdir: Path, size: int) -> None:
+    laptop_database = workdir / "laptop.db"
+    phone_database = workdir / "phone.db"
+
+    make_synthetic_db(laptop_database, size)
+    shutil.copy(laptop_database, phone_database)
+
+    # A typical sync: a few new ascents on each side and one changed date
+    with AscentDB(laptop_database) as db:
+        for i in range(5):
+            db.log_ascent(
+                Ascent(Route(f"Laptop Route {i}", "5.9", "Crag 1"), FIRST_DATE)
+            )
+
+    with AscentDB(phone_database) as db:
+        for i in range(5):
+            db.log_ascent(
+                Ascent(Route(f"Phone Route {i}", "5.9", "Crag 2"), FIRST_DATE)
+            )
+
+        db.update_where(Search(route="Route 0"), date=FIRST_DATE)
+
+    start = time.perf_counter()
+    merge_report = merge_ascent_dbs(laptop_database, phone_database)
+    merge_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    merge_ascent_dbs(laptop_database, phone_database)
+    noop_time = time.perf_counter() - start
+
+    report(
+        "merge",
+        ascents=size,
+        crags_compared=f"{merge_report.differing_buckets} of {merge_report.buckets}",
+        merge=merge_time,
+        merge_when_in_sync=noop_time,
+    )
+
+
+def bench_top_k(workdir: Path, size: int) -> None:
+    database = workdir / "top-k.db"
+    make_synthetic_db(database, size)
+
+    k = 10
+    rank = GRADE_RANK_SQL.format("grade")
+
+    with AscentDB(database) as db:
+        for by, group in TOP_K_GROUPS.items():
+            start = time.perf_counter()
+            top = db.top_k(k, by)
+            top_k_time = time.perf_counter() - start
+
+            # Ranking every ascent, for comparison
+            start = time.perf_counter()
+            db._cursor.execute(
+                f"""
+                SELECT *
+                FROM (
+                    SELECT route, row_number() OVER (
+                        PARTITION BY {group} ORDER BY {rank} DESC, date DESC
+                    ) AS row_number
+                    FROM ascents
+                )
+                WHERE row_number <= ?
+                """,
+                (k,),
+            ).fetchall()
+            window_time = time.perf_counter() - start
+
+            report(
+                f"top {k} by {by}",
+                ascents=size,
+                groups=len(top),
+                top_k=top_k_time,
+                window_over_all_ascents=window_time,
+            )
+
+
+# Grade queries as they were written before grade functions were added,
+# ranking grades by joining grade_info
+JOIN_QUERIES = {
+    "max grade": """
+        SELECT ascents.grade
+        FROM ascents
+        LEFT JOIN grade_info USING(grade)
+        ORDER BY grade_info.grade_number DESC, grade_info.grade_letter DESC
+        LIMIT 1
+    """,
+    "max grade by year": """
+        WITH year_and_grade AS (
+            SELECT CAST(strftime('%Y', date) AS INTEGER) AS year, grade
+            FROM ascents
+        ),
+        grade_sorted_within_year AS (
+            SELECT yg.year, yg.grade, row_number() OVER win AS row_number
+            FROM year_and_grade AS yg
+            LEFT JOIN grade_info AS g USING(grade)
+            WINDOW win AS (
+                PARTITION BY yg.year
+                ORDER BY g.grade_number DESC, g.grade_letter DESC
+            )
+        )
+        SELECT year, grade
+        FROM grade_sorted_within_year
+        WHERE row_number = 1
+        ORDER BY year
+    """,
+    "max grade by month": """
+        WITH bucket_and_grade AS (
+            SELECT date(date, 'start of month') AS bucket, grade
+            FROM ascents
+        ),
+        grade_sorted_within_bucket AS (
+            SELECT bg.bucket, bg.grade, row_number() OVER win AS row_number
+            FROM bucket_and_grade AS bg
+            LEFT JOIN grade_info AS g USING(grade)
+            WINDOW win AS (
+                PARTITION BY bg.bucket
+                ORDER BY g.grade_number DESC, g.grade_letter DESC
+            )
+        )
+        SELECT bucket, grade
+        FROM grade_sorted_within_bucket
+        WHERE row_number = 1
+        ORDER BY bucket
+    """,
+    "grade counts": """
+        SELECT grade_counts.grade, grade_counts.count
+        FROM (
+            SELECT grade, count(*) AS count
+            FROM ascents
+            GROUP BY grade
+        ) AS grade_counts
+        LEFT JOIN grade_info USING(grade)
+        ORDER BY grade_info.grade_number, grade_info.grade_letter
+    """,
+    "order by grade": """
+        SELECT a.route
+        FROM ascents AS a
+        LEFT JOIN grade_info AS g USING(grade)
+        ORDER BY g.grade_number DESC, g.grade_letter DESC, a.date DESC
+    """,
+}
+
+
+def bench_grades(workdir: Path, size: int) -> None:
+    database = workdir / "grades.db"
+    make_synthetic_db(database, size)
+
+    operations: dict[str, Callable[[AscentDB], object]] = {
+        "max grade": lambda db: db.max_grade(),
+        "max grade by year": lambda db: db.max_grade_by_year(),
+        "max grade by month": lambda db: db.max_grade_by("month"),
+        "grade counts": lambda db: db.grade_counts(),
+        # Same query as ascents(order="grade"), without making Ascent objects
+        "order by grade": lambda db: db._cursor.execute(
+            f"""
+            SELECT a.route
+            FROM ascents AS a
+            ORDER BY {GRADE_RANK_SQL.format("a.grade")} DESC, a.date DESC
+            """
+        ).fetchall(),
+    }
+
+    def timed(operation: Callable[[], object]) -> float:
+        operation()
+        start = time.perf_counter()
+        operation()
+        return time.perf_counter() - start
+
+    with AscentDB(database) as db:
+        for name, operation in operations.items():
+            query = JOIN_QUERIES[name]
+
+            report(
+                name,
+                ascents=size,
+                grade_functions=timed(lambda: operation(db)),
+                join=timed(lambda: db._cursor.execute(query).fetchall()),
+            )
+
+
+# Number of searches made on one connection by the searches benchmark
+SEARCH_COUNT = 100_000
+
+
+def small_searches(size: int, count: int, seed: int = 0) -> Iterator[Search]:
+    # A mix of the kinds of search typed into the search prompt, each
+    # finding a handful of ascents, with lists of varying lengths
+    rng = random.Random(seed)
+    crag_count = max(size // 100, 1)
+    days = (datetime.date.today() - FIRST_DATE).days
+
+    def crag() -> str:
+        return f"Crag {rng.randrange(crag_count)}"
+
+    def date() -> datetime.date:
+        return FIRST_DATE + datetime.timedelta(days=rng.randrange(days))
+
+    for _ in range(count):
+        match rng.randrange(5):
+            case 0:
+                yield Search(route=f"Route {rng.randrange(size)}")
+            case 1:
+                yield Search(crag=crag(), grade=rng.sample(GRADES, rng.randint(1, 5)))
+            case 2:
+                yield Search(date=date())
+            case 3:
+                yield Search(crag=crag(), date=[date() for _ in range(3)])
+            case _:
+                yield Search(route=f"Route {rng.randrange(size // 10)}?", glob=True)
+
+
+def bench_searches(workdir: Path, size: int) -> None:
+    database = workdir / "searches.db"
+    make_synthetic_db(database, size)
+
+    searches = list(small_searches(size, SEARCH_COUNT))
+
+    with AscentDB(database) as db:
+        # Warm up the page cache and the compiled statements
+        for search in searches[:1000]:
+            db.ascents(search)
+
+        start = time.perf_counter()
+        found = sum(len(db.ascents(search)) for search in searches)
+        elapsed = time.perf_counter() - start
+
+        # Compiling each search from scratch, as if nothing were cached
+        shapes = [db._compile_search(search)[0] for search in searches]
+        compile_query = _models.compile_ascents_query.__wrapped__
+
+        start = time.perf_counter()
+
+        for shape in shapes:
+            compile_query(*shape, "date")
+
+        uncached_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+
+        for shape in shapes:
+            _models.compile_ascents_query(*shape, "date")
+
+        cached_time = time.perf_counter() - start
+
+    report(
+        f"{SEARCH_COUNT} small searches",
+        ascents=size,
+        found=found,
+        shapes=len(set(shapes)),
+        throughput=f"{SEARCH_COUNT / elapsed:.0f} searches/s",
+        compile_uncached=f"{uncached_time / SEARCH_COUNT * 1e6:.2f} us per search",
+        compile_cached=f"{cached_time / SEARCH_COUNT * 1e6:.2f} us per search",
+    )
+
+
+BENCHMARKS: dict[str, Callable[[Path, int], None]] = {
+    "backup": bench_backup,
+    "profiles": bench_profiles,
+    "date-storage": bench_date_storage,
+    "merge": bench_merge,
+    "top-k": bench_top_k,
+    "grades": bench_grades,
+    "searches": bench_searches,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "benchmarks",
+        nargs="*",
+        help=f"Benchmarks to run out of {', '.join(BENCHMARKS)} (default: all)",
+    )
+
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=100_000,
+        help="Number of ascents in synthetic databases",
+    )
+
+    args = parser.parse_args()
+
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark '{name}'")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.benchmarks or BENCHMARKS:
+            BENCHMARKS[name](Path(workdir), args.size)
+
+
+if __name__ == "__main__":
+    main()
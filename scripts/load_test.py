@@ -0,0 +1,314 @@
+"""Load test an ascent database with concurrent users doing a mix of
+operations.
+
+Usage: python scripts/load_test.py [--size N] [--workers N] [--processes]
+    [--duration SECONDS] [--mix OP=WEIGHT,...] [--json]
+"""
+
+import argparse
+import datetime
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from benchmark import FIRST_DATE, GRADES, make_synthetic_db, report
+
+from ascents._analyze import collect_analysis
+from ascents._metrics import is_lock_error
+from ascents._models import Ascent, AscentDB, AscentDBError, Route, Search
+
+OPERATIONS = ("log", "drop", "search", "analyze")
+
+# Mostly reads, as on a typical day
+DEFAULT_MIX = "log=10,drop=5,search=80,analyze=5"
+
+# Existing ascents handed to each worker to drop
+DROP_POOL_SIZE = 1000
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    weights = {}
+
+    for item in mix.split(","):
+        operation, _, weight = item.partition("=")
+
+        if operation not in OPERATIONS or not weight.isdigit():
+            raise ValueError(f"invalid item '{item}' in operation mix")
+
+        weights[operation] = int(weight)
+
+    if not any(weights.values()):
+        raise ValueError("operation mix must have a positive weight")
+
+    return weights
+
+
+@dataclass
+class WorkerResult:
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    lock_errors: dict[str, int] = field(default_factory=dict)
+    errors: dict[str, int] = field(default_factory=dict)
+
+
+def random_search(rng: random.Random, size: int) -> Search:
+    # Small searches as typed into the search prompt
+    match rng.randrange(4):
+        case 0:
+            return Search(crag=f"Crag {rng.randrange(max(size // 100, 1))}")
+        case 1:
+            return Search(route=f"Route {rng.randrange(size)}*", glob=True)
+        case 2:
+            return Search(grade=rng.choice(GRADES))
+        case _:
+            year = rng.randrange(FIRST_DATE.year, datetime.date.today().year + 1)
+            return Search(date=f"{year}-0{rng.randrange(1, 10)}-*", glob=True)
+
+
+def run_worker(
+    database: Path,
+    worker: int,
+    workers: int,
+    size: int,
+    weights: dict[str, int],
+    duration: float,
+    seed: int,
+) -> WorkerResult:
+    rng = random.Random(seed + worker)
+    result = WorkerResult()
+    logged = 0
+
+    with AscentDB(database) as db:
+        # Each worker drops its own share of ascents so that drops never
+        # collide, along with whatever it logs itself
+        db._cursor.execute(
+            """
+            SELECT route, grade, crag
+            FROM ascents
+            WHERE rowid % ? = ?
+            LIMIT ?
+            """,
+            (workers, worker, DROP_POOL_SIZE),
+        )
+        pool = [Route(*row) for row in db._cursor.fetchall()]
+        db.release()
+
+        def log() -> None:
+            nonlocal logged
+            name = f"Worker {worker} Route {logged}"
+            route = Route(name, rng.choice(GRADES), "Crag 0")
+            db.log_ascent(Ascent(route, datetime.date.today()))
+            pool.append(route)
+            logged += 1
+
+        def drop() -> None:
+            if pool:
+                db.drop_ascent(pool.pop())
+
+        operations: dict[str, Callable[[], object]] = {
+            "log": log,
+            "drop": drop,
+            "search": lambda: db.ascents(random_search(rng, size)),
+            "analyze": lambda: collect_analysis(db),
+        }
+
+        names = list(weights)
+        name_weights = list(weights.values())
+        deadline = time.perf_counter() + duration
+
+        while time.perf_counter() < deadline:
+            (name,) = rng.choices(names, name_weights)
+            start = time.perf_counter()
+
+            try:
+                operations[name]()
+            except sqlite3.OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+
+                result.lock_errors[name] = result.lock_errors.get(name, 0) + 1
+                db._connection.rollback()
+                continue
+            except AscentDBError:
+                result.errors[name] = result.errors.get(name, 0) + 1
+                continue
+            finally:
+                # As the shell does between commands, so that readers do not
+                # hold up writers while idle
+                db.release()
+
+            result.latencies.setdefault(name, []).append(time.perf_counter() - start)
+
+    return result
+
+
+def percentiles(latencies: list[float]) -> dict[str, float]:
+    if len(latencies) < 2:
+        latency = latencies[0] if latencies else 0.0
+        return {"p50": latency, "p95": latency, "p99": latency}
+
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+def summarize(
+    results: list[WorkerResult],
+    elapsed: float,
+    weights: dict[str, int],
+) -> dict[str, Any]:
+    operations = {}
+
+    for name in weights:
+        latencies = [
+            latency for result in results for latency in result.latencies.get(name, [])
+        ]
+
+        operations[name] = {
+            "count": len(latencies),
+            "throughput": len(latencies) / elapsed,
+            **percentiles(latencies),
+            "lock_errors": sum(result.lock_errors.get(name, 0) for result in results),
+            "errors": sum(result.errors.get(name, 0) for result in results),
+        }
+
+    total = sum(operation["count"] for operation in operations.values())
+
+    return {
+        "elapsed": elapsed,
+        "throughput": total / elapsed,
+        "operations": operations,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=10_000,
+        help="Number of ascents in the synthetic database",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of concurrent users",
+    )
+
+    parser.add_argument(
+        "--processes",
+        action="store_true",
+        help="Run users as processes rather than threads",
+    )
+
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=5,
+        help="Seconds to run for",
+    )
+
+    parser.add_argument(
+        "--mix",
+        default=DEFAULT_MIX,
+        help=f"Weights of {', '.join(OPERATIONS)} (default: {DEFAULT_MIX})",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed of the synthetic database and the users' choices",
+    )
+
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print results as JSON, e.g. to compare runs in CI",
+    )
+
+    args = parser.parse_args()
+
+    try:
+        weights = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = Path(workdir) / "load-test.db"
+        make_synthetic_db(database, args.size, args.seed)
+
+        executor: Executor
+
+        if args.processes:
+            executor = ProcessPoolExecutor(args.workers)
+        else:
+            executor = ThreadPoolExecutor(args.workers)
+
+        start = time.perf_counter()
+
+        with executor:
+            futures = [
+                executor.submit(
+                    run_worker,
+                    database,
+                    worker,
+                    args.workers,
+                    args.size,
+                    weights,
+                    args.duration,
+                    args.seed,
+                )
+                for worker in range(args.workers)
+            ]
+
+            results = [future.result() for future in futures]
+
+        elapsed = time.perf_counter() - start
+
+    summary = summarize(results, elapsed, weights)
+
+    if args.json:
+        config = {
+            "size": args.size,
+            "workers": args.workers,
+            "processes": args.processes,
+            "duration": args.duration,
+            "mix": weights,
+        }
+        print(json.dumps({"config": config, **summary}, indent=2))
+        return
+
+    kind = "processes" if args.processes else "threads"
+    report(
+        f"{args.workers} {kind}",
+        ascents=args.size,
+        elapsed=f"{elapsed:.2f} s",
+        throughput=f"{summary['throughput']:.1f} ops/s",
+    )
+
+    for name, operation in summary["operations"].items():
+        report(
+            name,
+            count=operation["count"],
+            throughput=f"{operation['throughput']:.1f} ops/s",
+            p50=operation["p50"],
+            p95=operation["p95"],
+            p99=operation["p99"],
+            lock_errors=operation["lock_errors"],
+            errors=operation["errors"],
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,36 @@
 import argparse
+import cmd
 import datetime
+import json
 import sys
 from collections.abc import Callable
 from importlib.metadata import version
 from pathlib import Path
 
-from ascents._analyze import analyze_ascent_db
-from ascents._init import init_ascent_db, DatabaseAlreadyExistsError
+from ascents._analyze import (
+    analyze_ascent_db,
+    ascent_to_dict,
+    collect_analysis,
+    watch_analysis,
+    FORMATS,
+)
+from ascents._archive import archive_ascent_db, ARCHIVE_PERIODS, ArchiveError
+from ascents._backup import backup_ascent_db, BackupError
+from ascents._init import (
+    init_ascent_db,
+    convert_date_storage,
+    consolidate_ascent_dbs,
+    compact_change_log,
+    DATE_STORAGES,
+    DatabaseAlreadyExistsError,
+    InvalidDateStorageError,
+    ConsolidateError,
+    ChangeLogError,
+)
+from ascents._index import NameIndex
+from ascents._metrics import METRICS
+from ascents._merge import merge_ascent_dbs, MERGE_POLICIES, MergeError
+from ascents._migrate import migrate_ascent_db, DEFAULT_BATCH_SIZE, MigrateError
 from ascents._models import (
     Route,
     RouteError,
@@ -16,8 +40,18 @@ from ascents._models import (
     AscentDBError,
     Search,
 )
+from ascents._optimize import optimize_ascent_db, OptimizeError
+from ascents._profiles import ProfileError
 from ascents._utils import make_ascents_table
 
+try:
+    import readline
+except ImportError:
+    # Not available on Windows, where names are then simply not completed
+    readline = None  # type: ignore[assignment]
+
+TOP_BY = {"overall": None, "crag": "crag", "year": "year"}
+
 
 def get_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
@@ -30,26 +64,203 @@ def get_args() -> argparse.Namespace:
     )
 
     parser.add_argument(
-        "command",
-        choices=COMMANDS.keys(),
+        "--metrics-file",
+        type=Path,
+        help="Record metrics of database operations and write them to this "
+        "file in the Prometheus text format",
+    )
+
+    subparsers = parser.add_subparsers(
+        dest="command",
+        required=True,
         help="Action to take",
     )
 
-    parser.add_argument(
-        "database",
+    commands = {name: subparsers.add_parser(name) for name in COMMANDS}
+
+    for command in commands.values():
+        command.add_argument(
+            "database",
+            type=Path,
+            help="Database to work on",
+        )
+
+    commands["init"].add_argument(
+        "--date-storage",
+        choices=DATE_STORAGES,
+        default="text",
+        help="Store dates as ISO text or as integer Julian day numbers",
+    )
+
+    # No default, so that a database is never converted back by accident
+    commands["convert"].add_argument(
+        "--date-storage",
+        choices=DATE_STORAGES,
+        required=True,
+        help="Date storage to convert to, ISO text or integer Julian day numbers",
+    )
+
+    commands["init"].add_argument(
+        "--climbers",
+        action="store_true",
+        help="Initialize a database shared by multiple climbers",
+    )
+
+    for name in (
+        "log",
+        "drop",
+        "analyze",
+        "search",
+        "drop-where",
+        "update-where",
+        "dedupe",
+        "changes",
+        "shell",
+    ):
+        commands[name].add_argument(
+            "--climber",
+            help="Climber to work on in a multi-climber database",
+        )
+
+    commands["consolidate"].add_argument(
+        "sources",
+        type=Path,
+        nargs="+",
+        help="Databases to copy in, one per climber named after the file",
+    )
+
+    commands["changes"].add_argument(
+        "--since",
+        type=int,
+        default=0,
+        help="Sequence number of the last change already synced",
+    )
+
+    commands["merge"].add_argument(
+        "other",
+        type=Path,
+        help="Database to merge with, both end up with the same ascents",
+    )
+
+    commands["merge"].add_argument(
+        "--policy",
+        choices=MERGE_POLICIES,
+        default="earliest",
+        help="Date to keep for ascents logged in both with different dates",
+    )
+
+    commands["analyze"].add_argument(
+        "--format",
+        dest="output_format",
+        choices=FORMATS,
+        default="text",
+        help="Output format of the analysis",
+    )
+
+    commands["analyze"].add_argument(
+        "--top-k",
+        type=int,
+        help="Add sections with the hardest K ascents",
+    )
+
+    commands["analyze"].add_argument(
+        "--top-by",
+        action="append",
+        choices=TOP_BY,
+        help="Group the hardest ascents overall, by crag or by year "
+        "(repeatable, default: overall)",
+    )
+
+    commands["analyze"].add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running, printing the sections that change after each write",
+    )
+
+    commands["analyze"].add_argument(
+        "--interval",
+        type=float,
+        default=2,
+        help="Seconds between checks for writes when watching (default: 2)",
+    )
+
+    for name in ("analyze", "search"):
+        commands[name].add_argument(
+            "--read-only",
+            action="store_true",
+            help="Open the database as an immutable snapshot, without locking",
+        )
+
+    commands["migrate"].add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Number of existing ascents to rewrite per transaction "
+        f"(default: {DEFAULT_BATCH_SIZE})",
+    )
+
+    commands["archive"].add_argument(
+        "--before",
+        type=datetime.date.fromisoformat,
+        required=True,
+        help="Move ascents dated before this date (YYYY-MM-DD) into archives",
+    )
+
+    commands["archive"].add_argument(
+        "--period",
+        choices=ARCHIVE_PERIODS,
+        default="decade",
+        help="Years of ascents per archive database (default: decade)",
+    )
+
+    commands["backup"].add_argument(
+        "dest",
         type=Path,
-        help="Database to work on",
+        help="File to back up to, or directory of backups if --keep is given",
+    )
+
+    commands["backup"].add_argument(
+        "--keep",
+        type=int,
+        help="Number of timestamped backups to keep in dest",
+    )
+
+    commands["optimize"].add_argument(
+        "--vacuum",
+        action="store_true",
+        help="Rewrite the whole database rather than vacuum incrementally",
+    )
+
+    commands["optimize"].add_argument(
+        "--page-size",
+        type=int,
+        help="Page size to rewrite the database with (implies --vacuum)",
     )
 
     args = parser.parse_args()
 
+    if args.command == "analyze" and args.watch:
+        if args.output_format != "text":
+            parser.error("only the text format can be watched")
+
+        # An immutable snapshot is never notified of writes
+        if args.read_only:
+            parser.error("cannot watch a database opened with --read-only")
+
     return args
 
 
-def get_route() -> Route:
-    name = input("Enter the name of the route: ")
-    grade = input("Enter the grade of the route: ")
-    crag = input("Enter the name of the crag where the route is located: ")
+def ask_user(prompt: str, kind: str | None = None) -> str:
+    """Ask the user for input. The kind of name asked for (route or crag),
+    if any, lets the shell complete it.
+    """
+    return input(prompt)
+
+
+def get_route(ask: Callable[[str, str | None], str] = ask_user) -> Route:
+    name = ask("Enter the name of the route: ", "route")
+    grade = ask("Enter the grade of the route: ", None)
+    crag = ask("Enter the name of the crag where the route is located: ", "crag")
 
     return Route(name, grade, crag)
 
@@ -80,19 +291,42 @@ class InvalidDateError(Exception):
     """Raise if invalid date is passed."""
 
 
-def get_ascent() -> Ascent:
-    route = get_route()
+def get_ascent(ask: Callable[[str, str | None], str] = ask_user) -> Ascent:
+    route = get_route(ask)
     date = get_date()
 
     return Ascent(route, date)
 
 
-def init(database: Path) -> None:
+def init(
+    database: Path,
+    date_storage: str = "text",
+    climbers: bool = False,
+) -> None:
     print(f"Initializing ascent database: {database}")
-    init_ascent_db(database)
+    init_ascent_db(database, date_storage, climbers)
     print("Successfully initialized database")
 
 
+def convert(database: Path, date_storage: str) -> None:
+    print(f"Converting dates in {database} to {date_storage} storage")
+
+    if convert_date_storage(database, date_storage):
+        print("Successfully converted database")
+    else:
+        print(f"Dates are already stored as {date_storage}, nothing to do")
+
+
+def consolidate(database: Path, sources: list[Path]) -> None:
+    print(f"Consolidating {len(sources)} database(s) into {database}")
+    counts = consolidate_ascent_dbs(database, sources)
+
+    for climber, count in counts.items():
+        print(f"{climber}: {count} ascent(s)")
+
+    print("Successfully consolidated databases")
+
+
 def confirm(prompt: str) -> None:
     resp = input(prompt + " (y/n)? ")
 
@@ -106,17 +340,25 @@ def confirm(prompt: str) -> None:
         resp = input("Oops! Valid inputs are 'y' or 'n'. Please try again: ")
 
 
-def log(database: Path) -> None:
-    db = AscentDB(database)
+def warn_unknown_crag(crag: str, similar_crags: list[str]) -> None:
+    print(f"Warning: '{crag}' is not a known crag")
+
+    if similar_crags:
+        print("Did you mean:", "\n".join(similar_crags), sep="\n")
+
+    confirm("Continue logging the above ascent")
+
+
+def log(database: Path, climber: str | None = None) -> None:
+    db = AscentDB(database, climber=climber)
     ascent = get_ascent()
 
     with db:
-        known_crags = db.crags()
+        crag_known = db.is_empty() or db.crag_exists(ascent.route.crag)
+        similar_crags = [] if crag_known else db.similar_crags(ascent.route.crag)
 
-    if known_crags and ascent.route.crag not in known_crags:
-        print(f"Warning: '{ascent.route.crag}' is not a known crag")
-        print("Known crags currently include:", "\n".join(known_crags), sep="\n")
-        confirm("Continue logging the above ascent")
+    if not crag_known:
+        warn_unknown_crag(ascent.route.crag, similar_crags)
 
     print(f"Ascent to be logged: {ascent}")
     confirm(f"Log the above ascent in {db.name}")
@@ -127,8 +369,8 @@ def log(database: Path) -> None:
     print("Successfully logged the above ascent")
 
 
-def drop(database: Path) -> None:
-    db = AscentDB(database)
+def drop(database: Path, climber: str | None = None) -> None:
+    db = AscentDB(database, climber=climber)
     route = get_route()
 
     with db:
@@ -143,38 +385,135 @@ def drop(database: Path) -> None:
     print("Successfully dropped the above ascent")
 
 
-def analyze(database: Path) -> None:
-    db = AscentDB(database)
-    analysis = analyze_ascent_db(db)
-    print(analysis)
+def analyze(
+    database: Path,
+    output_format: str = "text",
+    read_only: bool = False,
+    climber: str | None = None,
+    top_k: int | None = None,
+    top_by: list[str] | None = None,
+    watch: bool = False,
+    interval: float = 2,
+) -> None:
+    db = AscentDB(database, read_only=read_only, climber=climber)
+    groups = [TOP_BY[name] for name in top_by or ["overall"]]
 
+    if watch:
+        watch_analyze(db, interval, top_k, groups)
+        return
 
-def search(database: Path) -> None:
-    db = AscentDB(database)
+    analysis = analyze_ascent_db(db, top_k, groups)
+    FORMATS[output_format](analysis, sys.stdout)
 
-    print(f"Searching {db.name}")
+
+# ANSI escape sequences for redrawing the terminal in place
+CLEAR_SCREEN = "\x1b[H\x1b[2J"
+CLEAR_LINE = "\x1b[K"
+CLEAR_BELOW = "\x1b[J"
+
+
+def move_to(row: int) -> str:
+    return f"\x1b[{row};1H"
+
+
+def redraw_sections(screen: list[str], changed: dict[int, str]) -> str:
+    """Update screen, the sections on the terminal, with those changed and
+    return the output that redraws them in place.
+
+    The header is rewritten line by line, and everything else from the
+    first changed section down, as later sections may have moved.
+    """
+    if not screen:
+        screen.extend(section for _, section in sorted(changed.items()))
+        return CLEAR_SCREEN + "\n\n".join(screen) + "\n"
+
+    header_height = screen[0].count("\n")
+
+    for i, section in changed.items():
+        if i < len(screen):
+            screen[i] = section
+        else:
+            screen.append(section)
+
+    # Rows where each section starts, one blank line apart
+    rows = [1]
+
+    for section in screen:
+        rows.append(rows[-1] + section.count("\n") + 2)
+
+    output = ""
+    start = min(changed)
+
+    if start == 0 and screen[0].count("\n") == header_height:
+        lines = screen[0].split("\n")
+        output += move_to(1) + "\n".join(line + CLEAR_LINE for line in lines)
+        start = min([i for i in changed if i], default=len(screen))
+
+    if start < len(screen):
+        output += move_to(rows[start]) + CLEAR_BELOW
+        output += "\n\n".join(screen[start:]) + "\n"
+
+    # Leave the cursor below the last section
+    return output + move_to(rows[-1] - 1)
+
+
+def watch_analyze(
+    db: AscentDB,
+    interval: float,
+    top_k: int | None,
+    groups: list[str | None],
+) -> None:
+    screen: list[str] = []
+
+    try:
+        for changed in watch_analysis(db, interval, top_k, groups):
+            # Output that is not shown on a terminal, e.g. piped to a log,
+            # gets the changed sections appended instead
+            if not sys.stdout.isatty():
+                if screen:
+                    print()
+
+                screen = list(changed.values())
+                print("\n\n".join(screen), flush=True)
+                continue
+
+            print(redraw_sections(screen, changed), end="", flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+def input_or_none(
+    prompt: str,
+    ask: Callable[[str, str | None], str] = ask_user,
+    kind: str | None = None,
+) -> str | None:
+    resp = ask(f"{prompt}: ", kind)
+    return resp if resp else None
+
+
+def get_search(ask: Callable[[str, str | None], str] = ask_user) -> Search:
     print("Case-sensitive matching, globbing allowed")
     print("Empty field matches everything")
 
-    def input_or_none(prompt: str) -> str | None:
-        resp = input(f"{prompt}: ")
-        return resp if resp else None
-
     search = Search(
-        route=input_or_none("route"),
-        grade=input_or_none("grade"),
-        crag=input_or_none("crag"),
-        date=input_or_none("date"),
+        route=input_or_none("route", ask, "route"),
+        grade=input_or_none("grade", ask),
+        crag=input_or_none("crag", ask, "crag"),
+        date=input_or_none("date", ask),
         glob=True,
     )
 
+    return search
+
+
+def get_order() -> str:
     default = "date"
     order = input(f"Order by 'date' or 'grade' ({default=})? ")
-    order = order if order else default
 
-    with db:
-        ascents = db.ascents(search, order)
+    return order if order else default
+
 
+def print_results(ascents: list[Ascent]) -> None:
     print("Result(s):")
 
     if ascents:
@@ -183,32 +522,399 @@ def search(database: Path) -> None:
         print("No ascents found")
 
 
-COMMANDS: dict[str, Callable[[Path], None]] = {
+def search(
+    database: Path,
+    read_only: bool = False,
+    climber: str | None = None,
+) -> None:
+    db = AscentDB(database, read_only=read_only, climber=climber)
+
+    print(f"Searching {db.name}")
+    search = get_search()
+    order = get_order()
+
+    with db:
+        ascents = db.ascents(search, order)
+
+    print_results(ascents)
+
+
+def drop_where(database: Path, climber: str | None = None) -> None:
+    db = AscentDB(database, climber=climber)
+
+    print(f"Selecting ascents to drop from {db.name}")
+    search = get_search()
+
+    with db:
+        count = db.drop_where(search, dry_run=True)
+
+    if not count:
+        print("No ascents found")
+        return
+
+    confirm(f"Drop {count} ascent(s) from {db.name}")
+
+    with db:
+        count = db.drop_where(search)
+
+    print(f"Successfully dropped {count} ascent(s)")
+
+
+def update_where(database: Path, climber: str | None = None) -> None:
+    db = AscentDB(database, climber=climber)
+
+    print(f"Selecting ascents to update in {db.name}")
+    search = get_search()
+
+    print("Enter new values")
+    print("Empty field leaves the value unchanged")
+
+    route = input_or_none("route")
+    grade = input_or_none("grade")
+    crag = input_or_none("crag")
+    date_in = input_or_none("date")
+
+    try:
+        date = None if date_in is None else datetime.date.fromisoformat(date_in)
+    except ValueError as e:
+        raise InvalidDateError(e) from e
+
+    with db:
+        count = db.update_where(
+            search, route=route, grade=grade, crag=crag, date=date, dry_run=True
+        )
+
+    if not count:
+        print("No ascents found")
+        return
+
+    confirm(f"Update {count} ascent(s) in {db.name}")
+
+    with db:
+        count = db.update_where(search, route=route, grade=grade, crag=crag, date=date)
+
+    print(f"Successfully updated {count} ascent(s)")
+
+
+def dedupe(database: Path, climber: str | None = None) -> None:
+    db = AscentDB(database, climber=climber)
+
+    with db:
+        duplicates = db.duplicates()
+
+    print(f"Possible duplicate ascents in {db.name}:")
+
+    if not duplicates:
+        print("No possible duplicates found")
+
+    for cluster in duplicates:
+        print()
+        print(make_ascents_table(cluster))
+
+
+def changes(database: Path, since: int = 0, climber: str | None = None) -> None:
+    # One JSON object per line, so that consumers can stream the output
+    with AscentDB(database, climber=climber) as db:
+        for change in db.changes_since(since):
+            record = {"seq": change.seq, "op": change.op}
+
+            if change.climber is not None:
+                record["climber"] = change.climber
+
+            record |= ascent_to_dict(change.ascent)
+
+            print(json.dumps(record))
+
+
+def compact(database: Path) -> None:
+    print(f"Compacting the change log of {database}")
+    dropped, kept = compact_change_log(database)
+    print(f"Successfully dropped {dropped} change(s), {kept} change(s) left")
+
+
+def merge(database: Path, other: Path, policy: str = "earliest") -> None:
+    print(f"Merging {database} and {other}")
+    report = merge_ascent_dbs(database, other, policy)
+
+    print(f"crags compared: {report.differing_buckets} of {report.buckets}")
+    print(f"ascents copied to {database.name}: {report.copied_to_a}")
+    print(f"ascents copied to {other.name}: {report.copied_to_b}")
+    print(f"conflicting dates resolved: {report.conflicts}")
+    print("Successfully merged databases")
+
+
+def migrate(database: Path, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+    print(f"Migrating {database}")
+    migrations = migrate_ascent_db(database, batch_size)
+
+    if not migrations:
+        print("Schema is up to date, nothing to do")
+        return
+
+    for migration in migrations:
+        print(f"{migration.version}: {migration.description}")
+
+    print(f"Successfully migrated database to version {migrations[-1].version}")
+
+
+def archive(
+    database: Path,
+    before: datetime.date,
+    period: str = "decade",
+) -> None:
+    print(f"Archiving ascents in {database} from before {before}")
+    counts = archive_ascent_db(database, before, period)
+
+    if not counts:
+        print("No ascents to archive")
+        return
+
+    for name, count in counts.items():
+        print(f"{name}: {count} ascent(s)")
+
+    print(f"Successfully archived {sum(counts.values())} ascent(s)")
+
+
+def backup(database: Path, dest: Path, keep: int | None = None) -> None:
+    print(f"Backing up {database} to {dest}")
+    backup_path = backup_ascent_db(database, dest, keep=keep)
+    print(f"Successfully backed up database to {backup_path}")
+
+
+def optimize(
+    database: Path,
+    vacuum: bool = False,
+    page_size: int | None = None,
+) -> None:
+    print(f"Optimizing {database}")
+    report = optimize_ascent_db(database, vacuum=vacuum, page_size=page_size)
+
+    for step, seconds in report.timings:
+        print(f"{step}: {seconds * 1000:.2f} ms")
+
+    before, after = report.before, report.after
+
+    print(f"size: {before.size} -> {after.size} bytes")
+    print(f"page size: {before.page_size} -> {after.page_size} bytes")
+    print(f"pages: {before.page_count} -> {after.page_count}")
+    print(f"free pages: {before.freelist_count} -> {after.freelist_count}")
+
+
+# Errors that the app itself throws (as opposed to unexpected internal
+# errors), which are printed nicely for the user
+APP_ERRORS = (
+    RouteError,
+    AscentError,
+    AscentDBError,
+    InvalidDateError,
+    DatabaseAlreadyExistsError,
+    InvalidDateStorageError,
+    ConsolidateError,
+    ChangeLogError,
+    MergeError,
+    MigrateError,
+    ArchiveError,
+    BackupError,
+    OptimizeError,
+    ProfileError,
+)
+
+
+class AscentShell(cmd.Cmd):
+    """Shell that runs commands on one connection held open throughout.
+
+    Route and crag names are completed from indexes loaded on first use,
+    updated on writes through the shell and reloaded after writes by
+    other connections.
+    """
+
+    intro = "Type help or ? to list commands."
+
+    def __init__(self, db: AscentDB) -> None:
+        super().__init__()
+
+        self.db = db
+        self.prompt = f"({db.name}) "
+
+        self._loaders = {"route": db.routes, "crag": db.crags}
+        self._indexes: dict[str, NameIndex] = {}
+        self._version: int | None = None
+
+    def names(self, kind: str) -> NameIndex:
+        version = self.db.data_version()
+
+        if version != self._version:
+            self._indexes.clear()
+            self._version = version
+
+        if kind not in self._indexes:
+            self._indexes[kind] = NameIndex(self._loaders[kind]())
+
+        return self._indexes[kind]
+
+    def ask(self, prompt: str, kind: str | None = None) -> str:
+        if kind is None or readline is None:
+            return input(prompt)
+
+        matches: list[str] = []
+
+        def complete(text: str, state: int) -> str | None:
+            nonlocal matches
+
+            if state == 0:
+                matches = self.names(kind).complete(text)
+                self.db.release()
+
+            return matches[state] if state < len(matches) else None
+
+        # Names contain spaces, so the whole line is completed
+        completer = readline.get_completer()
+        delims = readline.get_completer_delims()
+
+        readline.set_completer(complete)
+        readline.set_completer_delims("")
+
+        try:
+            return input(prompt)
+        finally:
+            readline.set_completer(completer)
+            readline.set_completer_delims(delims)
+
+    def onecmd(self, line: str) -> bool:
+        try:
+            return super().onecmd(line)
+        except APP_ERRORS as e:
+            print(f"Error: {e}")
+        except (SystemExit, KeyboardInterrupt):
+            # Backing out of a command returns to the shell
+            print("\nCancelled")
+        finally:
+            # Nothing is locked while waiting on the next command
+            self.db.release()
+
+        return False
+
+    def emptyline(self) -> bool:
+        # Rather than repeat the last command, which may be a write
+        return False
+
+    def do_log(self, arg: str) -> None:
+        """Log an ascent."""
+        ascent = get_ascent(self.ask)
+        crags = self.names("crag")
+        crag = ascent.route.crag
+
+        if crags and crag not in crags:
+            warn_unknown_crag(crag, crags.similar(crag, limit=5))
+
+        print(f"Ascent to be logged: {ascent}")
+        confirm(f"Log the above ascent in {self.db.name}")
+
+        self.db.log_ascent(ascent)
+
+        self.names("route").add(ascent.route.name)
+        crags.add(crag)
+
+        print("Successfully logged the above ascent")
+
+    def do_drop(self, arg: str) -> None:
+        """Drop an ascent."""
+        route = get_route(self.ask)
+        ascent = self.db.find_ascent(route)
+        self.db.release()
+
+        print(f"Ascent to be dropped: {ascent}")
+        confirm(f"Drop the above ascent from {self.db.name}")
+
+        self.db.drop_ascent(route)
+
+        # Other ascents may share the name of the route or its crag
+        if not self.db.ascents(Search(route=route.name)):
+            self.names("route").discard(route.name)
+
+        if not self.db.crag_exists(route.crag):
+            self.names("crag").discard(route.crag)
+
+        print("Successfully dropped the above ascent")
+
+    def do_search(self, arg: str) -> None:
+        """Search for ascents."""
+        search = get_search(self.ask)
+        order = get_order()
+
+        print_results(self.db.ascents(search, order))
+
+    def do_analyze(self, arg: str) -> None:
+        """Analyze ascents: analyze [text|json|csv]"""
+        output_format = arg.strip() or "text"
+
+        if output_format not in FORMATS:
+            print(f"Error: Invalid format '{output_format}'")
+            return
+
+        FORMATS[output_format](collect_analysis(self.db), sys.stdout)
+
+    def complete_analyze(self, text: str, *args: object) -> list[str]:
+        return [name for name in FORMATS if name.startswith(text)]
+
+    def do_quit(self, arg: str) -> bool:
+        """Exit the shell."""
+        return True
+
+    def do_EOF(self, arg: str) -> bool:
+        """Exit the shell."""
+        print()
+        return True
+
+
+def shell(database: Path, climber: str | None = None) -> None:
+    db = AscentDB(database, climber=climber)
+
+    with db:
+        try:
+            AscentShell(db).cmdloop()
+        except KeyboardInterrupt:
+            print()
+
+
+COMMANDS: dict[str, Callable[..., None]] = {
     "init": init,
+    "convert": convert,
+    "consolidate": consolidate,
     "log": log,
     "drop": drop,
     "analyze": analyze,
     "search": search,
+    "drop-where": drop_where,
+    "update-where": update_where,
+    "dedupe": dedupe,
+    "changes": changes,
+    "compact": compact,
+    "merge": merge,
+    "migrate": migrate,
+    "archive": archive,
+    "backup": backup,
+    "optimize": optimize,
+    "shell": shell,
 }
 
 
 def main() -> None:
-    args = get_args()
+    args = vars(get_args())
+
+    command = COMMANDS[args.pop("command")]
+    metrics_file = args.pop("metrics_file")
 
-    command = COMMANDS[args.command]
+    METRICS.enabled = metrics_file is not None
 
     try:
-        command(args.database)
-    except (
-        # Errors that the app itself throws (as opposed to unexpected
-        # internal errors) are printed nicely for the user
-        RouteError,
-        AscentError,
-        AscentDBError,
-        InvalidDateError,
-        DatabaseAlreadyExistsError,
-    ) as e:
+        command(**args)
+    except APP_ERRORS as e:
         sys.exit(f"Error: {e}")
+    finally:
+        # Also written on errors or when the user backs out
+        if metrics_file is not None:
+            METRICS.write(metrics_file)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,67 @@
-from datetime import datetime
-from typing import Any
+import csv
+import datetime
+import json
+import textwrap
+import time
+from collections.abc import Callable, Generator, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from typing import Any, TextIO
 
-from ascents._models import AscentDB, Search
+from ascents._models import Ascent, AscentDB, Search, grade_rank
 from ascents._utils import make_ascents_table
 
+TRAILING_WINDOWS = (30, 90, 365)
+
+
+@dataclass
+class ActivityStats:
+    days_climbed: int = 0
+    longest_streak: int = 0
+    trailing_counts: dict[int, int] = field(default_factory=dict)
+    trailing_max_grades: dict[int, str | None] = field(default_factory=dict)
+
+
+def compute_activity_stats(
+    dated_grades: Iterable[tuple[datetime.date, str]],
+    as_of: datetime.date,
+    windows: Iterable[int] = TRAILING_WINDOWS,
+) -> ActivityStats:
+    # Single pass over ascents ordered by date, so that the cost does not
+    # depend on the number of windows or the length of the history
+    starts = {days: as_of - datetime.timedelta(days=days) for days in windows}
+
+    stats = ActivityStats(
+        trailing_counts={days: 0 for days in starts},
+        trailing_max_grades={days: None for days in starts},
+    )
+
+    previous_date = None
+    streak = 0
+
+    for date, grade in dated_grades:
+        if date != previous_date:
+            stats.days_climbed += 1
+
+            if previous_date is not None and (date - previous_date).days == 1:
+                streak += 1
+            else:
+                streak = 1
+
+            stats.longest_streak = max(stats.longest_streak, streak)
+            previous_date = date
+
+        for days, start in starts.items():
+            if not start < date <= as_of:
+                continue
+
+            stats.trailing_counts[days] += 1
+            max_grade = stats.trailing_max_grades[days]
+
+            if max_grade is None or grade_rank(grade) > grade_rank(max_grade):
+                stats.trailing_max_grades[days] = grade
+
+    return stats
+
 
 def make_counts_table(
     counts: list[tuple[Any, int]],
@@ -17,51 +75,319 @@ def make_max_grade_by_year_table(
     return "\n".join([f"{year}  {grade}" for year, grade in max_grade_by_year])
 
 
-def analyze_ascent_db(db: AscentDB) -> str:
-    timestamp = datetime.now().strftime("%a %b %d %Y %I:%M:%S %p")
+def make_trailing_table(stats: ActivityStats) -> str:
+    lines = []
 
-    with db:
-        total_count = db.total_count()
-        year_counts = db.year_counts()
-        crag_counts = db.crag_counts()
-        grade_counts = db.grade_counts()
+    for days, count in stats.trailing_counts.items():
+        line = f"{count:>4}  last {days} days"
+        max_grade = stats.trailing_max_grades[days]
+
+        if max_grade is not None:
+            line += f", max grade {max_grade}"
+
+        lines.append(line)
+
+    return "\n".join(lines)
+
+
+@dataclass
+class TopAscents:
+    k: int
+    by: str | None
+    groups: dict[str | int | None, list[Ascent]]
 
-        max_grade = db.max_grade()
-        max_grade_by_year = db.max_grade_by_year()
-        hardest_ascents = db.ascents(Search(grade=max_grade))
+    @property
+    def title(self) -> str:
+        title = f"Hardest {self.k} ascent(s)"
+        return title if self.by is None else f"{title} by {self.by}"
 
-        latest_date = db.latest_date()
-        latest_ascents = db.ascents(Search(date=latest_date))
 
-    analysis = "\n".join(
+def make_top_ascents_table(top_ascents: TopAscents) -> str:
+    if top_ascents.by is None:
+        return make_ascents_table(top_ascents.groups.get(None, []))
+
+    return "\n".join(
         [
-            f"Analysis of ascents in {db.name}",
-            f"Generated on {timestamp}",
-            "",
-            f"Total number of ascents: {total_count}",
-            "",
-            "Count of ascents by year:",
-            make_counts_table(year_counts),
-            "",
-            "Count of ascents by crag:",
-            make_counts_table(crag_counts),
-            "",
-            "Count of ascents by grade:",
-            make_counts_table(grade_counts),
-            "",
-            f"Max grade ascended: {max_grade}",
-            "",
-            "Max grade ascended by year:",
-            make_max_grade_by_year_table(max_grade_by_year),
-            "",
-            "Hardest ascent(s):",
-            make_ascents_table(hardest_ascents),
-            "",
-            f"Latest date of an ascent: {latest_date}",
-            "",
-            "Latest ascent(s):",
-            make_ascents_table(latest_ascents),
+            f"{group}:\n" + textwrap.indent(make_ascents_table(ascents), "  ")
+            for group, ascents in top_ascents.groups.items()
         ]
     )
 
+
+@dataclass
+class Analysis:
+    name: str
+    generated: datetime.datetime
+    total_count: int
+    year_counts: list[tuple[int, int]]
+    crag_counts: list[tuple[str, int]]
+    grade_counts: list[tuple[str, int]]
+    max_grade: str | None
+    max_grade_by_year: list[tuple[int, str]]
+    hardest_ascents: list[Ascent]
+    latest_date: datetime.date | None
+    latest_ascents: list[Ascent]
+    activity_stats: ActivityStats
+    top_ascents: list[TopAscents] = field(default_factory=list)
+
+
+def analyze_ascent_db(
+    db: AscentDB,
+    top_k: int | None = None,
+    top_by: Sequence[str | None] = (None,),
+) -> Analysis:
+    """Analyze the ascents in db, adding the top_k hardest ascents overall
+    (None) or per group in top_by if top_k is given.
+    """
+    with db:
+        return collect_analysis(db, top_k, top_by)
+
+
+def collect_analysis(
+    db: AscentDB,
+    top_k: int | None = None,
+    top_by: Sequence[str | None] = (None,),
+) -> Analysis:
+    """Analyze the ascents in db, whose context must already be entered."""
+    generated = datetime.datetime.now()
+
+    max_grade = db.max_grade()
+    latest_date = db.latest_date()
+
+    analysis = Analysis(
+        name=db.name,
+        generated=generated,
+        total_count=db.total_count(),
+        year_counts=db.year_counts(),
+        crag_counts=db.crag_counts(),
+        grade_counts=db.grade_counts(),
+        max_grade=max_grade,
+        max_grade_by_year=db.max_grade_by_year(),
+        hardest_ascents=db.ascents(Search(grade=max_grade)),
+        latest_date=latest_date,
+        latest_ascents=db.ascents(Search(date=latest_date)),
+        activity_stats=compute_activity_stats(db.dated_grades(), generated.date()),
+    )
+
+    if top_k is not None:
+        analysis.top_ascents = [
+            TopAscents(top_k, by, db.top_k(top_k, by)) for by in top_by
+        ]
+
     return analysis
+
+
+def watch_analysis(
+    db: AscentDB,
+    interval: float,
+    top_k: int | None = None,
+    top_by: Sequence[str | None] = (None,),
+    sleep: Callable[[float], None] = time.sleep,
+) -> Generator[dict[int, str], None, None]:
+    """Analyze the ascents in db whenever they change, yielding the text
+    sections that differ from the previous analysis along with the header,
+    by their position among all sections.
+
+    Changes are polled for every interval seconds on a single connection.
+    The analysis is also refreshed when the date changes, as trailing
+    windows are relative to the current date.
+    """
+    with db:
+        state = None
+        previous: list[str] = []
+
+        while True:
+            current_state = (db.data_version(), datetime.date.today())
+
+            if current_state != state:
+                state = current_state
+                sections = text_sections(collect_analysis(db, top_k, top_by))
+
+                # Reading the version ends the read transaction, so that
+                # writers are not held up while sleeping
+                db.data_version()
+
+                # The header holds the timestamp, so it always changes
+                yield {
+                    i: section
+                    for i, section in enumerate(sections)
+                    if i == 0 or i >= len(previous) or section != previous[i]
+                }
+
+                previous = sections
+
+            sleep(interval)
+
+
+def text_sections(analysis: Analysis) -> list[str]:
+    timestamp = analysis.generated.strftime("%a %b %d %Y %I:%M:%S %p")
+    activity_stats = analysis.activity_stats
+
+    sections = [
+        f"Analysis of ascents in {analysis.name}\nGenerated on {timestamp}",
+        f"Total number of ascents: {analysis.total_count}",
+        "Count of ascents by year:\n" + make_counts_table(analysis.year_counts),
+        "Count of ascents by crag:\n" + make_counts_table(analysis.crag_counts),
+        "Count of ascents by grade:\n" + make_counts_table(analysis.grade_counts),
+        f"Max grade ascended: {analysis.max_grade}",
+        "Max grade ascended by year:\n"
+        + make_max_grade_by_year_table(analysis.max_grade_by_year),
+        "Hardest ascent(s):\n" + make_ascents_table(analysis.hardest_ascents),
+        f"Latest date of an ascent: {analysis.latest_date}",
+        "Latest ascent(s):\n" + make_ascents_table(analysis.latest_ascents),
+        f"Number of days climbed: {activity_stats.days_climbed}",
+        "Longest streak of consecutive climbing days: "
+        f"{activity_stats.longest_streak}",
+        "Count of ascents in trailing windows:\n" + make_trailing_table(activity_stats),
+    ]
+
+    for top_ascents in analysis.top_ascents:
+        sections.append(f"{top_ascents.title}:\n" + make_top_ascents_table(top_ascents))
+
+    return sections
+
+
+def write_text(analysis: Analysis, file: TextIO) -> None:
+    for i, section in enumerate(text_sections(analysis)):
+        if i:
+            file.write("\n")
+
+        file.write(section + "\n")
+
+
+def ascent_to_dict(ascent: Ascent) -> dict[str, str]:
+    return {
+        "route": ascent.route.name,
+        "grade": ascent.route.grade,
+        "crag": ascent.route.crag,
+        "date": ascent.date.isoformat(),
+    }
+
+
+def analysis_to_dict(analysis: Analysis) -> dict[str, Any]:
+    activity_stats = analysis.activity_stats
+    latest_date = analysis.latest_date
+
+    return {
+        "name": analysis.name,
+        "generated": analysis.generated.isoformat(timespec="seconds"),
+        "total_count": analysis.total_count,
+        "year_counts": [
+            {"year": year, "count": count} for year, count in analysis.year_counts
+        ],
+        "crag_counts": [
+            {"crag": crag, "count": count} for crag, count in analysis.crag_counts
+        ],
+        "grade_counts": [
+            {"grade": grade, "count": count} for grade, count in analysis.grade_counts
+        ],
+        "max_grade": analysis.max_grade,
+        "max_grade_by_year": [
+            {"year": year, "grade": grade} for year, grade in analysis.max_grade_by_year
+        ],
+        "hardest_ascents": [
+            ascent_to_dict(ascent) for ascent in analysis.hardest_ascents
+        ],
+        "latest_date": None if latest_date is None else latest_date.isoformat(),
+        "latest_ascents": [
+            ascent_to_dict(ascent) for ascent in analysis.latest_ascents
+        ],
+        "days_climbed": activity_stats.days_climbed,
+        "longest_streak": activity_stats.longest_streak,
+        "trailing_windows": [
+            {
+                "days": days,
+                "count": count,
+                "max_grade": activity_stats.trailing_max_grades[days],
+            }
+            for days, count in activity_stats.trailing_counts.items()
+        ],
+        "top_ascents": [
+            {
+                "k": top_ascents.k,
+                "by": top_ascents.by,
+                "groups": [
+                    {
+                        "group": group,
+                        "ascents": [ascent_to_dict(ascent) for ascent in ascents],
+                    }
+                    for group, ascents in top_ascents.groups.items()
+                ],
+            }
+            for top_ascents in analysis.top_ascents
+        ],
+    }
+
+
+def write_json(analysis: Analysis, file: TextIO) -> None:
+    # json.dump() writes chunk by chunk rather than building one string
+    json.dump(analysis_to_dict(analysis), file, indent=2)
+    file.write("\n")
+
+
+CSV_FIELDS = ["section", "key", "value", "route", "grade", "crag", "date"]
+
+
+def csv_rows(analysis: Analysis) -> Iterator[dict[str, Any]]:
+    activity_stats = analysis.activity_stats
+
+    yield {"section": "total_count", "value": analysis.total_count}
+
+    for year, count in analysis.year_counts:
+        yield {"section": "year_count", "key": year, "value": count}
+
+    for crag, count in analysis.crag_counts:
+        yield {"section": "crag_count", "key": crag, "value": count}
+
+    for grade, count in analysis.grade_counts:
+        yield {"section": "grade_count", "key": grade, "value": count}
+
+    yield {"section": "max_grade", "value": analysis.max_grade}
+
+    for year, grade in analysis.max_grade_by_year:
+        yield {"section": "max_grade_by_year", "key": year, "value": grade}
+
+    for ascent in analysis.hardest_ascents:
+        yield {"section": "hardest_ascent"} | ascent_to_dict(ascent)
+
+    yield {"section": "latest_date", "value": analysis.latest_date}
+
+    for ascent in analysis.latest_ascents:
+        yield {"section": "latest_ascent"} | ascent_to_dict(ascent)
+
+    yield {"section": "days_climbed", "value": activity_stats.days_climbed}
+    yield {"section": "longest_streak", "value": activity_stats.longest_streak}
+
+    for days, count in activity_stats.trailing_counts.items():
+        yield {"section": "trailing_count", "key": days, "value": count}
+
+        yield {
+            "section": "trailing_max_grade",
+            "key": days,
+            "value": activity_stats.trailing_max_grades[days],
+        }
+
+    # Ranked within each group, with the group as the key
+    for top_ascents in analysis.top_ascents:
+        if top_ascents.by is None:
+            section = "top_ascent"
+        else:
+            section = f"top_ascent_by_{top_ascents.by}"
+
+        for group, ascents in top_ascents.groups.items():
+            for rank, ascent in enumerate(ascents, start=1):
+                row = {"section": section, "key": group, "value": rank}
+                yield row | ascent_to_dict(ascent)
+
+
+def write_csv(analysis: Analysis, file: TextIO) -> None:
+    writer = csv.DictWriter(file, CSV_FIELDS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(csv_rows(analysis))
+
+
+FORMATS: dict[str, Callable[[Analysis, TextIO], None]] = {
+    "text": write_text,
+    "json": write_json,
+    "csv": write_csv,
+}
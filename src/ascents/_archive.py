@@ -0,0 +1,239 @@
+import datetime
+import re
+import sqlite3
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from ascents._init import (
+    DATE_STORAGES,
+    SCHEMA_VERSION,
+    YEAR_SQL,
+    ascents_indexes_sql,
+    ascents_table_sql,
+    get_date_storage,
+    has_change_log,
+    has_climbers,
+    has_table,
+)
+
+# Number of years of ascents per archive database
+ARCHIVE_PERIODS = {"year": 1, "decade": 10}
+
+
+@dataclass(frozen=True)
+class Archive:
+    name: str
+    path: str
+    first_date: str
+    last_date: str
+
+
+def read_archives(connection: sqlite3.Connection) -> list[Archive]:
+    if not has_table(connection, "archives"):
+        return []
+
+    rows = connection.execute(
+        """
+        SELECT name, path, first_date, last_date
+        FROM main.archives
+        ORDER BY name
+        """
+    )
+
+    return [Archive(*row) for row in rows]
+
+
+def date_range(value: str | datetime.date, glob: bool) -> tuple[str, str]:
+    """Return the range of ISO dates that a date filter can match."""
+    if isinstance(value, datetime.date):
+        return value.isoformat(), value.isoformat()
+
+    if not glob:
+        return value, value
+
+    # Dates matching a pattern all start with its literal prefix
+    prefix = re.split(r"[*?\[]", value, maxsplit=1)[0]
+
+    return prefix, prefix + "\uffff"
+
+
+def spanned_archives(
+    archives: Iterable[Archive],
+    date_filter: str | datetime.date | Iterable[str | datetime.date] | None,
+    glob: bool = False,
+) -> list[Archive]:
+    """Prune archives down to those holding dates that date_filter, as
+    in a Search, can match.
+    """
+    if date_filter is None:
+        return list(archives)
+
+    if isinstance(date_filter, (str, datetime.date)):
+        date_filter = [date_filter]
+
+    ranges = [date_range(value, glob) for value in date_filter]
+
+    return [
+        archive
+        for archive in archives
+        if any(
+            archive.first_date <= high and low <= archive.last_date
+            for low, high in ranges
+        )
+    ]
+
+
+def archive_name(start: int, period: str) -> str:
+    return f"{start}s" if period == "decade" else str(start)
+
+
+def init_archive_db(database: Path, date_storage: str, climbers: bool) -> None:
+    # Just the ascents, as archives are only ever read through the
+    # database they were archived from
+    connection = sqlite3.connect(database, autocommit=False)
+
+    try:
+        connection.execute(ascents_table_sql("ascents", date_storage, climbers))
+
+        for statement in ascents_indexes_sql(climbers):
+            connection.execute(statement)
+
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def archive_ascent_db(
+    database: Path,
+    before: datetime.date,
+    period: str = "decade",
+) -> dict[str, int]:
+    """Move ascents dated before a cutoff into one archive database per
+    period, next to database, and return the number moved to each.
+
+    AscentDB still reads archived ascents, but only attaches the archives
+    a query spans. Moving ascents is not logged as a change, as nothing
+    changed as far as consumers of the change log are concerned.
+    """
+    if period not in ARCHIVE_PERIODS:
+        raise ArchiveError(
+            f"Invalid period '{period}', valid options are {set(ARCHIVE_PERIODS)}"
+        )
+
+    if not database.exists():
+        raise ArchiveError(f"{database} not found, cannot archive")
+
+    # Databases cannot be attached within a transaction, so each archive
+    # gets its own transaction between attaching and detaching it
+    connection = sqlite3.connect(database, autocommit=True)
+
+    counts = {}
+
+    try:
+        if not has_table(connection, "archives"):
+            raise ArchiveError(
+                f"{database} has no archive registry, run ascents migrate first"
+            )
+
+        date_storage = get_date_storage(connection)
+        climbers = has_climbers(connection)
+        change_log = has_change_log(connection)
+
+        _, encode = DATE_STORAGES[date_storage]
+        length = ARCHIVE_PERIODS[period]
+        start_sql = f"CAST({YEAR_SQL.format('date')} AS INTEGER) / {length} * {length}"
+        before_sql = f"date < {encode.format(':before')}"
+        columns = "climber, route, grade, crag" if climbers else "route, grade, crag"
+
+        starts = connection.execute(
+            f"""
+            SELECT DISTINCT {start_sql}
+            FROM ascents
+            WHERE {before_sql}
+            ORDER BY 1
+            """,
+            {"before": before.isoformat()},
+        ).fetchall()
+
+        for (start,) in starts:
+            name = archive_name(start, period)
+            path = database.with_name(f"{database.stem}-{name}.db")
+
+            if not path.exists():
+                init_archive_db(path, date_storage, climbers)
+
+            connection.execute("ATTACH DATABASE ? AS archive", (str(path),))
+
+            try:
+                # An archive may have been converted to another date storage
+                archive_storage = get_date_storage(connection, "archive")
+                _, archive_encode = DATE_STORAGES[archive_storage]
+                params = {"before": before.isoformat(), "start": start}
+                archived = f"{before_sql} AND {start_sql} = :start"
+
+                connection.execute("BEGIN IMMEDIATE")
+
+                try:
+                    seq = 0
+
+                    if change_log:
+                        (seq,) = connection.execute(
+                            "SELECT coalesce(max(seq), 0) FROM main.changes"
+                        ).fetchone()
+
+                    cursor = connection.execute(
+                        f"""
+                        INSERT INTO archive.ascents({columns}, date)
+                        SELECT {columns}, {archive_encode.format("date(date)")}
+                        FROM main.ascents
+                        WHERE {archived}
+                        """,
+                        params,
+                    )
+                    counts[name] = cursor.rowcount
+
+                    connection.execute(
+                        f"DELETE FROM main.ascents WHERE {archived}", params
+                    )
+
+                    # The deletes just logged by the triggers
+                    if change_log:
+                        connection.execute(
+                            "DELETE FROM main.changes WHERE seq > ?", (seq,)
+                        )
+
+                    # WHERE true tells the upsert clause apart from a join
+                    connection.execute(
+                        """
+                        INSERT INTO main.archives(name, path, first_date, last_date)
+                        SELECT ?, ?, date(min(date)), date(max(date))
+                        FROM archive.ascents
+                        WHERE true
+                        ON CONFLICT(name) DO UPDATE
+                        SET first_date = excluded.first_date,
+                            last_date = excluded.last_date
+                        """,
+                        (name, path.name),
+                    )
+
+                    connection.execute("COMMIT")
+                except sqlite3.IntegrityError as e:
+                    connection.execute("ROLLBACK")
+                    raise ArchiveError(
+                        f"Some ascents before {before} are already in {path}"
+                    ) from e
+                except Exception:
+                    connection.execute("ROLLBACK")
+                    raise
+            finally:
+                connection.execute("DETACH DATABASE archive")
+    finally:
+        connection.close()
+
+    return counts
+
+
+class ArchiveError(Exception):
+    """Raise if ascents cannot be archived."""
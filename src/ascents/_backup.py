@@ -0,0 +1,194 @@
+import datetime
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+from ascents._archive import read_archives
+from ascents._init import has_climbers
+
+
+def backup_ascent_db(
+    database: Path,
+    dest: Path,
+    *,
+    keep: int | None = None,
+    pages: int = 256,
+    sleep: float = 0.01,
+    max_restarts: int = 3,
+) -> Path:
+    if not database.exists():
+        raise BackupError(f"{database} not found, cannot back up")
+
+    if keep is not None and keep < 1:
+        raise BackupError("keep must be at least 1")
+
+    if keep is None:
+        backup_path = dest
+    else:
+        dest.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        backup_path = dest / f"{database.stem}-{timestamp}{database.suffix}"
+
+    # Back up to a temporary file first so that a failed or corrupt backup
+    # never replaces a good one
+    temp_path = backup_path.with_name(backup_path.name + ".tmp")
+    temp_path.unlink(missing_ok=True)
+
+    source = sqlite3.connect(database)
+    target = sqlite3.connect(temp_path)
+
+    # Archive copies written so far, by temporary path and final path
+    archive_copies: list[tuple[Path, Path]] = []
+
+    copied = 0
+    restarts = 0
+
+    def pause(status: int, remaining: int, total: int) -> None:
+        nonlocal copied, restarts
+
+        # A write to the source by another connection restarts the backup
+        # from scratch, which under steady writes would never finish
+        if status == sqlite3.SQLITE_OK and total - remaining <= copied:
+            restarts += 1
+
+            if restarts > max_restarts:
+                raise BackupRestartedError
+
+        copied = total - remaining
+
+        # The source is only locked while a batch of pages is copied, so
+        # sleeping between batches lets concurrent writers get in
+        time.sleep(sleep)
+
+    try:
+        try:
+            source.backup(target, pages=pages, progress=pause)
+        except BackupRestartedError:
+            # Copy everything in one step instead, which only blocks
+            # writers for as long as the copy takes
+            source.backup(target, sleep=sleep)
+
+        # Archives are copied alongside the backup, named after it, so that
+        # it can still be read once restored
+        for archive in read_archives(target):
+            copy_path = backup_path.with_name(
+                f"{backup_path.stem}-{archive.name}{backup_path.suffix}"
+            )
+            temp_copy_path = copy_path.with_name(copy_path.name + ".tmp")
+            archive_copies.append((temp_copy_path, copy_path))
+
+            copy_archive(database.parent / archive.path, temp_copy_path, target)
+
+            target.execute(
+                "UPDATE archives SET path = ? WHERE name = ?",
+                (copy_path.name, archive.name),
+            )
+            target.commit()
+
+        (result,) = target.execute("PRAGMA integrity_check").fetchone()
+    except Exception:
+        target.close()
+        temp_path.unlink(missing_ok=True)
+
+        for temp_copy_path, _ in archive_copies:
+            temp_copy_path.unlink(missing_ok=True)
+
+        raise
+    finally:
+        target.close()
+        source.close()
+
+    if result != "ok":
+        temp_path.unlink()
+
+        for temp_copy_path, _ in archive_copies:
+            temp_copy_path.unlink()
+
+        raise BackupError(f"Backup of {database} failed integrity check: {result}")
+
+    for temp_copy_path, copy_path in archive_copies:
+        temp_copy_path.replace(copy_path)
+
+    temp_path.replace(backup_path)
+
+    if keep is not None:
+        rotate_backups(database, dest, keep)
+
+    return backup_path
+
+
+def copy_archive(archive: Path, dest: Path, target: sqlite3.Connection) -> None:
+    if not archive.exists():
+        raise BackupError(f"Archive {archive} not found, cannot back up")
+
+    dest.unlink(missing_ok=True)
+
+    # Through SQLite rather than as a plain file, in case ascents are
+    # being archived into it as it is copied
+    source = sqlite3.connect(archive)
+    copy = sqlite3.connect(dest)
+
+    try:
+        source.backup(copy)
+    finally:
+        copy.close()
+        source.close()
+
+    key = (
+        "climber, route, grade, crag" if has_climbers(target) else "route, grade, crag"
+    )
+
+    # Ascents archived since the backup was taken are still live in it
+    target.execute("ATTACH DATABASE ? AS archive", (str(dest),))
+
+    try:
+        target.execute(
+            f"""
+            DELETE FROM archive.ascents
+            WHERE ({key}) IN (SELECT {key} FROM main.ascents)
+            """
+        )
+        target.commit()
+    finally:
+        target.execute("DETACH DATABASE archive")
+
+
+def archive_copies(backup: Path) -> list[Path]:
+    connection = sqlite3.connect(backup)
+
+    try:
+        return [backup.parent / archive.path for archive in read_archives(connection)]
+    finally:
+        connection.close()
+
+
+def rotate_backups(database: Path, dest: Path, keep: int) -> list[Path]:
+    # Archive copies are named after their backup, so backups are told
+    # apart by ending in a timestamp. These sort chronologically, so the
+    # oldest backups come first.
+    name = re.compile(
+        rf"{re.escape(database.stem)}-\d{{8}}T\d{{12}}{re.escape(database.suffix)}"
+    )
+    backups = sorted(
+        path
+        for path in dest.glob(f"{database.stem}-*{database.suffix}")
+        if name.fullmatch(path.name)
+    )
+    removed = backups[:-keep]
+
+    for backup in removed:
+        for archive_copy in archive_copies(backup):
+            archive_copy.unlink(missing_ok=True)
+
+        backup.unlink()
+
+    return removed
+
+
+class BackupError(Exception):
+    """Raise if a backup cannot be made."""
+
+
+class BackupRestartedError(Exception):
+    """Raise if an incremental backup keeps being restarted by writes."""
@@ -0,0 +1,74 @@
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Generic, NamedTuple, TypeVar
+
+V = TypeVar("V")
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class ResultCache(Generic[V]):
+    """Bounded LRU cache of query results tagged with a database version.
+
+    An entry is only returned while the database version it was stored
+    with is current and, if a TTL is given, it has not expired.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 128,
+        ttl: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[object, float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, version: object) -> V | None:
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            entry_version, stored, value = entry
+            expired = self.ttl is not None and self._clock() - stored > self.ttl
+
+            if entry_version == version and not expired:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+            del self._entries[key]
+
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, version: object, value: V) -> None:
+        self._entries[key] = (version, self._clock(), value)
+        self._entries.move_to_end(key)
+
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
@@ -0,0 +1,119 @@
+import bisect
+import math
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+
+
+def normalize(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def trigrams(name: str) -> frozenset[str]:
+    padded = f"  {normalize(name)} "
+    return frozenset(map("".join, zip(padded, padded[1:], padded[2:])))
+
+
+def similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    return len(a & b) / len(a | b)
+
+
+class NameIndex:
+    """Trigram index over a set of names for ranked fuzzy lookups, along
+    with a sorted list of the names for prefix lookups.
+    """
+
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        self._trigrams: dict[str, frozenset[str]] = {}
+        self._postings: defaultdict[str, set[str]] = defaultdict(set)
+        self._sorted: list[str] = []
+
+        for name in names:
+            self.add(name)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._trigrams
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._trigrams)
+
+    def __len__(self) -> int:
+        return len(self._trigrams)
+
+    def add(self, name: str) -> None:
+        if name in self._trigrams:
+            return
+
+        grams = trigrams(name)
+        self._trigrams[name] = grams
+        bisect.insort(self._sorted, name)
+
+        for gram in grams:
+            self._postings[gram].add(name)
+
+    def discard(self, name: str) -> None:
+        if name not in self._trigrams:
+            return
+
+        grams = self._trigrams.pop(name)
+        del self._sorted[bisect.bisect_left(self._sorted, name)]
+
+        for gram in grams:
+            posting = self._postings[gram]
+            posting.discard(name)
+
+            if not posting:
+                del self._postings[gram]
+
+    def similar(
+        self,
+        name: str,
+        threshold: float = 0.3,
+        limit: int | None = None,
+    ) -> list[str]:
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+
+        grams = trigrams(name)
+
+        # A name with a similarity of at least threshold shares at least
+        # ceil(threshold * len(grams)) trigrams with the query, so it is
+        # enough to probe the postings of the rarest remaining trigrams
+        # (prefix filtering) rather than compare against every name
+        probe_count = len(grams) - math.ceil(threshold * len(grams)) + 1
+        probes = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))
+
+        candidates: set[str] = set()
+
+        for gram in probes[:probe_count]:
+            candidates.update(self._postings.get(gram, ()))
+
+        scored = []
+
+        for candidate in candidates:
+            score = similarity(grams, self._trigrams[candidate])
+
+            if score >= threshold:
+                scored.append((score, candidate))
+
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+
+        return [candidate for _, candidate in scored[:limit]]
+
+    def complete(self, prefix: str, limit: int | None = None) -> list[str]:
+        """Return the names starting with prefix (case-sensitive, as
+        searches are), in sorted order.
+        """
+        # Names sharing a prefix are adjacent in sorted order, so matches
+        # run from where the prefix would be inserted up to the first name
+        # without it
+        names: list[str] = []
+
+        for i in range(bisect.bisect_left(self._sorted, prefix), len(self._sorted)):
+            name = self._sorted[i]
+
+            if not name.startswith(prefix) or len(names) == limit:
+                break
+
+            names.append(name)
+
+        return names
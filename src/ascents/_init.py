@@ -1,8 +1,13 @@
 import sqlite3
 from pathlib import Path
+from typing import TypeGuard
 
 GradeInfoData = list[tuple[str, int, str | None]]
 
+# Version of the schema created by init_ascent_db, kept in PRAGMA
+# user_version. Bumped along with each migration added in _migrate.
+SCHEMA_VERSION = 4
+
 
 def generate_grade_info_data() -> GradeInfoData:
     grade_info_data: GradeInfoData = []
@@ -17,52 +22,475 @@ def generate_grade_info_data() -> GradeInfoData:
     return grade_info_data
 
 
-def init_ascent_db(database: Path) -> None:
-    if database.exists():
-        raise DatabaseAlreadyExistsError(
-            f"{database} already exists, cannot initialize"
+# Julian day numbers rather than Python ordinals, so that SQLite's own
+# date and time functions keep working on the column
+DATE_STORAGES = {
+    "text": ("TEXT", "date({})"),
+    "julian": ("INTEGER", "CAST(julianday({}) + 0.5 AS INTEGER)"),
+}
+
+
+# Ranks grades in pure SQL (number * 5 plus the position of the letter,
+# if any) so that it can be used in indexes, and works on either date
+# storage like strftime() does
+GRADE_RANK_SQL = (
+    "(CAST(substr({0}, 3) AS INTEGER) * 5 + instr('abcd', substr({0}, -1)))"
+)
+YEAR_SQL = "strftime('%Y', {})"
+
+# Start date of the week, month and quarter of a date, indexed so that
+# ascents can be bucketed by them without sorting
+WEEK_SQL = "date({}, '-6 days', 'weekday 1')"
+MONTH_SQL = "date({}, 'start of month')"
+QUARTER_SQL = (
+    "date({0}, 'start of month', printf('-%d months', (strftime('%m', {0}) - 1) % 3))"
+)
+
+
+def check_date_storage(date_storage: str) -> None:
+    if date_storage not in DATE_STORAGES:
+        raise InvalidDateStorageError(
+            f"Invalid date storage '{date_storage}', "
+            f"valid options are {set(DATE_STORAGES)}"
         )
 
+
+def ascents_table_sql(
+    table: str = "ascents",
+    date_storage: str = "text",
+    climbers: bool = False,
+) -> str:
+    date_type, _ = DATE_STORAGES[date_storage]
+
+    # Databases shared by many climbers lead every key with the climber,
+    # so that each climber's ascents are clustered together
+    if climbers:
+        climber_column = "climber TEXT NOT NULL,"
+        key = "climber, route, grade, crag"
+    else:
+        climber_column = ""
+        key = "route, grade, crag"
+
+    return f"""
+    CREATE TABLE {table}(
+        {climber_column}
+        route TEXT NOT NULL,
+        grade TEXT NOT NULL,
+        crag TEXT NOT NULL,
+        date {date_type} NOT NULL,
+        PRIMARY KEY({key})
+    )
+    """
+
+
+def ascents_indexes_sql(climbers: bool = False) -> list[str]:
+    prefix = "climber, " if climbers else ""
+    rank = GRADE_RANK_SQL.format("grade")
+    year = YEAR_SQL.format("date")
+    week = WEEK_SQL.format("date")
+    month = MONTH_SQL.format("date")
+    quarter = QUARTER_SQL.format("date")
+
+    # Ordered by grade rank within each group for top-k queries, and by
+    # grade within each period so that max grades are read off the index.
+    # IF NOT EXISTS so that migrations can add whichever are missing.
+    return [
+        f"CREATE INDEX IF NOT EXISTS ascents_crag ON ascents({prefix}crag, {rank})",
+        f"CREATE INDEX IF NOT EXISTS ascents_date ON ascents({prefix}date)",
+        f"CREATE INDEX IF NOT EXISTS ascents_grade ON ascents({prefix}{rank})",
+        f"CREATE INDEX IF NOT EXISTS ascents_year ON ascents({prefix}{year}, {rank})",
+        f"CREATE INDEX IF NOT EXISTS ascents_week ON ascents({prefix}{week}, grade)",
+        f"CREATE INDEX IF NOT EXISTS ascents_month ON ascents({prefix}{month}, grade)",
+        f"CREATE INDEX IF NOT EXISTS ascents_quarter "
+        f"ON ascents({prefix}{quarter}, grade)",
+    ]
+
+
+def change_log_table_sql(climbers: bool = False) -> str:
+    climber_column = "climber TEXT NOT NULL," if climbers else ""
+
+    # AUTOINCREMENT so that sequence numbers are never reused, even once
+    # the latest changes have been compacted away
+    return f"""
+    CREATE TABLE changes(
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        op TEXT NOT NULL,
+        {climber_column}
+        route TEXT NOT NULL,
+        grade TEXT NOT NULL,
+        crag TEXT NOT NULL,
+        date TEXT NOT NULL
+    )
+    """
+
+
+def change_log_triggers_sql(climbers: bool = False) -> list[str]:
+    columns = ["climber"] if climbers else []
+    columns += ["route", "grade", "crag"]
+
+    # Dates are logged as ISO text whatever the date storage, so that
+    # consumers never need to know how the database stores them
+    def log_change(op: str, row: str) -> str:
+        values = ", ".join(f"{row}.{column}" for column in columns)
+
+        return f"""
+        INSERT INTO changes(op, {", ".join(columns)}, date)
+        VALUES('{op}', {values}, date({row}.date));
+        """
+
+    # An update is logged as the old row being deleted and the new one
+    # inserted, which keeps consumers down to two operations
+    return [
+        f"""
+        CREATE TRIGGER ascents_insert AFTER INSERT ON ascents
+        BEGIN
+            {log_change("insert", "NEW")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER ascents_delete AFTER DELETE ON ascents
+        BEGIN
+            {log_change("delete", "OLD")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER ascents_update AFTER UPDATE ON ascents
+        BEGIN
+            {log_change("delete", "OLD")}
+            {log_change("insert", "NEW")}
+        END
+        """,
+    ]
+
+
+def archives_table_sql() -> str:
+    # Dates are ISO text whatever the date storage, and the path is
+    # relative to the database so that the files can be moved together
+    return """
+    CREATE TABLE archives(
+        name TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        first_date TEXT NOT NULL,
+        last_date TEXT NOT NULL
+    )
+    """
+
+
+def create_ascent_schema(
+    connection: sqlite3.Connection,
+    date_storage: str = "text",
+    climbers: bool = False,
+) -> None:
+    check_date_storage(date_storage)
     grade_info_data = generate_grade_info_data()
 
+    cursor = connection.cursor()
+
+    # Must be set before any tables are created, lets
+    # ascents optimize reclaim free pages without a full VACUUM
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+    # executescript() would commit first, so statements are run one by
+    # one to leave committing to the caller
+    statements = [
+        ascents_table_sql(date_storage=date_storage, climbers=climbers),
+        *ascents_indexes_sql(climbers),
+        change_log_table_sql(climbers),
+        *change_log_triggers_sql(climbers),
+        archives_table_sql(),
+        """
+        CREATE TABLE grade_info(
+            grade TEXT PRIMARY KEY,
+            grade_number INTEGER NOT NULL,
+            grade_letter TEXT
+        )
+        """,
+    ]
+
+    for statement in statements:
+        cursor.execute(statement)
+
+    cursor.executemany(
+        """
+        INSERT INTO grade_info
+        VALUES(?, ?, ?)
+        """,
+        grade_info_data,
+    )
+
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def is_uri(database: Path | str) -> TypeGuard[str]:
+    return isinstance(database, str) and database.startswith("file:")
+
+
+def init_ascent_db(
+    database: Path | str,
+    date_storage: str = "text",
+    climbers: bool = False,
+) -> None:
+    check_date_storage(date_storage)
+    uri = is_uri(database)
+
+    if not uri:
+        database = Path(database)
+
+        if database.exists():
+            raise DatabaseAlreadyExistsError(
+                f"{database} already exists, cannot initialize"
+            )
+
     connection = sqlite3.connect(
         database=database,
+        uri=uri,
         autocommit=False,
     )
 
     try:
-        cursor = connection.cursor()
+        # A URI may point at an existing database (or shared in-memory
+        # database), which only shows by it already having a schema
+        (object_count,) = connection.execute(
+            "SELECT count(*) FROM sqlite_schema"
+        ).fetchone()
 
-        cursor.executescript(
-            """
-            CREATE TABLE ascents(
-                route TEXT NOT NULL,
-                grade TEXT NOT NULL,
-                crag TEXT NOT NULL,
-                date TEXT NOT NULL,
-                PRIMARY KEY(route, grade, crag)
-            );
-
-            CREATE TABLE grade_info(
-                grade TEXT PRIMARY KEY,
-                grade_number INTEGER NOT NULL,
-                grade_letter TEXT
-            );
-            """
-        )
+        if object_count:
+            raise DatabaseAlreadyExistsError(
+                f"{database} already exists, cannot initialize"
+            )
 
-        cursor.executemany(
-            """
-            INSERT INTO grade_info
-            VALUES(?, ?, ?)
+        create_ascent_schema(connection, date_storage, climbers)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def get_schema_version(connection: sqlite3.Connection, schema: str = "main") -> int:
+    (version,) = connection.execute(f"PRAGMA {schema}.user_version").fetchone()
+    return int(version)
+
+
+def ascents_columns(
+    connection: sqlite3.Connection,
+    schema: str = "main",
+) -> dict[str, str]:
+    rows = connection.execute(f"PRAGMA {schema}.table_info(ascents)")
+
+    return {name: column_type for _, name, column_type, *_ in rows}
+
+
+def get_date_storage(connection: sqlite3.Connection, schema: str = "main") -> str:
+    columns = ascents_columns(connection, schema)
+
+    if "date" not in columns:
+        raise InvalidDateStorageError("ascents table has no date column")
+
+    return "julian" if columns["date"] == "INTEGER" else "text"
+
+
+def has_climbers(connection: sqlite3.Connection, schema: str = "main") -> bool:
+    return "climber" in ascents_columns(connection, schema)
+
+
+def has_table(
+    connection: sqlite3.Connection,
+    table: str,
+    schema: str = "main",
+) -> bool:
+    row = connection.execute(
+        f"""
+        SELECT 1
+        FROM {schema}.sqlite_schema
+        WHERE type = 'table' AND name = ?
+        """,
+        (table,),
+    ).fetchone()
+
+    return row is not None
+
+
+def has_archives(connection: sqlite3.Connection, schema: str = "main") -> bool:
+    # Archived ascents are only in the archive databases, so anything
+    # copying ascents by key would miss them, or duplicate them
+    if not has_table(connection, "archives", schema):
+        return False
+
+    row = connection.execute(f"SELECT 1 FROM {schema}.archives LIMIT 1").fetchone()
+
+    return row is not None
+
+
+def has_change_log(connection: sqlite3.Connection) -> bool:
+    return has_table(connection, "changes")
+
+
+def convert_date_storage(database: Path, date_storage: str) -> bool:
+    check_date_storage(date_storage)
+
+    connection = sqlite3.connect(
+        database=database,
+        autocommit=False,
+    )
+
+    try:
+        if get_date_storage(connection) == date_storage:
+            return False
+
+        _, encode = DATE_STORAGES[date_storage]
+        climbers = has_climbers(connection)
+        change_log = has_change_log(connection)
+        columns = "climber, route, grade, crag" if climbers else "route, grade, crag"
+
+        # executescript() would commit after each statement, so the table
+        # is rebuilt statement by statement within a single transaction
+        statements = [
+            ascents_table_sql("ascents_new", date_storage, climbers),
+            f"""
+            INSERT INTO ascents_new({columns}, date)
+            SELECT {columns}, {encode.format("date")}
+            FROM ascents
             """,
-            grade_info_data,
+            "DROP TABLE ascents",
+            "ALTER TABLE ascents_new RENAME TO ascents",
+            *ascents_indexes_sql(climbers),
+            # Triggers are dropped along with the old table, and nothing
+            # has changed as far as the change log is concerned
+            *(change_log_triggers_sql(climbers) if change_log else []),
+        ]
+
+        for statement in statements:
+            connection.execute(statement)
+
+        connection.commit()
+    finally:
+        connection.close()
+
+    return True
+
+
+def consolidate_ascent_dbs(database: Path, sources: list[Path]) -> dict[str, int]:
+    """Copy single-climber databases into one multi-climber database.
+
+    Each source's ascents are assigned to a climber named after the
+    source file. The database is initialized first if it does not exist.
+    """
+    climbers = [source.stem for source in sources]
+
+    if len(set(climbers)) != len(climbers):
+        raise ConsolidateError("source file names must be unique per climber")
+
+    for source in sources:
+        if not source.exists():
+            raise ConsolidateError(f"{source} not found, cannot consolidate")
+
+    if not database.exists():
+        init_ascent_db(database, climbers=True)
+
+    # Databases cannot be attached within a transaction, so each source
+    # gets its own transaction between attaching and detaching it
+    connection = sqlite3.connect(database, autocommit=True)
+
+    counts = {}
+
+    try:
+        if not has_climbers(connection):
+            raise ConsolidateError(f"{database} is not a multi-climber database")
+
+        if has_archives(connection):
+            raise ConsolidateError(
+                f"{database} has archived ascents, which would not be checked "
+                "for duplicates"
+            )
+
+        _, encode = DATE_STORAGES[get_date_storage(connection)]
+
+        for climber, source in zip(climbers, sources):
+            connection.execute("ATTACH DATABASE ? AS source", (str(source),))
+
+            try:
+                if has_archives(connection, "source"):
+                    raise ConsolidateError(
+                        f"{source} has archived ascents, which would be left out"
+                    )
+
+                connection.execute("BEGIN")
+                cursor = connection.execute(
+                    f"""
+                    INSERT INTO main.ascents(climber, route, grade, crag, date)
+                    SELECT ?, route, grade, crag, {encode.format("date")}
+                    FROM source.ascents
+                    """,
+                    (climber,),
+                )
+                connection.execute("COMMIT")
+            except sqlite3.IntegrityError as e:
+                connection.execute("ROLLBACK")
+                raise ConsolidateError(
+                    f"Ascents of {climber} are already in {database}"
+                ) from e
+            finally:
+                connection.execute("DETACH DATABASE source")
+
+            counts[climber] = cursor.rowcount
+    finally:
+        connection.close()
+
+    return counts
+
+
+def compact_change_log(database: Path) -> tuple[int, int]:
+    """Drop all but the latest change of each ascent from the change log.
+
+    Consumers that have fallen behind still end up in the same state,
+    provided inserts are applied as upserts. Return the number of changes
+    dropped and kept.
+    """
+    connection = sqlite3.connect(
+        database=database,
+        autocommit=False,
+    )
+
+    try:
+        if not has_change_log(connection):
+            raise ChangeLogError(f"{database} has no change log")
+
+        if has_climbers(connection):
+            key = "climber, route, grade, crag"
+        else:
+            key = "route, grade, crag"
+
+        cursor = connection.execute(
+            f"""
+            DELETE FROM changes
+            WHERE seq NOT IN (
+                SELECT max(seq)
+                FROM changes
+                GROUP BY {key}
+            )
+            """
         )
 
+        dropped = cursor.rowcount
+        (kept,) = connection.execute("SELECT count(*) FROM changes").fetchone()
+
         connection.commit()
     finally:
         connection.close()
 
+    return dropped, kept
+
 
 class DatabaseAlreadyExistsError(Exception):
     """Raise if database already exists."""
+
+
+class InvalidDateStorageError(Exception):
+    """Raise if an unknown date storage is requested."""
+
+
+class ConsolidateError(Exception):
+    """Raise if databases cannot be consolidated."""
+
+
+class ChangeLogError(Exception):
+    """Raise if a database has no usable change log."""
@@ -0,0 +1,215 @@
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+
+from ascents._init import DATE_STORAGES, get_date_storage, has_archives, has_climbers
+
+MERGE_POLICIES = {"earliest", "latest", "a", "b"}
+
+
+class XorHash:
+    """Aggregate that summarizes a bucket of rows independently of order.
+
+    Python's own hash() is salted per process, which is fine as both
+    databases are summarized within the same merge.
+    """
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def step(self, *row: object) -> None:
+        self.value ^= hash(row)
+
+    def finalize(self) -> int:
+        return self.value
+
+
+@dataclass
+class MergeReport:
+    buckets: int
+    differing_buckets: int
+    copied_to_a: int
+    copied_to_b: int
+    conflicts: int
+
+
+def resolve_conflict(date_a: str, date_b: str, policy: str) -> str:
+    match policy:
+        case "earliest":
+            return min(date_a, date_b)
+        case "latest":
+            return max(date_a, date_b)
+        case "a":
+            return date_a
+        case _:
+            return date_b
+
+
+def merge_ascent_dbs(a: Path, b: Path, policy: str = "earliest") -> MergeReport:
+    """Merge two ascent databases so that both end up with the same ascents.
+
+    Ascents are summarized per crag and only crags whose summaries differ
+    are compared row by row. Ascents logged in both databases with
+    different dates are resolved by policy: keep the earliest or latest
+    date, or the date in a or b.
+    """
+    if policy not in MERGE_POLICIES:
+        raise MergeError(
+            f"Invalid policy '{policy}', valid options are {MERGE_POLICIES}"
+        )
+
+    for database in (a, b):
+        if not database.exists():
+            raise MergeError(f"{database} not found, cannot merge")
+
+    # Databases cannot be attached within a transaction
+    connection = sqlite3.connect(a, autocommit=True)
+
+    try:
+        connection.execute("ATTACH DATABASE ? AS other", (str(b),))
+        connection.create_aggregate("xor_hash", -1, XorHash)
+
+        climbers = has_climbers(connection, "main")
+
+        if has_climbers(connection, "other") != climbers:
+            raise MergeError(
+                "Cannot merge a multi-climber database with a single-climber one"
+            )
+
+        # Archived ascents are never compared, so they would be copied back
+        # from the other database as if they were missing
+        for schema, database in (("main", a), ("other", b)):
+            if has_archives(connection, schema):
+                raise MergeError(
+                    f"{database} has archived ascents, which cannot be merged"
+                )
+
+        date_storages = {
+            schema: get_date_storage(connection, schema) for schema in ("main", "other")
+        }
+
+        # Date storage may differ, in which case rows are compared on ISO
+        # dates, and they are stored in whatever form the receiving
+        # database uses
+        if len(set(date_storages.values())) == 1:
+            date_sql = "date"
+        else:
+            date_sql = "date(date)"
+
+        encodes = {
+            schema: DATE_STORAGES[date_storage][1]
+            for schema, date_storage in date_storages.items()
+        }
+
+        bucket_columns = ["climber", "crag"] if climbers else ["crag"]
+        key_columns = [*bucket_columns, "route", "grade"]
+
+        bucket = ", ".join(bucket_columns)
+        key = ", ".join(key_columns)
+        x_bucket = ", ".join(f"x.{column}" for column in bucket_columns)
+        x_key = ", ".join(f"x.{column}" for column in key_columns)
+        join_key = " AND ".join(f"x.{column} = y.{column}" for column in key_columns)
+        key_condition = " AND ".join(f"{column} = ?" for column in key_columns)
+
+        def summaries(schema: str) -> dict[tuple[str, ...], tuple[int, int]]:
+            # Every row is hashed anyway, so scanning the table and sorting
+            # beats looking each row up from the crag index
+            rows = connection.execute(
+                f"""
+                SELECT {bucket}, count(*), xor_hash({key}, {date_sql})
+                FROM {schema}.ascents NOT INDEXED
+                GROUP BY {bucket}
+                """
+            )
+
+            return {tuple(row[:-2]): tuple(row[-2:]) for row in rows}
+
+        summaries_a = summaries("main")
+        summaries_b = summaries("other")
+        buckets = summaries_a.keys() | summaries_b.keys()
+
+        differing = [
+            bucket_values
+            for bucket_values in buckets
+            if summaries_a.get(bucket_values) != summaries_b.get(bucket_values)
+        ]
+
+        connection.execute("BEGIN")
+
+        try:
+            # Only ascents in differing buckets are compared from here on
+            connection.execute(f"CREATE TEMP TABLE merge_buckets({bucket})")
+            connection.executemany(
+                f"""
+                INSERT INTO merge_buckets
+                VALUES({", ".join("?" * len(bucket_columns))})
+                """,
+                differing,
+            )
+
+            in_differing_bucket = f"({x_bucket}) IN merge_buckets"
+
+            conflicts = connection.execute(
+                f"""
+                SELECT {x_key}, date(x.date), date(y.date)
+                FROM main.ascents AS x
+                JOIN other.ascents AS y ON {join_key}
+                WHERE {in_differing_bucket} AND date(x.date) != date(y.date)
+                """
+            ).fetchall()
+
+            def copy(source: str, target: str) -> int:
+                cursor = connection.execute(
+                    f"""
+                    INSERT INTO {target}.ascents({key}, date)
+                    SELECT {x_key}, {encodes[target].format("x.date")}
+                    FROM {source}.ascents AS x
+                    WHERE {in_differing_bucket}
+                        AND NOT EXISTS(
+                            SELECT 1
+                            FROM {target}.ascents AS y
+                            WHERE {join_key}
+                        )
+                    """
+                )
+
+                return cursor.rowcount
+
+            copied_to_a = copy("other", "main")
+            copied_to_b = copy("main", "other")
+
+            for *key_values, date_a, date_b in conflicts:
+                date = resolve_conflict(date_a, date_b, policy)
+
+                for schema, current in (("main", date_a), ("other", date_b)):
+                    if current == date:
+                        continue
+
+                    connection.execute(
+                        f"""
+                        UPDATE {schema}.ascents
+                        SET date = {encodes[schema].format("?")}
+                        WHERE {key_condition}
+                        """,
+                        (date, *key_values),
+                    )
+
+            connection.execute("DROP TABLE merge_buckets")
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+    finally:
+        connection.close()
+
+    return MergeReport(
+        buckets=len(buckets),
+        differing_buckets=len(differing),
+        copied_to_a=copied_to_a,
+        copied_to_b=copied_to_b,
+        conflicts=len(conflicts),
+    )
+
+
+class MergeError(Exception):
+    """Raise if databases cannot be merged."""
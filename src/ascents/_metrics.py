@@ -0,0 +1,265 @@
+import bisect
+import functools
+import inspect
+import math
+import sqlite3
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any, TypeVar
+
+Labels = tuple[tuple[str, str], ...]
+
+T = TypeVar("T")
+
+# Seconds, finer than Prometheus' defaults as most queries are quick
+DURATION_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Number of SQLite virtual machine instructions per progress callback
+VM_STEP_INTERVAL = 1000
+
+
+def format_labels(labels: Labels, **extra: str) -> str:
+    pairs = [*labels, *extra.items()]
+
+    if not pairs:
+        return ""
+
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+
+    return repr(int(value)) if value == int(value) else repr(value)
+
+
+class Counter:
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self.values: defaultdict[Labels, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        self.values[tuple(labels.items())] += amount
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{format_labels(labels)} {format_value(value)}"
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.counts: defaultdict[Labels, list[int]] = defaultdict(
+            lambda: [0] * (len(buckets) + 1)
+        )
+        self.sums: defaultdict[Labels, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels.items())
+        self.counts[key][bisect.bisect_left(self.buckets, value)] += 1
+        self.sums[key] += value
+
+    def samples(self) -> Iterator[str]:
+        for labels, counts in sorted(self.counts.items()):
+            # Buckets are cumulative in the exposition format
+            cumulative = 0
+
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = format_labels(labels, le=format_value(bound))
+                yield f"{self.name}_bucket{le} {cumulative}"
+
+            yield f"{self.name}_sum{format_labels(labels)} {self.sums[labels]!r}"
+            yield f"{self.name}_count{format_labels(labels)} {cumulative}"
+
+
+class Registry:
+    """In-process metrics, recorded only while enabled."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.metrics: list[Counter | Histogram] = []
+
+    def counter(self, name: str, description: str) -> Counter:
+        counter = Counter(name, description)
+        self.metrics.append(counter)
+        return counter
+
+    def histogram(self, name: str, description: str) -> Histogram:
+        histogram = Histogram(name, description)
+        self.metrics.append(histogram)
+        return histogram
+
+    def reset(self) -> None:
+        for metric in self.metrics:
+            if isinstance(metric, Counter):
+                metric.values.clear()
+            else:
+                metric.counts.clear()
+                metric.sums.clear()
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+
+        for metric in self.metrics:
+            metric_type = "counter" if isinstance(metric, Counter) else "histogram"
+
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric_type}")
+            lines.extend(metric.samples())
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path) -> None:
+        # Scrapers may read the file at any time, so it is replaced whole
+        temp_path = path.with_name(path.name + ".tmp")
+        temp_path.write_text(self.render())
+        temp_path.replace(path)
+
+
+METRICS = Registry()
+
+CALLS = METRICS.counter(
+    "ascents_db_calls_total",
+    "Number of calls of each AscentDB method.",
+)
+CALL_DURATION = METRICS.histogram(
+    "ascents_db_call_duration_seconds",
+    "Duration of calls of each AscentDB method.",
+)
+ROWS_RETURNED = METRICS.counter(
+    "ascents_db_rows_returned_total",
+    "Number of rows returned by each AscentDB method.",
+)
+VM_STEPS = METRICS.counter(
+    "ascents_db_vm_steps_total",
+    "Approximate number of SQLite VM instructions run by each AscentDB "
+    "method, a proxy for rows scanned.",
+)
+COMMIT_DURATION = METRICS.histogram(
+    "ascents_db_commit_duration_seconds",
+    "Duration of commits of writes.",
+)
+LOCK_ERRORS = METRICS.counter(
+    "ascents_db_lock_errors_total",
+    "Number of calls of each AscentDB method that failed on a locked "
+    "database once the busy timeout ran out.",
+)
+
+
+def count_vm_steps(connection: sqlite3.Connection) -> Callable[[], int]:
+    """Count VM instructions run on connection, returning a function that
+    reads the count.
+    """
+    steps = 0
+
+    def progress() -> int:
+        nonlocal steps
+        steps += VM_STEP_INTERVAL
+        return 0
+
+    connection.set_progress_handler(progress, VM_STEP_INTERVAL)
+
+    return lambda: steps
+
+
+def count_rows(result: object) -> int | None:
+    if isinstance(result, list):
+        return len(result)
+
+    if isinstance(result, dict):
+        return sum(len(value) for value in result.values())
+
+    return None
+
+
+def is_lock_error(error: sqlite3.OperationalError) -> bool:
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+
+def instrumented(method: Callable[..., T]) -> Callable[..., T]:
+    """Record calls of method, which does next to nothing while metrics
+    are disabled.
+    """
+    name = method.__name__
+
+    if inspect.isgeneratorfunction(method):
+
+        @functools.wraps(method)
+        def generator_wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+            if not METRICS.enabled:
+                return method(self, *args, **kwargs)
+
+            return record_generator(self, name, method(self, *args, **kwargs))
+
+        return generator_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self: Any, *args: Any, **kwargs: Any) -> T:
+        if not METRICS.enabled:
+            return method(self, *args, **kwargs)
+
+        vm_steps = getattr(self, "_vm_steps", lambda: 0)
+        steps = vm_steps()
+        start = time.perf_counter()
+
+        try:
+            result = method(self, *args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if is_lock_error(e):
+                LOCK_ERRORS.inc(method=name)
+
+            raise
+        finally:
+            CALLS.inc(method=name)
+            CALL_DURATION.observe(time.perf_counter() - start, method=name)
+            VM_STEPS.inc(vm_steps() - steps, method=name)
+
+        rows = count_rows(result)
+
+        if rows is not None:
+            ROWS_RETURNED.inc(rows, method=name)
+
+        return result
+
+    return wrapper
+
+
+def record_generator(self: Any, name: str, rows: Iterator[T]) -> Iterator[T]:
+    # Streamed rows are timed from the first row asked for to the last
+    vm_steps = getattr(self, "_vm_steps", lambda: 0)
+    steps = vm_steps()
+    start = time.perf_counter()
+    count = 0
+
+    try:
+        for row in rows:
+            count += 1
+            yield row
+    finally:
+        CALLS.inc(method=name)
+        CALL_DURATION.observe(time.perf_counter() - start, method=name)
+        VM_STEPS.inc(vm_steps() - steps, method=name)
+        ROWS_RETURNED.inc(count, method=name)
+
+
+def instrument_methods(cls: type[T]) -> type[T]:
+    """Instrument all public methods of cls."""
+    for name, attribute in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.isfunction(attribute):
+            setattr(cls, name, instrumented(attribute))
+
+    return cls
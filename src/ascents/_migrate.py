@@ -0,0 +1,243 @@
+import sqlite3
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from ascents._init import (
+    SCHEMA_VERSION,
+    archives_table_sql,
+    ascents_indexes_sql,
+    change_log_table_sql,
+    change_log_triggers_sql,
+    get_schema_version,
+    has_change_log,
+    has_climbers,
+    has_table,
+)
+
+DEFAULT_BATCH_SIZE = 10_000
+
+
+@dataclass(frozen=True)
+class Migration:
+    """Step that brings the schema from version - 1 up to version.
+
+    setup runs in a single transaction and returns whether existing
+    ascents need a backfill. If so, backfill is run on batches of them
+    (by rowid, after start and up to end) in a transaction each, so that
+    writers are only ever held up for one batch. Ascents written once set
+    up are left to the new schema itself, e.g. to triggers.
+    """
+
+    version: int
+    description: str
+    setup: Callable[[sqlite3.Connection, bool], bool]
+    backfill: Callable[[sqlite3.Connection, bool, int, int], None] | None = None
+
+
+def rebuild_indexes(connection: sqlite3.Connection, climbers: bool) -> bool:
+    # Files from before versioning have whichever indexes the version that
+    # created them did, if any
+    rows = connection.execute(
+        """
+        SELECT name
+        FROM main.sqlite_schema
+        WHERE type = 'index' AND tbl_name = 'ascents' AND sql IS NOT NULL
+        """
+    ).fetchall()
+
+    for (name,) in rows:
+        connection.execute(f"DROP INDEX main.{name}")
+
+    for statement in ascents_indexes_sql(climbers):
+        connection.execute(statement)
+
+    return False
+
+
+def add_change_log(connection: sqlite3.Connection, climbers: bool) -> bool:
+    if has_change_log(connection):
+        return False
+
+    statements = [change_log_table_sql(climbers), *change_log_triggers_sql(climbers)]
+
+    for statement in statements:
+        connection.execute(statement)
+
+    return True
+
+
+def log_existing_ascents(
+    connection: sqlite3.Connection,
+    climbers: bool,
+    start: int,
+    end: int,
+) -> None:
+    # Consumers syncing from scratch then see every ascent, including
+    # those logged before there was a change log
+    columns = "climber, route, grade, crag" if climbers else "route, grade, crag"
+
+    connection.execute(
+        f"""
+        INSERT INTO changes(op, {columns}, date)
+        SELECT 'insert', {columns}, date(date)
+        FROM ascents
+        WHERE rowid > ? AND rowid <= ?
+        ORDER BY rowid
+        """,
+        (start, end),
+    )
+
+
+def add_archives_table(connection: sqlite3.Connection, climbers: bool) -> bool:
+    connection.execute(archives_table_sql())
+    return False
+
+
+def add_period_indexes(connection: sqlite3.Connection, climbers: bool) -> bool:
+    for statement in ascents_indexes_sql(climbers):
+        connection.execute(statement)
+
+    return False
+
+
+MIGRATIONS = [
+    Migration(1, "rebuild indexes", rebuild_indexes),
+    Migration(2, "add change log", add_change_log, log_existing_ascents),
+    Migration(3, "add archive registry", add_archives_table),
+    Migration(4, "add period indexes", add_period_indexes),
+]
+
+
+@contextmanager
+def transaction(connection: sqlite3.Connection) -> Iterator[None]:
+    # Immediate, so that a migration never fails halfway on a lock
+    connection.execute("BEGIN IMMEDIATE")
+
+    try:
+        yield
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+
+    connection.execute("COMMIT")
+
+
+def get_progress(connection: sqlite3.Connection) -> tuple[int, int] | None:
+    if not has_table(connection, "migration_progress"):
+        return None
+
+    done, end = connection.execute(
+        "SELECT done_rowid, end_rowid FROM migration_progress"
+    ).fetchone()
+
+    return int(done), int(end)
+
+
+def run_migration(
+    connection: sqlite3.Connection,
+    migration: Migration,
+    climbers: bool,
+    batch_size: int,
+) -> None:
+    set_version = f"PRAGMA user_version = {migration.version}"
+    backfill = migration.backfill
+
+    if backfill is None:
+        with transaction(connection):
+            migration.setup(connection, climbers)
+            connection.execute(set_version)
+
+        return
+
+    # A backfill that was interrupted carries on from its last batch, as
+    # the migration's own progress is committed along with each batch
+    progress = get_progress(connection)
+
+    if progress is None:
+        with transaction(connection):
+            if not migration.setup(connection, climbers):
+                connection.execute(set_version)
+                return
+
+            (end,) = connection.execute(
+                "SELECT coalesce(max(rowid), 0) FROM ascents"
+            ).fetchone()
+
+            connection.execute(
+                "CREATE TABLE migration_progress(done_rowid INTEGER, end_rowid INTEGER)"
+            )
+            connection.execute("INSERT INTO migration_progress VALUES(0, ?)", (end,))
+
+        progress = (0, end)
+
+    done, end = progress
+
+    while True:
+        with transaction(connection):
+            (batch_end,) = connection.execute(
+                """
+                SELECT max(rowid)
+                FROM (
+                    SELECT rowid
+                    FROM ascents
+                    WHERE rowid > ? AND rowid <= ?
+                    ORDER BY rowid
+                    LIMIT ?
+                )
+                """,
+                (done, end, batch_size),
+            ).fetchone()
+
+            if batch_end is None:
+                connection.execute("DROP TABLE migration_progress")
+                connection.execute(set_version)
+                return
+
+            backfill(connection, climbers, done, batch_end)
+            connection.execute(
+                "UPDATE migration_progress SET done_rowid = ?", (batch_end,)
+            )
+
+        done = batch_end
+
+
+def migrate_ascent_db(
+    database: Path,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> list[Migration]:
+    """Apply the migrations that database is missing, in order, and return
+    them. Safe to rerun after being interrupted.
+    """
+    if not database.exists():
+        raise MigrateError(f"{database} not found, cannot migrate")
+
+    if batch_size < 1:
+        raise MigrateError("Batch size must be at least 1")
+
+    # Transactions are begun explicitly, to take the write lock up front
+    connection = sqlite3.connect(database, autocommit=True)
+
+    try:
+        version = get_schema_version(connection)
+
+        if version > SCHEMA_VERSION:
+            raise MigrateError(
+                f"{database} has schema version {version}, newer than the "
+                f"latest known version {SCHEMA_VERSION}"
+            )
+
+        climbers = has_climbers(connection)
+        pending = MIGRATIONS[version:]
+
+        for migration in pending:
+            run_migration(connection, migration, climbers, batch_size)
+    finally:
+        connection.close()
+
+    return pending
+
+
+class MigrateError(Exception):
+    """Raise if a database cannot be migrated."""
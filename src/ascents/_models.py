@@ -1,9 +1,106 @@
 import datetime
+import functools
+import itertools
+import json
 import re
 import sqlite3
+import time
+import urllib.parse
+import uuid
+import weakref
+from collections.abc import Callable, Collection, Hashable, Iterable, Iterator
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Self
+from typing import Any, Self, TypeVar
+
+from ascents._archive import Archive, read_archives, spanned_archives
+from ascents._cache import CacheInfo, ResultCache
+from ascents._index import NameIndex
+from ascents._metrics import (
+    COMMIT_DURATION,
+    METRICS,
+    count_vm_steps,
+    instrument_methods,
+)
+from ascents._init import (
+    DATE_STORAGES,
+    GRADE_RANK_SQL,
+    MONTH_SQL,
+    QUARTER_SQL,
+    SCHEMA_VERSION,
+    WEEK_SQL,
+    YEAR_SQL,
+    create_ascent_schema,
+    get_date_storage,
+    get_schema_version,
+    has_change_log,
+    has_climbers,
+    is_uri,
+)
+from ascents._profiles import ConnectionProfile, resolve_profile
+
+
+def check_grade(grade: str) -> None:
+    valid_yds = re.search(r"^5\.([0-9]|1[0-5][a-d])$", grade)
+
+    if valid_yds is None:
+        raise RouteError(
+            "grade must be in YDS with no pluses, minuses, or slashes "
+            "(translate as needed)"
+        )
+
+
+def check_date(date: datetime.date) -> None:
+    if date > datetime.date.today():
+        raise AscentError("date cannot be in the future")
+
+
+def grade_rank(grade: str) -> int:
+    match = re.search(r"^5\.([0-9]+)([a-d]?)$", grade)
+
+    if match is None:
+        raise RouteError(f"'{grade}' is not a YDS grade")
+
+    number, letter = match.groups()
+
+    return int(number) * 5 + " abcd".index(letter or " ")
+
+
+# The functions below are registered on every connection, so that grades
+# can be ranked and compared in SQL. Only a few distinct grades exist.
+@functools.lru_cache(256)
+def grade_rank_or_none(grade: str) -> int | None:
+    try:
+        return grade_rank(grade)
+    except RouteError:
+        return None
+
+
+def compare_grades(a: str, b: str) -> int:
+    # Invalid grades sort first, by text among themselves
+    def key(grade: str) -> tuple[bool, int, str]:
+        rank = grade_rank_or_none(grade)
+        return (rank is not None, rank or 0, grade)
+
+    return (key(a) > key(b)) - (key(a) < key(b))
+
+
+class MaxGrade:
+    """Aggregate that finds the hardest valid grade."""
+
+    def __init__(self) -> None:
+        self.grade: str | None = None
+        self.rank = -1
+
+    def step(self, grade: str) -> None:
+        rank = grade_rank_or_none(grade)
+
+        if rank is not None and rank > self.rank:
+            self.grade = grade
+            self.rank = rank
+
+    def finalize(self) -> str | None:
+        return self.grade
 
 
 class Route:
@@ -23,14 +120,7 @@ class Route:
 
     @grade.setter
     def grade(self, value: str) -> None:
-        valid_yds = re.search(r"^5\.([0-9]|1[0-5][a-d])$", value)
-
-        if valid_yds is None:
-            raise RouteError(
-                "grade must be in YDS with no pluses, minuses, or slashes "
-                "(translate as needed)"
-            )
-
+        check_grade(value)
         self._grade = value
 
     def __str__(self) -> str:
@@ -68,9 +158,7 @@ class Ascent:
 
     @date.setter
     def date(self, value: datetime.date) -> None:
-        if value > datetime.date.today():
-            raise AscentError("date cannot be in the future")
-
+        check_date(value)
         self._date = value
 
     def __str__(self) -> str:
@@ -92,7 +180,18 @@ def adapt_date(date: datetime.date) -> str:
     return date.isoformat()
 
 
+# Julian day number of the day before datetime.date.min
+JULIAN_DAY_OFFSET = 1721425
+
+
+# Every row goes through the converter, but the same few thousand days
+# come up again and again, so decoded dates are memoized
+@functools.lru_cache(maxsize=2**16)
 def convert_date(date: bytes) -> datetime.date:
+    # Dates are stored either as ISO text or as Julian day numbers
+    if date.isdigit():
+        return datetime.date.fromordinal(int(date) - JULIAN_DAY_OFFSET)
+
     return datetime.date.fromisoformat(date.decode())
 
 
@@ -100,43 +199,578 @@ sqlite3.register_adapter(datetime.date, adapt_date)
 sqlite3.register_converter("date", convert_date)
 
 
+# Key of each period's buckets, expressed in terms of the date column so
+# as to match the index that serves it
+PERIODS = {
+    "day": "date",
+    "week": WEEK_SQL.format("date"),
+    "month": MONTH_SQL.format("date"),
+    "quarter": QUARTER_SQL.format("date"),
+    "year": YEAR_SQL.format("date"),
+}
+
+# Bucket start date from a key that is not a date itself
+PERIOD_STARTS = {
+    "year": "{} || '-01-01'",
+}
+
+# Match the ascents_crag and ascents_year indexes
+TOP_K_GROUPS = {
+    "crag": "crag",
+    "year": YEAR_SQL.format("date"),
+}
+
+
+def adapt_filter(value: object) -> object:
+    return adapt_date(value) if isinstance(value, datetime.date) else value
+
+
+def next_bucket(bucket: datetime.date, period: str) -> datetime.date:
+    if period == "day":
+        return bucket + datetime.timedelta(days=1)
+
+    if period == "week":
+        return bucket + datetime.timedelta(weeks=1)
+
+    months = {"month": 1, "quarter": 3, "year": 12}[period]
+    index = bucket.year * 12 + bucket.month - 1 + months
+
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+T = TypeVar("T")
+
+
+def fill_buckets(
+    rows: list[tuple[datetime.date, T]],
+    period: str,
+    empty: T,
+) -> list[tuple[datetime.date, T]]:
+    filled: list[tuple[datetime.date, T]] = []
+
+    for bucket, value in rows:
+        if filled:
+            expected = next_bucket(filled[-1][0], period)
+
+            while expected < bucket:
+                filled.append((expected, empty))
+                expected = next_bucket(expected, period)
+
+        filled.append((bucket, value))
+
+    return filled
+
+
+# Collections of filter values up to this size are compiled to IN lists
+# of parameters, and larger ones to a single JSON array parameter
+IN_LIST_LIMIT = 64
+
+
 @dataclass(kw_only=True)
 class Search:
-    route: str | None = None
-    grade: str | None = None
-    crag: str | None = None
-    date: datetime.date | str | None = None
+    """Filters on ascents, each either one value or a collection of values
+    to match any of.
+    """
+
+    route: str | Collection[str] | None = None
+    grade: str | Collection[str] | None = None
+    crag: str | Collection[str] | None = None
+    date: datetime.date | str | Collection[datetime.date | str] | None = None
     glob: bool = False
 
 
+def normalize_filter(value: object) -> object:
+    # A date and its ISO string find the same ascents, and so do
+    # collections of the same values in any order
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+
+    if value is None or isinstance(value, str):
+        return value
+
+    assert isinstance(value, Collection)
+
+    return frozenset(map(normalize_filter, value))
+
+
+def search_key(search: Search) -> tuple[object, ...]:
+    filters = (search.route, search.grade, search.crag, search.date)
+
+    return (*map(normalize_filter, filters), search.glob)
+
+
+FILTER_COLUMNS = ("route", "grade", "crag", "date")
+
+# Shape of a filter: one value, a list of that many values or a JSON array
+FilterShape = tuple[str, int] | None
+
+# Shapes of the filters, glob, and the SQL templates for dates in and out
+SearchShape = tuple[tuple[FilterShape, ...], bool, str, str]
+
+
+def list_size(count: int) -> int:
+    # Lists are padded to the next power of two, so that searches for a
+    # few values each share a handful of statements rather than needing
+    # one per count
+    if count == 0:
+        return 0
+
+    return min(1 << (count - 1).bit_length(), max(count, IN_LIST_LIMIT))
+
+
+@functools.lru_cache(maxsize=256)
+def param_names(column: str, size: int) -> tuple[str, ...]:
+    return tuple(f"{column}_{i}" for i in range(size))
+
+
+# Statements are compiled once per shape of search, rather than on every
+# call, and the same shape always compiles to the same text, so that the
+# connection's statement cache gets to reuse the prepared statement
+@functools.lru_cache(maxsize=1024)
+def compile_where(
+    shapes: tuple[FilterShape, ...],
+    glob: bool,
+    date_in: str,
+    date_out: str,
+) -> str:
+    conditions = ["WHERE 1"]
+
+    for column, shape in zip(FILTER_COLUMNS, shapes):
+        if shape is None:
+            continue
+
+        if glob and column == "date":
+            column_sql = date_out.format("a.date")
+        else:
+            column_sql = f"a.{column}"
+
+        # Turns the SQL for a value into that for a stored value
+        value_in = date_in if column == "date" and not glob else "{}"
+        kind, size = shape
+
+        if kind == "value":
+            operator = "GLOB" if glob else "="
+            value_sql = value_in.format(f":{column}")
+
+            conditions.append(f"AND {column_sql} {operator} {value_sql}")
+        elif kind == "list" and glob:
+            names = param_names(column, size)
+            globs = " OR ".join(f"{column_sql} GLOB :{name}" for name in names)
+
+            conditions.append(f"AND ({globs or 0})")
+        elif kind == "list":
+            names = param_names(column, size)
+            in_list = ", ".join(value_in.format(f":{name}") for name in names)
+
+            conditions.append(f"AND {column_sql} IN ({in_list})")
+        else:
+            # A large set is passed as one JSON array rather than as many
+            # parameters, which SQLite turns into a temporary index to
+            # probe the column's index with
+            conditions.append(
+                f"AND {column_sql} IN "
+                f"(SELECT {value_in.format('value')} FROM json_each(:{column}))"
+            )
+
+    return " ".join(conditions)
+
+
+ORDERS = {
+    "date": "a.date DESC, {0} DESC, a.route, a.crag",
+    "grade": "{0} DESC, a.date DESC, a.route, a.crag",
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_ascents_query(
+    shapes: tuple[FilterShape, ...],
+    glob: bool,
+    date_in: str,
+    date_out: str,
+    order: str,
+) -> str:
+    where_clause = compile_where(shapes, glob, date_in, date_out)
+
+    return (
+        'SELECT a.route, a.grade, a.crag, a.date AS "date [date]" '
+        f"FROM ascents AS a {where_clause} "
+        f"ORDER BY {ORDERS[order].format(GRADE_RANK_SQL.format('a.grade'))}"
+    )
+
+
+RouteIndexCache = tuple[dict[str, dict[str | None, NameIndex]], int]
+
+
+@dataclass
+class Change:
+    seq: int
+    op: str
+    ascent: Ascent
+    climber: str | None = None
+
+
+@instrument_methods
 class AscentDB:
-    def __init__(self, database: Path) -> None:
-        if not database.exists():
+    def __init__(
+        self,
+        database: Path | str,
+        *,
+        read_only: bool = False,
+        profile: str | ConnectionProfile | None = None,
+        climber: str | None = None,
+        cache_size: int | None = None,
+        cache_ttl: float | None = None,
+    ) -> None:
+        uri = None
+        in_memory = database == ":memory:"
+        self._keepalive: sqlite3.Connection | None = None
+
+        if in_memory:
+            # Each context opens a new connection, so a private shared-cache
+            # database is kept alive (and initialized) by one more connection
+            # held until this object is closed or garbage collected
+            uri = f"file:ascents-{uuid.uuid4().hex}?mode=memory&cache=shared"
+            self._keepalive = sqlite3.connect(uri, uri=True, autocommit=False)
+            weakref.finalize(self, self._keepalive.close)
+            create_ascent_schema(self._keepalive)
+            self._keepalive.commit()
+        elif is_uri(database):
+            uri = database
+            path, _, query = database.removeprefix("file:").partition("?")
+            database = urllib.parse.unquote(path)
+            in_memory = dict(urllib.parse.parse_qsl(query)).get("mode") == "memory"
+
+        # SQLite would otherwise create an empty file, even given a URI
+        if not in_memory and not Path(database).exists():
             raise AscentDBError(
                 f"{database} not found, must be an already initialized ascent database"
             )
 
-        self._database = database
+        if read_only:
+            if uri is None:
+                uri = Path(database).resolve().as_uri()
+
+            path, _, query = uri.partition("?")
+            options = dict(urllib.parse.parse_qsl(query))
+
+            if options.get("mode", "ro") != "ro":
+                raise AscentDBError(
+                    f"{database} cannot be opened read-only "
+                    f"with mode={options['mode']}"
+                )
+
+            # Snapshots are never written to, so locking can be skipped
+            # entirely
+            options |= {"mode": "ro", "immutable": "1"}
+            uri = f"{path}?{urllib.parse.urlencode(options)}"
+
+        self._database = Path(database)
+        self._uri = uri
+        self._profile = resolve_profile(profile)
+        self._climber = climber
+
+        # Opt-in cache of ascents() results, kept across contexts so that
+        # its counters add up, but cleared on entering each one
+        self._cache: ResultCache[list[Ascent]] | None = None
+
+        if cache_size is not None:
+            self._cache = ResultCache(cache_size, cache_ttl)
+
+        # Route name indexes, with the data_version they were built at
+        self._route_index_cache: RouteIndexCache | None = None
+
+        # Name indexes built on demand, e.g. of crags, all dropped once the
+        # data_version they were built at is out of date
+        self._name_indexes: dict[Hashable, NameIndex] = {}
+        self._name_indexes_version: int | None = None
 
     def __enter__(self) -> Self:
         self._connection = sqlite3.connect(
-            database=self._database,
+            database=self._uri or self._database,
             detect_types=sqlite3.PARSE_COLNAMES,
-            autocommit=False,
+            autocommit=True,
+            uri=self._uri is not None,
         )
 
-        self._cursor = self._connection.cursor()
+        # __exit__ is not called when __enter__ raises, so the connection
+        # is closed here on any error
+        try:
+            self._set_up_connection()
+        except BaseException:
+            self._connection.close()
+            raise
 
         return self
 
+    def _set_up_connection(self) -> None:
+        if METRICS.enabled:
+            self._vm_steps = count_vm_steps(self._connection)
+
+        self._connection.create_function(
+            "grade_rank", 1, grade_rank_or_none, deterministic=True
+        )
+        self._connection.create_collation("YDS", compare_grades)
+        # The stubs only allow for aggregates of integers
+        self._connection.create_aggregate("max_grade", 1, MaxGrade)  # type: ignore[arg-type]
+
+        # Some pragmas cannot be changed inside a transaction, so they are
+        # applied before switching over to always having one open
+        for pragma in self._profile.pragmas():
+            self._connection.execute(pragma)
+
+        self._connection.autocommit = False
+
+        self._date_storage = get_date_storage(self._connection)
+
+        # SQL templates to turn an ISO date into a stored date and back
+        if self._date_storage == "julian":
+            self._date_in = DATE_STORAGES["julian"][1]
+            self._date_out = "date({})"
+        else:
+            self._date_in = self._date_out = "{}"
+
+        version = get_schema_version(self._connection)
+
+        # Older schemas still work, if more slowly, until migrated
+        if version > SCHEMA_VERSION:
+            raise AscentDBError(
+                f"{self.name} has schema version {version}, newer than the "
+                f"latest known version {SCHEMA_VERSION}"
+            )
+
+        self._multi_climber = has_climbers(self._connection)
+
+        if self._climber is not None and not self._multi_climber:
+            raise AscentDBError(
+                f"{self.name} is not a multi-climber database, "
+                "a climber cannot be given"
+            )
+
+        # Archives are only attached once a query spans them, each as the
+        # schema name and the SQL for its dates in this database's storage.
+        # The registry is read again whenever another connection writes,
+        # as it may have archived ascents in the meantime.
+        self._archives: dict[str, Archive] = {}
+        self._archives_version: int | None = None
+        self._attached: dict[str, tuple[str, str]] = {}
+
+        self._create_view()
+
+        self._cursor = self._connection.cursor()
+
+        # data_version is only comparable within a single connection
+        self._clear_cache()
+
     def __exit__(self, exc_type, exc_value, traceback) -> None:  # type: ignore[no-untyped-def]
         self._connection.close()
 
+    def _create_view(self) -> None:
+        # Reads go through a temporary view that shadows the live table
+        # with just this climber's ascents and those of attached archives,
+        # so queries need no changes. Views cannot be written to, so writes
+        # target main.ascents, and archived ascents are only ever read.
+        if self._climber is None and not self._attached:
+            return
+
+        if self._climber is None:
+            scope = ""
+        else:
+            climber = self._climber.replace("'", "''")
+            scope = f"WHERE climber = '{climber}'"
+
+        sources = [("main", "date"), *self._attached.values()]
+
+        # Climbers are told apart when reading a shared database unscoped
+        if self._multi_climber and self._climber is None:
+            columns = "climber, route, grade, crag"
+        else:
+            columns = "route, grade, crag"
+
+        selects = [
+            f"""
+            SELECT {columns}, {date_sql} AS date
+            FROM {schema}.ascents
+            {scope}
+            """
+            for schema, date_sql in sources
+        ]
+
+        self._connection.execute("DROP VIEW IF EXISTS temp.ascents")
+        self._connection.execute(
+            "CREATE TEMP VIEW ascents AS " + "UNION ALL".join(selects)
+        )
+
+        self._connection.commit()
+
+    def _read_archives(self) -> None:
+        # Not data_version(), which would end the read transaction that
+        # callers may be streaming rows from. Within a read transaction,
+        # the version and the registry are of the same snapshot.
+        (version,) = self._connection.execute("PRAGMA data_version").fetchone()
+
+        if version != self._archives_version:
+            archives = read_archives(self._connection)
+            self._archives = {archive.name: archive for archive in archives}
+            self._archives_version = version
+
+    def _use_archives(self, search: Search | None = None) -> None:
+        """Attach the archives that a search (by default, any query) spans."""
+        self._read_archives()
+
+        if not self._archives:
+            return
+
+        archives: Iterable[Archive] = self._archives.values()
+
+        # Archives holding no dates the search can match are left out
+        if search is not None:
+            archives = spanned_archives(archives, search.date, search.glob)
+
+        pending = [
+            archive for archive in archives if archive.name not in self._attached
+        ]
+
+        if not pending:
+            return
+
+        limit = self._connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+
+        if len(self._attached) + len(pending) > limit:
+            raise AscentDBError(
+                f"{self.name} has more archives than can be attached at once "
+                f"({limit}), archive by decade rather than by year"
+            )
+
+        # Databases cannot be attached within a transaction
+        self._connection.autocommit = True
+
+        try:
+            for archive in pending:
+                path = self._database.parent / archive.path
+
+                if not path.exists():
+                    raise AscentDBError(f"Archive {path} not found")
+
+                if self._uri is None:
+                    location = str(path)
+                else:
+                    # Opened as the database itself was, e.g. read-only
+                    location = path.resolve().as_uri()
+                    options = self._uri.partition("?")[2]
+                    location += f"?{options}" if options else ""
+
+                schema = f"archive_{len(self._attached)}"
+                self._connection.execute(f"ATTACH DATABASE ? AS {schema}", (location,))
+
+                # An archive may have been converted to another date storage
+                if get_date_storage(self._connection, schema) == self._date_storage:
+                    date_sql = "date"
+                else:
+                    _, encode = DATE_STORAGES[self._date_storage]
+                    date_sql = encode.format("date(date)")
+
+                self._attached[archive.name] = (schema, date_sql)
+        finally:
+            self._connection.autocommit = False
+
+        self._create_view()
+
+    def close(self) -> None:
+        """Free the in-memory database, if any. Its ascents are gone for
+        good, so the object must not be entered again.
+        """
+        if self._keepalive is not None:
+            self._keepalive.close()
+
     @property
     def name(self) -> str:
-        return self._database.name
+        if self._climber is None:
+            return self._database.name
+
+        return f"{self._database.name} ({self._climber})"
+
+    @property
+    def climber(self) -> str | None:
+        return self._climber
+
+    def _commit(self) -> None:
+        start = time.perf_counter()
+        self._connection.commit()
+
+        if METRICS.enabled:
+            COMMIT_DURATION.observe(time.perf_counter() - start)
+
+        self._clear_cache()
+
+    def _clear_cache(self) -> None:
+        if self._cache is not None:
+            self._cache.clear()
+
+        self._route_index_cache = None
+        self._name_indexes = {}
+
+    def _name_index(
+        self,
+        key: Hashable,
+        names: Callable[[], Iterable[str]],
+    ) -> NameIndex:
+        """Return the index of names kept under key, building it first if
+        it is missing or the ascents have changed since it was built.
+        """
+        version = self.data_version()
+
+        if version != self._name_indexes_version:
+            self._name_indexes = {}
+            self._name_indexes_version = version
+
+        if key not in self._name_indexes:
+            self._name_indexes[key] = NameIndex(names())
+
+        return self._name_indexes[key]
+
+    def data_version(self) -> int:
+        """Return a number that changes whenever another connection has
+        written to the database.
+        """
+        # Writes by other connections only show in data_version once the
+        # current read transaction has ended, and reading it takes a read
+        # lock of its own. Writes through this connection never show, so
+        # they clear the cache instead.
+        self._connection.commit()
+        (version,) = self._connection.execute("PRAGMA data_version").fetchone()
+        self._connection.commit()
+
+        return int(version)
+
+    def release(self) -> None:
+        """End the current read transaction, so that other connections can
+        write while this one sits idle.
+        """
+        self._connection.commit()
+
+    def cache_info(self) -> CacheInfo | None:
+        return None if self._cache is None else self._cache.info()
+
+    def _check_writable(self) -> None:
+        if self._multi_climber and self._climber is None:
+            raise AscentDBError(
+                f"{self.name} is a multi-climber database, a climber is required"
+            )
+
+    def _scope(self, params: dict[str, Any]) -> str:
+        """Limit a statement on a shared table to the climber's rows, if
+        any, and return the condition to add to its WHERE clause.
+        """
+        if self._climber is None:
+            return ""
+
+        params["climber"] = self._climber
+
+        return "AND climber = :climber"
 
     def crags(self) -> list[str]:
+        self._use_archives()
+
         crags = []
 
         self._cursor.execute(
@@ -152,10 +786,63 @@ class AscentDB:
 
         return crags
 
+    def routes(self) -> list[str]:
+        self._use_archives()
+
+        self._cursor.execute(
+            """
+            SELECT DISTINCT route
+            FROM ascents
+            ORDER BY route
+            """
+        )
+
+        return [row[0] for row in self._cursor]
+
+    def crag_exists(self, crag: str) -> bool:
+        self._use_archives()
+
+        self._cursor.execute(
+            """
+            SELECT EXISTS(
+                SELECT 1
+                FROM ascents
+                WHERE crag = ?
+            )
+            """,
+            (crag,),
+        )
+
+        return bool(self._cursor.fetchone()[0])
+
+    def similar_crags(self, crag: str, limit: int = 5) -> list[str]:
+        # Only ever called for crags not found, but in a row of them (as
+        # in the shell) the index is built just once
+        index = self._name_index("crags", self.crags)
+
+        return index.similar(crag, limit=limit)
+
+    def is_empty(self) -> bool:
+        self._use_archives()
+
+        self._cursor.execute(
+            """
+            SELECT NOT EXISTS(
+                SELECT 1
+                FROM ascents
+            )
+            """
+        )
+
+        return bool(self._cursor.fetchone()[0])
+
     def log_ascent(self, ascent: Ascent) -> None:
+        self._check_writable()
+        self._use_archives()
+
         self._cursor.execute(
             """
-            SELECT date
+            SELECT date AS "date [date]"
             FROM ascents
             WHERE route = ? AND grade = ? AND crag = ?
             """,
@@ -169,17 +856,33 @@ class AscentDB:
                 f"That ascent was already logged with a date of {row[0]}"
             )
 
+        params = {
+            "route": ascent.route.name,
+            "grade": ascent.route.grade,
+            "crag": ascent.route.crag,
+            "date": ascent.date,
+        }
+
+        if self._climber is None:
+            columns = values = ""
+        else:
+            params["climber"] = self._climber
+            columns = "climber, "
+            values = ":climber, "
+
         self._cursor.execute(
-            """
-            INSERT INTO ascents(route, grade, crag, date)
-            VALUES(?, ?, ?, ?)
+            f"""
+            INSERT INTO main.ascents({columns}route, grade, crag, date)
+            VALUES({values}:route, :grade, :crag, {self._date_in.format(":date")})
             """,
-            (ascent.route.name, ascent.route.grade, ascent.route.crag, ascent.date),
+            params,
         )
 
-        self._connection.commit()
+        self._commit()
 
     def find_ascent(self, route: Route) -> Ascent:
+        self._use_archives()
+
         self._cursor.execute(
             """
             SELECT date AS "date [date]"
@@ -199,6 +902,9 @@ class AscentDB:
         return Ascent(route, date)
 
     def drop_ascent(self, route: Route) -> None:
+        self._check_writable()
+        self._use_archives()
+
         self._cursor.execute(
             """
             SELECT 1
@@ -213,17 +919,26 @@ class AscentDB:
         if row is None:
             raise AscentDBError("No ascent found matching provided route")
 
+        params = {"route": route.name, "grade": route.grade, "crag": route.crag}
+        scope = self._scope(params)
+
         self._cursor.execute(
-            """
-            DELETE FROM ascents
-            WHERE route = ? AND grade = ? AND crag = ?
+            f"""
+            DELETE FROM main.ascents
+            WHERE route = :route AND grade = :grade AND crag = :crag {scope}
             """,
-            (route.name, route.grade, route.crag),
+            params,
         )
 
-        self._connection.commit()
+        if self._cursor.rowcount == 0:
+            self._connection.rollback()
+            raise AscentDBError("That ascent is archived and cannot be dropped")
+
+        self._commit()
 
     def total_count(self) -> int:
+        self._use_archives()
+
         self._cursor.execute(
             """
             SELECT count(*)
@@ -236,18 +951,25 @@ class AscentDB:
         return total_count
 
     def year_counts(self) -> list[tuple[int, int]]:
+        self._use_archives()
+
+        year = YEAR_SQL.format("date")
+
+        # Grouped by the ascents_year key itself so that the index is used
         self._cursor.execute(
-            """
-            SELECT CAST(strftime('%Y', date) AS INTEGER) AS year, count(*)
+            f"""
+            SELECT CAST({year} AS INTEGER), count(*)
             FROM ascents
-            GROUP BY year
-            ORDER BY year
+            GROUP BY {year}
+            ORDER BY {year}
             """
         )
 
         return self._cursor.fetchall()
 
     def crag_counts(self) -> list[tuple[str, int]]:
+        self._use_archives()
+
         self._cursor.execute(
             """
             SELECT crag, count(*)
@@ -260,22 +982,22 @@ class AscentDB:
         return self._cursor.fetchall()
 
     def grade_counts(self) -> list[tuple[str, int]]:
+        self._use_archives()
+
         self._cursor.execute(
             """
-            SELECT grade_counts.grade, grade_counts.count
-            FROM (
-                SELECT grade, count(*) AS count
-                FROM ascents
-                GROUP BY grade
-            ) AS grade_counts
-            LEFT JOIN grade_info USING(grade)
-            ORDER BY grade_info.grade_number, grade_info.grade_letter
+            SELECT grade, count(*)
+            FROM ascents
+            GROUP BY grade
+            ORDER BY grade COLLATE YDS
             """
         )
 
         return self._cursor.fetchall()
 
     def latest_date(self) -> datetime.date | None:
+        self._use_archives()
+
         self._cursor.execute(
             """
             SELECT max(date) AS "latest_date [date]"
@@ -288,12 +1010,13 @@ class AscentDB:
         return latest_date
 
     def max_grade(self) -> str | None:
+        self._use_archives()
+
         self._cursor.execute(
-            """
-            SELECT ascents.grade
+            f"""
+            SELECT grade
             FROM ascents
-            LEFT JOIN grade_info USING(grade)
-            ORDER BY grade_info.grade_number DESC, grade_info.grade_letter DESC
+            ORDER BY {GRADE_RANK_SQL.format("grade")} DESC
             LIMIT 1
             """
         )
@@ -308,91 +1031,548 @@ class AscentDB:
         return max_grade
 
     def max_grade_by_year(self) -> list[tuple[int, str]]:
+        self._use_archives()
+
+        year = YEAR_SQL.format("date")
+
+        # With a bare max(), SQLite takes grade from the row with the max
+        # rank, which the ascents_year index yields for each year in turn
         self._cursor.execute(
-            """
-            WITH year_and_grade AS (
-                SELECT CAST(strftime('%Y', date) AS INTEGER) AS year, grade
+            f"""
+            SELECT CAST(year AS INTEGER), grade
+            FROM (
+                SELECT {year} AS year, grade, max({GRADE_RANK_SQL.format("grade")})
                 FROM ascents
-            ),
-            grade_sorted_within_year AS (
-                SELECT yg.year, yg.grade, row_number() OVER win AS row_number
-                FROM year_and_grade AS yg
-                LEFT JOIN grade_info AS g USING(grade)
-                WINDOW win AS (
-                    PARTITION BY yg.year
-                    ORDER BY g.grade_number DESC, g.grade_letter DESC
-                )
+                GROUP BY {year}
             )
-            SELECT year, grade
-            FROM grade_sorted_within_year
-            WHERE row_number = 1
             ORDER BY year
             """
         )
 
         return self._cursor.fetchall()
 
+    def dated_grades(self) -> Iterator[tuple[datetime.date, str]]:
+        self._use_archives()
+
+        # Separate cursor so that the rows can be streamed while other
+        # queries run
+        cursor = self._connection.execute(
+            """
+            SELECT date AS "date [date]", grade
+            FROM ascents
+            ORDER BY date
+            """
+        )
+
+        yield from cursor
+
+    def changes_since(self, seq: int = 0) -> Iterator[Change]:
+        """Stream changes logged after seq, in the order they were made.
+
+        Updates are logged as a delete followed by an insert.
+        """
+        if not has_change_log(self._connection):
+            raise AscentDBError(f"{self.name} has no change log")
+
+        params: dict[str, Any] = {"seq": seq}
+
+        if self._multi_climber:
+            climber_sql = "climber"
+        else:
+            climber_sql = "NULL"
+
+        scope = self._scope(params)
+
+        # Separate cursor so that the rows can be streamed while other
+        # queries run
+        cursor = self._connection.execute(
+            f"""
+            SELECT seq, op, {climber_sql}, route, grade, crag, date AS "date [date]"
+            FROM changes
+            WHERE seq > :seq {scope}
+            ORDER BY seq
+            """,
+            params,
+        )
+
+        for seq, op, climber, route, grade, crag, date in cursor:
+            yield Change(seq, op, Ascent(Route(route, grade, crag), date), climber)
+
+    def _check_period(self, period: str) -> None:
+        if period not in PERIODS:
+            raise AscentDBError(
+                f"Invalid period '{period}', valid options are {set(PERIODS)}"
+            )
+
+    def counts_by(self, period: str) -> list[tuple[datetime.date, int]]:
+        self._check_period(period)
+        self._use_archives()
+
+        key = PERIODS[period]
+        start = PERIOD_STARTS.get(period, "{}").format(key)
+
+        self._cursor.execute(
+            f"""
+            SELECT {start} AS "bucket [date]", count(*)
+            FROM ascents
+            GROUP BY {key}
+            ORDER BY {key}
+            """
+        )
+
+        return fill_buckets(self._cursor.fetchall(), period, 0)
+
+    def max_grade_by(self, period: str) -> list[tuple[datetime.date, str | None]]:
+        self._check_period(period)
+        self._use_archives()
+
+        key = PERIODS[period]
+        start = PERIOD_STARTS.get(period, "{}").format(key)
+
+        self._cursor.execute(
+            f"""
+            SELECT {start} AS "bucket [date]", max_grade(grade)
+            FROM ascents
+            GROUP BY {key}
+            ORDER BY {key}
+            """
+        )
+
+        rows: list[tuple[datetime.date, str | None]] = self._cursor.fetchall()
+
+        return fill_buckets(rows, period, None)
+
+    def top_k(
+        self,
+        k: int,
+        by: str | None = None,
+    ) -> dict[str | int | None, list[Ascent]]:
+        """Find the k hardest ascents overall, or per crag or year."""
+        if k < 1:
+            raise AscentDBError("k must be at least 1")
+
+        self._use_archives()
+
+        order = f"{GRADE_RANK_SQL.format('grade')} DESC, date DESC, route, crag"
+        params: dict[str, Any] = {"k": k}
+
+        if by is None:
+            self._cursor.execute(
+                f"""
+                SELECT NULL, route, grade, crag, date AS "date [date]"
+                FROM ascents
+                ORDER BY {order}
+                LIMIT :k
+                """,
+                params,
+            )
+        else:
+            if by not in TOP_K_GROUPS:
+                raise AscentDBError(
+                    f"Invalid group '{by}', valid options are {set(TOP_K_GROUPS)}"
+                )
+
+            group = TOP_K_GROUPS[by]
+            scope = self._scope(params)
+            sources = [("main", "date"), *self._attached.values()]
+
+            # Rather than ranking every ascent, the k hardest of each group
+            # are looked up by walking its index in grade order, so the
+            # cost is proportional to k times the number of groups. The
+            # lookups go through each table (live and archived) to get at
+            # rowids, and the k hardest of those found are kept.
+            tops = " UNION ALL ".join(
+                f"""
+                SELECT g.grp, a.route, a.grade, a.crag, {date_sql} AS date
+                FROM groups AS g
+                JOIN {schema}.ascents AS a ON a.rowid IN (
+                    SELECT rowid
+                    FROM {schema}.ascents
+                    WHERE {group} = g.grp {scope}
+                    ORDER BY {order}
+                    LIMIT :k
+                )
+                """
+                for schema, date_sql in sources
+            )
+
+            self._cursor.execute(
+                f"""
+                WITH groups AS (
+                    SELECT DISTINCT {group} AS grp
+                    FROM ascents
+                ),
+                top AS (
+                    SELECT *, row_number() OVER (PARTITION BY grp ORDER BY {order})
+                        AS rank
+                    FROM ({tops})
+                )
+                SELECT grp, route, grade, crag, date AS "date [date]"
+                FROM top
+                WHERE rank <= :k
+                ORDER BY grp, rank
+                """,
+                params,
+            )
+
+        top: dict[str | int | None, list[Ascent]] = {}
+
+        for group_value, name, grade, crag, date in self._cursor:
+            if by == "year":
+                group_value = int(group_value)
+
+            top.setdefault(group_value, []).append(
+                Ascent(Route(name, grade, crag), date)
+            )
+
+        return top
+
+    def _compile_search(self, search: Search) -> tuple[SearchShape, dict[str, Any]]:
+        # Only the values vary between searches of the same shape, so
+        # they are bound as parameters named after their position
+        filters = (search.route, search.grade, search.crag, search.date)
+
+        shapes: list[FilterShape] = []
+        params: dict[str, Any] = {}
+
+        for column, value in zip(FILTER_COLUMNS, filters):
+            if value is None:
+                shapes.append(None)
+            elif isinstance(value, (str, datetime.date)):
+                shapes.append(("value", 1))
+                params[column] = value
+            elif search.glob or len(value) <= IN_LIST_LIMIT:
+                values = list(value)
+                size = list_size(len(values))
+
+                # Repeating a value matches nothing more
+                values += values[-1:] * (size - len(values))
+
+                shapes.append(("list", size))
+                params |= zip(param_names(column, size), values)
+            else:
+                shapes.append(("json", 0))
+                params[column] = json.dumps(list(map(adapt_filter, value)))
+
+        shape = (tuple(shapes), search.glob, self._date_in, self._date_out)
+
+        return shape, params
+
+    def _where_clause(self, search: Search) -> tuple[str, dict[str, Any]]:
+        shape, params = self._compile_search(search)
+
+        return compile_where(*shape), params
+
+    def _count_where(self, where_clause: str, params: dict[str, Any]) -> int:
+        # Only live ascents can be changed, so only they are counted
+        scope = self._scope(params)
+
+        self._cursor.execute(
+            f"""
+            SELECT count(*)
+            FROM main.ascents AS a
+            {where_clause} {scope}
+            """,
+            params,
+        )
+
+        count: int = self._cursor.fetchone()[0]
+
+        return count
+
     def ascents(
         self,
         search: Search | None = None,
         order: str = "date",
     ) -> list[Ascent]:
-        orders = {"date", "grade"}
-
-        if order not in orders:
-            raise AscentDBError(f"Invalid order '{order}', valid options are {orders}")
+        if order not in ORDERS:
+            raise AscentDBError(
+                f"Invalid order '{order}', valid options are {set(ORDERS)}"
+            )
 
         if search is None:
             search = Search()
 
-        filters = {
-            "route": search.route,
-            "grade": search.grade,
-            "crag": search.crag,
-            "date": search.date,
+        if self._cache is not None:
+            key = (search_key(search), order)
+            version = self.data_version()
+            cached = self._cache.get(key, version)
+
+            if cached is not None:
+                return list(cached)
+
+        self._use_archives(search)
+
+        shape, params = self._compile_search(search)
+        statement = compile_ascents_query(*shape, order)
+
+        self._cursor.execute(statement, params)
+
+        ascents = []
+
+        for name, grade, crag, date in self._cursor:
+            ascents.append(Ascent(Route(name, grade, crag), date))
+
+        if self._cache is not None:
+            # Cached results are served without a read transaction, so
+            # none is left holding locks either
+            self._connection.commit()
+            self._cache.put(key, version, ascents)
+
+            # Callers get their own list to modify
+            return list(ascents)
+
+        return ascents
+
+    def drop_where(self, search: Search, dry_run: bool = False) -> int:
+        self._check_writable()
+        where_clause, params = self._where_clause(search)
+
+        if dry_run:
+            return self._count_where(where_clause, params)
+
+        scope = self._scope(params)
+
+        self._cursor.execute(
+            f"""
+            DELETE FROM main.ascents AS a
+            {where_clause} {scope}
+            """,
+            params,
+        )
+
+        count = self._cursor.rowcount
+        self._commit()
+
+        return count
+
+    def update_where(
+        self,
+        search: Search,
+        *,
+        route: str | None = None,
+        grade: str | None = None,
+        crag: str | None = None,
+        date: datetime.date | None = None,
+        dry_run: bool = False,
+    ) -> int:
+        changes = {
+            "route": route,
+            "grade": grade,
+            "crag": crag,
+            "date": date,
         }
 
-        params = {
-            column: value for column, value in filters.items() if value is not None
+        changes = {
+            column: value for column, value in changes.items() if value is not None
         }
 
-        compare = "GLOB" if search.glob else "="
-        where_clause = "WHERE 1 "
+        if not changes:
+            raise AscentDBError("No changes provided")
 
-        conditions = " ".join(
-            [f"AND a.{column} {compare} :{column}" for column, _ in params.items()]
-        )
+        if grade is not None:
+            check_grade(grade)
 
-        where_clause += conditions
+        if date is not None:
+            check_date(date)
 
-        order_by_clause = "ORDER BY "
-        date_order = "a.date DESC, "
-        grade_order = "g.grade_number DESC, g.grade_letter DESC, "
-        rest_order = "a.route, a.crag"
+        self._check_writable()
+        where_clause, params = self._where_clause(search)
 
-        if order == "date":
-            order_by_clause += date_order + grade_order
-        else:
-            order_by_clause += grade_order + date_order
+        if dry_run:
+            return self._count_where(where_clause, params)
+
+        scope = self._scope(params)
+
+        assignments = []
+
+        for column in changes:
+            value_sql = f":new_{column}"
+
+            if column == "date":
+                value_sql = self._date_in.format(value_sql)
+
+            assignments.append(f"{column} = {value_sql}")
+
+        set_clause = "SET " + ", ".join(assignments)
+
+        params |= {f"new_{column}": value for column, value in changes.items()}
+
+        # Archived ascents are not covered by the primary key, so changed
+        # keys are checked against them through the view instead
+        key_changes = sorted(changes.keys() & {"route", "grade", "crag"})
+
+        if key_changes:
+            self._use_archives()
+
+        try:
+            self._cursor.execute(
+                f"""
+                UPDATE main.ascents AS a
+                {set_clause}
+                {where_clause} {scope}
+                """,
+                params,
+            )
+            count = self._cursor.rowcount
+
+            if key_changes and self._attached:
+                condition = " AND ".join(
+                    f"{column} = :new_{column}" for column in key_changes
+                )
+
+                self._cursor.execute(
+                    f"""
+                    SELECT 1
+                    FROM ascents
+                    WHERE {condition}
+                    GROUP BY route, grade, crag
+                    HAVING count(*) > 1
+                    LIMIT 1
+                    """,
+                    params,
+                )
+
+                if self._cursor.fetchone() is not None:
+                    raise sqlite3.IntegrityError("duplicate of an archived ascent")
+        except sqlite3.IntegrityError as e:
+            self._connection.rollback()
 
-        order_by_clause += rest_order
+            raise AscentDBError(
+                "Those changes would make some ascents duplicates of each other"
+            ) from e
+
+        self._commit()
+
+        return count
+
+    def _route_indexes(self) -> dict[str, dict[str | None, NameIndex]]:
+        """Return trigram indexes of route names by crag and then climber
+        (None unless the database is shared and unscoped), for duplicates()
+        to probe every route.
 
-        statement = f"""
-        SELECT a.route, a.grade, a.crag, a.date AS "date [date]"
-        FROM ascents AS a
-        LEFT JOIN grade_info AS g USING(grade)
-        {where_clause}
-        {order_by_clause}
+        The indexes are built once and kept until the ascents change, so
+        repeated lookups do not pay for indexing every route again.
         """
+        version = self.data_version()
 
-        self._cursor.execute(statement, params)
+        if self._route_index_cache is not None:
+            cached, indexed_version = self._route_index_cache
 
-        ascents = []
+            if indexed_version == version:
+                return cached
 
-        for name, grade, crag, date in self._cursor:
-            ascents.append(Ascent(Route(name, grade, crag), date))
+        self._use_archives()
 
-        return ascents
+        climber_sql = self._climber_sql()
+        indexes: dict[str, dict[str | None, NameIndex]] = {}
+
+        self._cursor.execute(
+            f"""
+            SELECT DISTINCT crag, {climber_sql}, route
+            FROM ascents
+            """
+        )
+
+        for crag, climber, route in self._cursor:
+            crag_indexes = indexes.setdefault(crag, {})
+            crag_indexes.setdefault(climber, NameIndex()).add(route)
+
+        self._connection.commit()
+        self._route_index_cache = (indexes, version)
+
+        return indexes
+
+    def _climber_sql(self) -> str:
+        # Routes of different climbers sharing a database are not
+        # duplicates of each other, so they are told apart by climber
+        if self._multi_climber and self._climber is None:
+            return "climber"
+
+        return "NULL"
+
+    def _crag_routes(self, crag: str) -> list[str]:
+        self._use_archives()
+
+        self._cursor.execute(
+            """
+            SELECT DISTINCT route
+            FROM ascents
+            WHERE crag = ?
+            """,
+            (crag,),
+        )
+
+        return [row[0] for row in self._cursor]
+
+    def find_similar(self, route: Route, threshold: float = 0.7) -> list[Ascent]:
+        # Just the crag's routes are indexed, via the ascents_crag index,
+        # and the index is kept for further lookups at the same crag
+        index = self._name_index(
+            ("routes", route.crag), lambda: self._crag_routes(route.crag)
+        )
+        names = index.similar(route.name, threshold)
+
+        if not names:
+            return []
+
+        ascents = self.ascents(Search(route=names, crag=route.crag))
+
+        return [ascent for ascent in ascents if ascent.route != route]
+
+    def duplicates(self, threshold: float = 0.7) -> list[list[Ascent]]:
+        indexes = self._route_indexes()
+
+        self._cursor.execute(
+            f"""
+            SELECT crag, {self._climber_sql()}, route, grade, date AS "date [date]"
+            FROM ascents
+            ORDER BY crag, 2, route
+            """
+        )
+
+        duplicates: list[list[Ascent]] = []
+
+        # Only routes at the same crag (and of the same climber) can be
+        # duplicates of each other, so routes are clustered by probing
+        # the (small) index of their own group rather than by comparing
+        # every pair
+        groups = itertools.groupby(self._cursor, key=lambda row: row[:2])
+
+        for (crag, climber), rows in groups:
+            ascents = [
+                Ascent(Route(name, grade, crag), date)
+                for _, _, name, grade, date in rows
+            ]
+
+            parents = {ascent.route.name: ascent.route.name for ascent in ascents}
+
+            # Ascents logged by another connection in the meantime are
+            # indexed on the spot
+            index = indexes.get(crag, {}).get(climber) or NameIndex(parents)
+
+            def find(name: str) -> str:
+                while parents[name] != name:
+                    parents[name] = parents[parents[name]]
+                    name = parents[name]
+
+                return name
+
+            for name in list(parents):
+                for other in index.similar(name, threshold):
+                    if other in parents:
+                        parents[find(other)] = find(name)
+
+            clusters: dict[str, list[Ascent]] = {}
+
+            for ascent in ascents:
+                clusters.setdefault(find(ascent.route.name), []).append(ascent)
+
+            duplicates.extend(
+                cluster for cluster in clusters.values() if len(cluster) > 1
+            )
+
+        return duplicates
 
 
 class RouteError(Exception):
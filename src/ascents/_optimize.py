@@ -0,0 +1,89 @@
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+PAGE_SIZES = {2**power for power in range(9, 17)}
+
+
+@dataclass
+class DatabaseStats:
+    size: int
+    page_size: int
+    page_count: int
+    freelist_count: int
+    auto_vacuum: int
+
+
+@dataclass
+class OptimizeReport:
+    before: DatabaseStats
+    after: DatabaseStats
+    timings: list[tuple[str, float]]
+
+
+def database_stats(connection: sqlite3.Connection, database: Path) -> DatabaseStats:
+    def pragma(name: str) -> int:
+        value: int = connection.execute(f"PRAGMA {name}").fetchone()[0]
+        return value
+
+    return DatabaseStats(
+        size=database.stat().st_size,
+        page_size=pragma("page_size"),
+        page_count=pragma("page_count"),
+        freelist_count=pragma("freelist_count"),
+        auto_vacuum=pragma("auto_vacuum"),
+    )
+
+
+def optimize_ascent_db(
+    database: Path,
+    *,
+    vacuum: bool = False,
+    page_size: int | None = None,
+) -> OptimizeReport:
+    if not database.exists():
+        raise OptimizeError(f"{database} not found, cannot optimize")
+
+    if page_size is not None and page_size not in PAGE_SIZES:
+        raise OptimizeError("page size must be a power of two between 512 and 65536")
+
+    # VACUUM cannot run inside a transaction
+    connection = sqlite3.connect(database, autocommit=True)
+
+    timings = []
+
+    def timed(step: str, *statements: str) -> None:
+        start = time.perf_counter()
+
+        for statement in statements:
+            connection.execute(statement).fetchall()
+
+        timings.append((step, time.perf_counter() - start))
+
+    try:
+        before = database_stats(connection, database)
+
+        timed("analyze", "ANALYZE", "PRAGMA optimize")
+
+        if vacuum or page_size is not None:
+            # A full rewrite is also the only way to switch a database
+            # created without auto_vacuum over to incremental vacuuming
+            timed(
+                "vacuum",
+                f"PRAGMA page_size = {page_size or before.page_size}",
+                "PRAGMA auto_vacuum = INCREMENTAL",
+                "VACUUM",
+            )
+        elif before.auto_vacuum == 2:
+            timed("incremental vacuum", "PRAGMA incremental_vacuum")
+
+        after = database_stats(connection, database)
+    finally:
+        connection.close()
+
+    return OptimizeReport(before, after, timings)
+
+
+class OptimizeError(Exception):
+    """Raise if a database cannot be optimized."""
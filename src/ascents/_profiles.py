@@ -0,0 +1,122 @@
+import os
+import tomllib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+PROFILE_ENV_VAR = "ASCENTS_PROFILE"
+CONFIG_ENV_VAR = "ASCENTS_CONFIG"
+DEFAULT_PROFILE = "safe-default"
+
+TEMP_STORES = {"DEFAULT", "FILE", "MEMORY"}
+SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+@dataclass(frozen=True, kw_only=True)
+class ConnectionProfile:
+    mmap_size: int = 0
+    cache_size: int = -2000
+    temp_store: str = "DEFAULT"
+    synchronous: str = "FULL"
+
+    def __post_init__(self) -> None:
+        for name in ("mmap_size", "cache_size"):
+            if type(getattr(self, name)) is not int:
+                raise ProfileError(f"{name} must be an integer")
+
+        if self.temp_store not in TEMP_STORES:
+            raise ProfileError(f"temp_store must be one of {TEMP_STORES}")
+
+        if self.synchronous not in SYNCHRONOUS_LEVELS:
+            raise ProfileError(f"synchronous must be one of {SYNCHRONOUS_LEVELS}")
+
+    def pragmas(self) -> list[str]:
+        return [
+            f"PRAGMA mmap_size = {self.mmap_size}",
+            f"PRAGMA cache_size = {self.cache_size}",
+            f"PRAGMA temp_store = {self.temp_store}",
+            f"PRAGMA synchronous = {self.synchronous}",
+        ]
+
+
+PROFILES = {
+    # SQLite's own defaults
+    "safe-default": ConnectionProfile(),
+    # Durability is traded for speed, only for loads that can be redone
+    "bulk-load": ConnectionProfile(
+        cache_size=-65536,
+        temp_store="MEMORY",
+        synchronous="OFF",
+    ),
+    # Memory-mapped reads and a 64 MiB page cache for full-scan aggregates
+    "read-analytics": ConnectionProfile(
+        mmap_size=256 * 2**20,
+        cache_size=-65536,
+        temp_store="MEMORY",
+        synchronous="NORMAL",
+    ),
+}
+
+
+def config_path() -> Path:
+    if CONFIG_ENV_VAR in os.environ:
+        return Path(os.environ[CONFIG_ENV_VAR])
+
+    return Path.home() / ".config" / "ascents" / "config.toml"
+
+
+def load_config(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        return {}
+
+    try:
+        with path.open("rb") as f:
+            config = tomllib.load(f)
+    except tomllib.TOMLDecodeError as e:
+        raise ProfileError(f"Invalid config file {path}: {e}") from e
+
+    connection: dict[str, Any] = config.get("connection", {})
+
+    return connection
+
+
+def get_profile(name: str) -> ConnectionProfile:
+    if name not in PROFILES:
+        raise ProfileError(
+            f"Invalid profile '{name}', valid options are {set(PROFILES)}"
+        )
+
+    return PROFILES[name]
+
+
+def resolve_profile(
+    profile: str | ConnectionProfile | None = None,
+) -> ConnectionProfile:
+    """Resolve the connection profile to use.
+
+    An explicit profile takes precedence over the ASCENTS_PROFILE
+    environment variable, which takes precedence over the [connection]
+    table of the config file. Pragmas set in the config file override
+    the profile named there.
+    """
+    if isinstance(profile, ConnectionProfile):
+        return profile
+
+    if profile is not None:
+        return get_profile(profile)
+
+    if PROFILE_ENV_VAR in os.environ:
+        return get_profile(os.environ[PROFILE_ENV_VAR])
+
+    config = load_config(config_path())
+    name = config.pop("profile", DEFAULT_PROFILE)
+    base = get_profile(name)
+
+    try:
+        return ConnectionProfile(**{**vars(base), **config})
+    except TypeError as e:
+        raise ProfileError(f"Invalid connection config: {e}") from e
+
+
+class ProfileError(Exception):
+    """Raise if a connection profile is invalid."""
@@ -3,7 +3,7 @@ from pathlib import Path
 
 import pytest
 
-from ascents import _init
+from ascents import _init, _profiles
 from ascents._models import Route, Ascent, AscentDB
 
 Ascents = list[Ascent]
@@ -12,6 +12,12 @@ DATE_2022 = datetime.date(2022, 12, 1)
 DATE_2023 = datetime.date(2023, 1, 1)
 
 
+@pytest.fixture(autouse=True)
+def no_user_config(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.delenv(_profiles.PROFILE_ENV_VAR, raising=False)
+    monkeypatch.setenv(_profiles.CONFIG_ENV_VAR, str(tmp_path / "config.toml"))
+
+
 @pytest.fixture
 def ascents() -> Ascents:
     ascents = [
@@ -28,12 +34,15 @@ def ascents() -> Ascents:
     return ascents
 
 
-@pytest.fixture
-def db(ascents: Ascents) -> AscentDB:
-    database = Path("test.db")
+@pytest.fixture(params=_init.DATE_STORAGES)
+def db(
+    ascents: Ascents,
+    request: pytest.FixtureRequest,
+    tmp_path: Path,
+) -> AscentDB:
+    database = tmp_path / "test.db"
 
-    database.unlink(missing_ok=True)
-    _init.init_ascent_db(database)
+    _init.init_ascent_db(database, request.param)
 
     with AscentDB(database) as db:
         for ascent in ascents:
@@ -43,10 +52,9 @@ def db(ascents: Ascents) -> AscentDB:
 
 
 @pytest.fixture
-def empty_db() -> AscentDB:
-    database = Path("empty.db")
+def empty_db(tmp_path: Path) -> AscentDB:
+    database = tmp_path / "empty.db"
 
-    database.unlink(missing_ok=True)
     _init.init_ascent_db(database)
     empty_db = AscentDB(database)
 
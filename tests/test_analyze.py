@@ -1,4 +1,13 @@
+import csv
+import datetime
+import io
+import json
+
+import pytest
+
+from tests.conftest import DATE_2023
 from ascents import _analyze
+from ascents._models import Route, Ascent, AscentDB
 
 
 def test_make_counts_table() -> None:
@@ -35,3 +44,204 @@ def test_make_max_grade_by_year_table() -> None:
     actual = _analyze.make_max_grade_by_year_table(max_grade_by_year)
 
     assert actual == expected
+
+
+def test_compute_activity_stats() -> None:
+    dated_grades = [
+        (datetime.date(2023, 1, 1), "5.11a"),
+        (datetime.date(2024, 4, 30), "5.9"),
+        (datetime.date(2024, 5, 1), "5.10a"),
+        (datetime.date(2024, 5, 1), "5.7"),
+        (datetime.date(2024, 5, 2), "5.10b"),
+        (datetime.date(2024, 5, 20), "5.12a"),
+    ]
+
+    actual = _analyze.compute_activity_stats(
+        dated_grades,
+        as_of=datetime.date(2024, 5, 25),
+        windows=(7, 30, 365),
+    )
+
+    assert actual == _analyze.ActivityStats(
+        days_climbed=5,
+        longest_streak=3,
+        trailing_counts={7: 1, 30: 5, 365: 5},
+        trailing_max_grades={7: "5.12a", 30: "5.12a", 365: "5.12a"},
+    )
+
+
+def test_compute_activity_stats_empty() -> None:
+    actual = _analyze.compute_activity_stats([], as_of=datetime.date(2024, 5, 25))
+
+    assert actual.days_climbed == 0
+    assert actual.longest_streak == 0
+    assert actual.trailing_counts == {30: 0, 90: 0, 365: 0}
+    assert actual.trailing_max_grades == {30: None, 90: None, 365: None}
+
+
+def test_make_trailing_table() -> None:
+    stats = _analyze.ActivityStats(
+        trailing_counts={30: 0, 90: 12},
+        trailing_max_grades={30: None, 90: "5.10c"},
+    )
+
+    expected = "\n".join(
+        [
+            "   0  last 30 days",
+            "  12  last 90 days, max grade 5.10c",
+        ],
+    )
+
+    actual = _analyze.make_trailing_table(stats)
+
+    assert actual == expected
+
+
+@pytest.fixture
+def analysis() -> _analyze.Analysis:
+    ascent = Ascent(
+        Route("Slither", "5.7", "Reimers Ranch"), datetime.date(2022, 6, 27)
+    )
+
+    return _analyze.Analysis(
+        name="ascent.db",
+        generated=datetime.datetime(2024, 9, 19, 13, 53, 44),
+        total_count=1,
+        year_counts=[(2022, 1)],
+        crag_counts=[("Reimers Ranch", 1)],
+        grade_counts=[("5.7", 1)],
+        max_grade="5.7",
+        max_grade_by_year=[(2022, "5.7")],
+        hardest_ascents=[ascent],
+        latest_date=ascent.date,
+        latest_ascents=[ascent],
+        activity_stats=_analyze.ActivityStats(
+            days_climbed=1,
+            longest_streak=1,
+            trailing_counts={30: 0},
+            trailing_max_grades={30: None},
+        ),
+    )
+
+
+def test_analyze_ascent_db(db: AscentDB) -> None:
+    analysis = _analyze.analyze_ascent_db(db)
+
+    assert analysis.name == db.name
+    assert analysis.total_count == 8
+    assert analysis.max_grade == "5.12a"
+    assert analysis.hardest_ascents == [
+        Ascent(Route("Classic Route", "5.12a", "Some Crag"), DATE_2023)
+    ]
+    assert analysis.latest_date == DATE_2023
+    assert len(analysis.latest_ascents) == 4
+    assert analysis.activity_stats.days_climbed == 2
+
+
+def test_write_text(analysis: _analyze.Analysis) -> None:
+    file = io.StringIO()
+    _analyze.write_text(analysis, file)
+
+    assert file.getvalue().splitlines()[:7] == [
+        "Analysis of ascents in ascent.db",
+        "Generated on Thu Sep 19 2024 01:53:44 PM",
+        "",
+        "Total number of ascents: 1",
+        "",
+        "Count of ascents by year:",
+        "   1  2022",
+    ]
+    assert file.getvalue().endswith(
+        "Count of ascents in trailing windows:\n   0  last 30 days\n"
+    )
+
+
+def test_write_json(analysis: _analyze.Analysis) -> None:
+    file = io.StringIO()
+    _analyze.write_json(analysis, file)
+
+    actual = json.loads(file.getvalue())
+
+    assert actual["generated"] == "2024-09-19T13:53:44"
+    assert actual["year_counts"] == [{"year": 2022, "count": 1}]
+    assert actual["hardest_ascents"] == [
+        {
+            "route": "Slither",
+            "grade": "5.7",
+            "crag": "Reimers Ranch",
+            "date": "2022-06-27",
+        }
+    ]
+    assert actual["latest_date"] == "2022-06-27"
+    assert actual["trailing_windows"] == [{"days": 30, "count": 0, "max_grade": None}]
+
+
+def test_write_csv(analysis: _analyze.Analysis) -> None:
+    file = io.StringIO()
+    _analyze.write_csv(analysis, file)
+
+    rows = list(csv.DictReader(io.StringIO(file.getvalue())))
+
+    assert len(rows) == 13
+    assert rows[0] == {
+        "section": "total_count",
+        "key": "",
+        "value": "1",
+        "route": "",
+        "grade": "",
+        "crag": "",
+        "date": "",
+    }
+    assert rows[6]["section"] == "hardest_ascent"
+    assert rows[6]["route"] == "Slither"
+    assert rows[6]["date"] == "2022-06-27"
+
+
+def test_analyze_top_k(db: AscentDB) -> None:
+    analysis = _analyze.analyze_ascent_db(db, top_k=1, top_by=[None, "year"])
+
+    overall, by_year = analysis.top_ascents
+
+    assert overall.groups == {None: analysis.hardest_ascents}
+    assert list(by_year.groups) == [2022, 2023]
+
+    lines = _analyze.text_sections(analysis)[-1].splitlines()
+
+    assert lines == [
+        "Hardest 1 ascent(s) by year:",
+        "2022:",
+        "  Old Route 5.11a at Old Crag on 2022-12-01",
+        "2023:",
+        "  Classic Route 5.12a at Some Crag on 2023-01-01",
+    ]
+
+    rows = list(_analyze.csv_rows(analysis))
+
+    assert rows[-1]["section"] == "top_ascent_by_year"
+    assert rows[-1]["key"] == 2023
+    assert rows[-1]["value"] == 1
+
+
+def test_watch_analysis(db: AscentDB) -> None:
+    sleeps: list[float] = []
+    watch = _analyze.watch_analysis(db, 5, sleep=sleeps.append)
+
+    sections = next(watch)
+
+    assert len(sections) == 13
+    assert sections[1] == "Total number of ascents: 8"
+
+    ascent = Ascent(Route("New Route", "5.7", "Newer Crag"), datetime.date(2021, 5, 1))
+
+    with AscentDB(db._database) as other_db:
+        other_db.log_ascent(ascent)
+
+    sections = next(watch)
+
+    assert sleeps == [5]
+    assert sections[0].startswith(f"Analysis of ascents in {db.name}")
+    assert sections[1] == "Total number of ascents: 9"
+    assert "Max grade ascended: 5.12a" not in sections.values()
+    assert sections[10] == "Number of days climbed: 3"
+
+    watch.close()
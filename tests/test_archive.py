@@ -0,0 +1,287 @@
+import datetime
+import shutil
+import sqlite3
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from tests.conftest import Ascents, DATE_2022, DATE_2023
+from ascents import _init
+from ascents._archive import (
+    Archive,
+    ArchiveError,
+    archive_ascent_db,
+    spanned_archives,
+)
+from ascents._backup import backup_ascent_db
+from ascents._merge import MergeError, merge_ascent_dbs
+from ascents._models import Route, Ascent, AscentDB, AscentDBError, Search
+
+
+def snapshot(db: AscentDB) -> dict[str, Any]:
+    with db:
+        return {
+            "ascents": db.ascents(),
+            "by_grade": db.ascents(order="grade"),
+            "total_count": db.total_count(),
+            "year_counts": db.year_counts(),
+            "crag_counts": db.crag_counts(),
+            "grade_counts": db.grade_counts(),
+            "max_grade_by_year": db.max_grade_by_year(),
+            "counts_by": db.counts_by("month"),
+            "dated_grades": list(db.dated_grades()),
+            "top_k": db.top_k(3),
+            "top_k_by_crag": db.top_k(2, "crag"),
+            "top_k_by_year": db.top_k(2, "year"),
+            "changes": [
+                (change.seq, change.op, change.ascent) for change in db.changes_since()
+            ],
+        }
+
+
+def live_count(database: Path) -> int:
+    connection = sqlite3.connect(database)
+
+    try:
+        (count,) = connection.execute("SELECT count(*) FROM ascents").fetchone()
+    finally:
+        connection.close()
+
+    return int(count)
+
+
+def test_archive_ascent_db(db: AscentDB) -> None:
+    before = snapshot(db)
+
+    counts = archive_ascent_db(db._database, DATE_2023, period="year")
+
+    assert counts == {"2022": 4}
+    assert (db._database.parent / "test-2022.db").exists()
+    assert live_count(db._database) == 4
+
+    # Archived ascents still show up everywhere, but are not logged as
+    # changes
+    assert snapshot(db) == before
+
+    with db:
+        assert db.ascents(Search(date=DATE_2022)) == before["ascents"][4:]
+
+    # Nothing left to archive
+    assert archive_ascent_db(db._database, DATE_2023, period="year") == {}
+
+
+def test_archive_while_open(tmp_path: Path) -> None:
+    database = tmp_path / "open.db"
+    _init.init_ascent_db(database)
+
+    ascents = [
+        Ascent(Route("Old Route", "5.9", "Some Crag"), datetime.date(2005, 1, 1)),
+        Ascent(Route("New Route", "5.9", "Some Crag"), DATE_2023),
+    ]
+
+    with AscentDB(database) as db:
+        for ascent in ascents:
+            db.log_ascent(ascent)
+
+        assert db.total_count() == 2
+        db.release()
+
+        # Archived by another connection while this one stays open
+        assert archive_ascent_db(database, DATE_2023) == {"2000s": 1}
+
+        assert db.total_count() == 2
+        assert db.ascents() == ascents[::-1]
+        assert db.ascents(Search(date="2005-*", glob=True)) == ascents[:1]
+
+
+def test_archive_backup(db: AscentDB, tmp_path: Path) -> None:
+    archive_ascent_db(db._database, DATE_2023)
+
+    # Away from the archives
+    (tmp_path / "backups").mkdir()
+    backup_path = backup_ascent_db(db._database, tmp_path / "backups" / "test.db")
+
+    # Archives are copied alongside, named after the backup
+    assert (tmp_path / "backups" / "test-2020s.db").exists()
+
+    with AscentDB(backup_path) as backup_db:
+        assert backup_db.total_count() == 8
+        assert backup_db._archives["2020s"].path == "test-2020s.db"
+
+
+def test_archive_backup_rotation(db: AscentDB, tmp_path: Path) -> None:
+    archive_ascent_db(db._database, DATE_2023)
+    dest = tmp_path / "backups"
+
+    backup_paths = [backup_ascent_db(db._database, dest, keep=1) for _ in range(2)]
+
+    # Archive copies go along with the backups they belong to
+    (backup_path,) = backup_paths[1:]
+    archive_copy = backup_path.with_name(f"{backup_path.stem}-2020s.db")
+
+    assert sorted(dest.iterdir()) == [archive_copy, backup_path]
+
+    with AscentDB(backup_path) as backup_db:
+        assert backup_db.total_count() == 8
+
+
+def test_archive_climbers(ascents: Ascents, tmp_path: Path) -> None:
+    database = tmp_path / "climbers.db"
+    _init.init_ascent_db(database, climbers=True)
+
+    for climber in ("ann", "bob"):
+        with AscentDB(database, climber=climber) as db:
+            for ascent in ascents:
+                db.log_ascent(ascent)
+
+    archive_ascent_db(database, DATE_2023)
+
+    with AscentDB(database) as everyone:
+        assert everyone.total_count() == 16
+        assert everyone.duplicates() == []
+
+    with AscentDB(database, climber="ann") as ann:
+        assert sorted(map(repr, ann.ascents())) == sorted(map(repr, ascents))
+
+
+def test_archive_pruning(db: AscentDB) -> None:
+    archive_ascent_db(db._database, DATE_2023, period="year")
+
+    with db:
+        db.ascents(Search(date=DATE_2023))
+        assert db._attached == {}
+
+        db.ascents(Search(date=["2023-*", "2024-*"], glob=True))
+        assert db._attached == {}
+
+        db.ascents(Search(date="2022-1?-*", glob=True))
+        assert list(db._attached) == ["2022"]
+
+    with db:
+        db.total_count()
+        assert list(db._attached) == ["2022"]
+
+
+def test_spanned_archives() -> None:
+    archives = [
+        Archive("2000s", "a-2000s.db", "2001-05-01", "2009-10-01"),
+        Archive("2010s", "a-2010s.db", "2010-01-01", "2019-12-31"),
+    ]
+
+    assert spanned_archives(archives, None) == archives
+    assert spanned_archives(archives, datetime.date(2009, 10, 1)) == archives[:1]
+    assert spanned_archives(archives, "2009-12-01") == []
+    assert spanned_archives(archives, ["2009-12-01", "2012-01-01"]) == archives[1:]
+    assert spanned_archives(archives, "20*", glob=True) == archives
+    assert spanned_archives(archives, "201?-*", glob=True) == archives[1:]
+    assert spanned_archives(archives, "2020-*", glob=True) == []
+
+
+def test_archive_merges_into_existing(db: AscentDB) -> None:
+    archive_ascent_db(db._database, DATE_2023)
+
+    older = Ascent(Route("Older Route", "5.8", "Old Crag"), datetime.date(2020, 6, 1))
+
+    with db:
+        db.log_ascent(older)
+
+    assert archive_ascent_db(db._database, DATE_2023) == {"2020s": 1}
+    assert live_count(db._database) == 4
+
+    with db:
+        assert db.find_ascent(older.route) == older
+        assert db.total_count() == 9
+        assert db._archives["2020s"].first_date == "2020-06-01"
+        assert db._archives["2020s"].last_date == "2022-12-01"
+
+
+def test_archived_ascents_read_only(db: AscentDB, ascents: Ascents) -> None:
+    archive_ascent_db(db._database, DATE_2023)
+    archived = ascents[1]
+
+    with db:
+        assert db.find_ascent(archived.route) == archived
+
+        with pytest.raises(AscentDBError, match="archived"):
+            db.drop_ascent(archived.route)
+
+        with pytest.raises(AscentDBError, match="already logged"):
+            db.log_ascent(archived)
+
+        # Only live ascents would be changed
+        assert db.drop_where(Search(crag="Some Crag"), dry_run=True) == 2
+
+        # Nor can live ascents be changed into archived ones
+        route = archived.route
+        live = Ascent(Route(route.name + "e", route.grade, route.crag), DATE_2023)
+        db.log_ascent(live)
+
+        with pytest.raises(AscentDBError, match="duplicates"):
+            db.update_where(Search(route=live.route.name), route=route.name)
+
+        assert db.find_ascent(live.route) == live
+        assert db.total_count() == 9
+
+    with AscentDB(db._database, read_only=True) as snapshot_db:
+        assert snapshot_db.total_count() == 9
+
+
+def test_archive_missing_file(db: AscentDB) -> None:
+    archive_ascent_db(db._database, DATE_2023)
+    (db._database.parent / "test-2020s.db").unlink()
+
+    with db:
+        assert len(db.ascents(Search(date=DATE_2023))) == 4
+
+        with pytest.raises(AscentDBError, match="not found"):
+            db.total_count()
+
+
+def test_archive_merge(db: AscentDB, tmp_path: Path) -> None:
+    copy = tmp_path / "copy.db"
+    shutil.copy(db._database, copy)
+
+    archive_ascent_db(db._database, DATE_2023)
+
+    # The copy still has the archived ascents live, which would otherwise
+    # be copied back
+    with pytest.raises(MergeError, match="archived"):
+        merge_ascent_dbs(db._database, copy)
+
+    assert live_count(db._database) == 4
+
+
+def test_archive_consolidate(db: AscentDB, tmp_path: Path) -> None:
+    ann = tmp_path / "ann.db"
+    shutil.copy(db._database, ann)
+    database = tmp_path / "climbers.db"
+
+    archive_ascent_db(db._database, DATE_2023)
+
+    with pytest.raises(_init.ConsolidateError, match="left out"):
+        _init.consolidate_ascent_dbs(database, [db._database])
+
+    assert _init.consolidate_ascent_dbs(database, [ann]) == {"ann": 8}
+    archive_ascent_db(database, DATE_2023)
+
+    # Consolidating ann again would not be caught by the primary key
+    with pytest.raises(_init.ConsolidateError, match="archived"):
+        _init.consolidate_ascent_dbs(database, [ann])
+
+    assert live_count(database) == 4
+
+
+def test_archive_errors(db: AscentDB, tmp_path: Path) -> None:
+    with pytest.raises(ArchiveError, match="period"):
+        archive_ascent_db(db._database, DATE_2023, period="century")
+
+    with pytest.raises(ArchiveError, match="not found"):
+        archive_ascent_db(tmp_path / "missing.db", DATE_2023)
+
+    connection = sqlite3.connect(db._database)
+    connection.execute("DROP TABLE archives")
+    connection.close()
+
+    with pytest.raises(ArchiveError, match="migrate"):
+        archive_ascent_db(db._database, DATE_2023)
@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import pytest
+
+from ascents import _backup
+from ascents._models import AscentDB
+
+
+def test_backup_ascent_db(db: AscentDB, tmp_path: Path) -> None:
+    dest = tmp_path / "backup.db"
+
+    backup_path = _backup.backup_ascent_db(db._database, dest, pages=1)
+
+    assert backup_path == dest
+    assert not dest.with_name("backup.db.tmp").exists()
+
+    with db, AscentDB(dest) as backup_db:
+        assert backup_db.ascents() == db.ascents()
+
+
+def test_backup_ascent_db_keep(db: AscentDB, tmp_path: Path) -> None:
+    dest = tmp_path / "backups"
+
+    backup_paths = [
+        _backup.backup_ascent_db(db._database, dest, keep=2) for _ in range(3)
+    ]
+
+    assert sorted(dest.iterdir()) == backup_paths[1:]
+
+
+@pytest.mark.parametrize("keep", [None, 0])
+def test_backup_ascent_db_error(
+    db: AscentDB,
+    tmp_path: Path,
+    keep: int | None,
+) -> None:
+    database = db._database if keep is not None else tmp_path / "missing.db"
+
+    with pytest.raises(_backup.BackupError):
+        _backup.backup_ascent_db(database, tmp_path / "backup.db", keep=keep)
@@ -0,0 +1,48 @@
+import pytest
+
+from ascents._cache import CacheInfo, ResultCache
+
+
+def test_lru_eviction() -> None:
+    cache: ResultCache[str] = ResultCache(maxsize=2)
+
+    cache.put("a", 0, "A")
+    cache.put("b", 0, "B")
+
+    assert cache.get("a", 0) == "A"
+
+    cache.put("c", 0, "C")
+
+    assert cache.get("b", 0) is None
+    assert cache.get("a", 0) == "A"
+    assert cache.get("c", 0) == "C"
+    assert cache.info() == CacheInfo(hits=3, misses=1, maxsize=2, currsize=2)
+
+
+def test_version() -> None:
+    cache: ResultCache[str] = ResultCache()
+
+    cache.put("a", 1, "A")
+
+    assert cache.get("a", 2) is None
+    assert len(cache) == 0
+
+
+def test_ttl() -> None:
+    now = 0.0
+    cache: ResultCache[str] = ResultCache(ttl=10, clock=lambda: now)
+
+    cache.put("a", 0, "A")
+    now = 10.0
+
+    assert cache.get("a", 0) == "A"
+
+    now = 10.5
+
+    assert cache.get("a", 0) is None
+
+
+@pytest.mark.parametrize("maxsize,ttl", [(0, None), (1, 0)])
+def test_invalid_limits(maxsize: int, ttl: float | None) -> None:
+    with pytest.raises(ValueError):
+        ResultCache(maxsize, ttl)
@@ -0,0 +1,54 @@
+import pytest
+
+from ascents import _index
+from ascents._index import NameIndex
+
+
+def test_normalize() -> None:
+    assert _index.normalize("  Reimers   Ranch ") == "reimers ranch"
+
+
+def test_trigrams() -> None:
+    assert _index.trigrams("Ab") == {"  a", " ab", "ab "}
+
+
+@pytest.fixture
+def index() -> NameIndex:
+    return NameIndex(["Reimers Ranch", "Enchanted Rock", "Pedernales", "Reimers"])
+
+
+class TestNameIndex:
+    def test_contains(self, index: NameIndex) -> None:
+        assert "Pedernales" in index
+        assert "pedernales" not in index
+
+    def test_add_discard(self, index: NameIndex) -> None:
+        index.add("Pedernales")
+        assert len(index) == 4
+
+        index.discard("Pedernales")
+        assert "Pedernales" not in index
+        assert index.similar("Pedernales") == []
+
+    def test_similar(self, index: NameIndex) -> None:
+        assert index.similar("Reimer's Ranch") == ["Reimers Ranch", "Reimers"]
+
+    def test_similar_limit(self, index: NameIndex) -> None:
+        assert index.similar("Reimer's Ranch", limit=1) == ["Reimers Ranch"]
+
+    def test_similar_normalized(self, index: NameIndex) -> None:
+        assert index.similar(" enchanted  rock", threshold=1) == ["Enchanted Rock"]
+
+    def test_similar_invalid_threshold(self, index: NameIndex) -> None:
+        with pytest.raises(ValueError):
+            index.similar("Reimers", threshold=0)
+
+    def test_complete(self, index: NameIndex) -> None:
+        assert index.complete("Reimers") == ["Reimers", "Reimers Ranch"]
+        assert index.complete("Reimers", limit=1) == ["Reimers"]
+        assert index.complete("reimers") == []
+        assert index.complete("") == sorted(index)
+
+        index.discard("Reimers")
+        index.add("Reimers Ranch")
+        assert index.complete("Re") == ["Reimers Ranch"]
@@ -1,9 +1,85 @@
 import pytest
 
 from ascents import _init
-from ascents._models import AscentDB
+from ascents._models import AscentDB, Search
 
 
 def test_database_already_exists_error(db: AscentDB) -> None:
     with pytest.raises(_init.DatabaseAlreadyExistsError):
         _init.init_ascent_db(db._database)
+
+
+def test_invalid_date_storage(empty_db: AscentDB) -> None:
+    with pytest.raises(_init.InvalidDateStorageError):
+        _init.convert_date_storage(empty_db._database, "unix")
+
+
+@pytest.mark.parametrize(
+    "date_storage,date_type",
+    [
+        ("julian", "integer"),
+        ("text", "text"),
+    ],
+)
+def test_convert_date_storage(db: AscentDB, date_storage: str, date_type: str) -> None:
+    with db:
+        original_date_storage = _init.get_date_storage(db._connection)
+        before = db.ascents()
+
+    converted = _init.convert_date_storage(db._database, date_storage)
+
+    assert converted is (original_date_storage != date_storage)
+    assert not _init.convert_date_storage(db._database, date_storage)
+
+    with db:
+        assert db.ascents() == before
+
+        db._cursor.execute("SELECT DISTINCT typeof(date) FROM ascents")
+        assert db._cursor.fetchall() == [(date_type,)]
+
+
+def test_consolidate_ascent_dbs(db: AscentDB, empty_db: AscentDB) -> None:
+    database = db._database.with_name("all.db")
+    sources = [db._database, empty_db._database]
+
+    counts = _init.consolidate_ascent_dbs(database, sources)
+
+    assert counts == {"test": 8, "empty": 0}
+
+    with pytest.raises(_init.ConsolidateError):
+        _init.consolidate_ascent_dbs(database, [db._database])
+
+    assert _init.convert_date_storage(database, "julian")
+
+    with db, AscentDB(database, climber="test") as climber_db:
+        assert _init.has_climbers(climber_db._connection)
+        assert climber_db.ascents() == db.ascents()
+
+
+def test_consolidate_into_single_climber_db(db: AscentDB, empty_db: AscentDB) -> None:
+    with pytest.raises(_init.ConsolidateError):
+        _init.consolidate_ascent_dbs(db._database, [empty_db._database])
+
+
+def test_compact_change_log(db: AscentDB) -> None:
+    with db:
+        db.update_where(Search(crag="Old Crag"), crag="Older Crag")
+        db.drop_where(Search(crag="New Crag"))
+
+    # 8 logged, 2 updated to new keys and 1 dropped, leaving 10 keys
+    assert _init.compact_change_log(db._database) == (3, 10)
+    assert _init.compact_change_log(db._database) == (0, 10)
+
+    with db:
+        changes = list(db.changes_since())
+
+    assert [change.op for change in changes[-3:]] == ["delete", "insert", "delete"]
+
+
+def test_compact_change_log_missing(empty_db: AscentDB) -> None:
+    with empty_db:
+        empty_db._connection.execute("DROP TABLE changes")
+        empty_db._connection.commit()
+
+    with pytest.raises(_init.ChangeLogError):
+        _init.compact_change_log(empty_db._database)
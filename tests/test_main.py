@@ -1,9 +1,12 @@
 import datetime
+import json
+from collections.abc import Iterator
+from pathlib import Path
 
 import pytest
 
-from ascents import __main__
-from ascents._models import Route, Ascent, AscentDB, AscentDBError
+from ascents import __main__, _metrics
+from ascents._models import Route, Ascent, AscentDB, AscentDBError, Search
 
 
 @pytest.fixture
@@ -67,6 +70,27 @@ def test_log(
         __main__.log(db._database)
 
 
+def test_log_unknown_crag(
+    confirmed: None,
+    db: AscentDB,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    latest_send = Ascent(
+        Route("Super New Route", "5.12a", "Sum Crag"),
+        datetime.date(2024, 5, 26),
+    )
+
+    monkeypatch.setattr(__main__, "get_ascent", lambda: latest_send)
+
+    __main__.log(db._database)
+
+    output = capsys.readouterr().out
+
+    assert "Warning: 'Sum Crag' is not a known crag" in output
+    assert "Did you mean:\nSome Crag\n" in output
+
+
 def test_drop(
     confirmed: None,
     db: AscentDB,
@@ -83,3 +107,336 @@ def test_drop(
         match=r"^No ascent found matching provided route$",
     ):
         __main__.drop(db._database)
+
+
+def test_drop_where(
+    confirmed: None,
+    db: AscentDB,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    monkeypatch.setattr(
+        __main__, "get_search", lambda: Search(route="Some*", glob=True)
+    )
+
+    __main__.drop_where(db._database)
+    __main__.drop_where(db._database)
+
+    output = capsys.readouterr().out
+
+    assert "Successfully dropped 2 ascent(s)\n" in output
+    assert output.endswith("No ascents found\n")
+
+
+def test_update_where(
+    confirmed: None,
+    db: AscentDB,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    new_values = iter(["", "", "Renamed Crag", "2024-05-26"])
+
+    monkeypatch.setattr(__main__, "get_search", lambda: Search(crag="Old Crag"))
+    monkeypatch.setattr("builtins.input", lambda p: next(new_values))
+
+    __main__.update_where(db._database)
+
+    with db:
+        assert db.ascents(Search(crag="Renamed Crag"), "grade") == [
+            Ascent(
+                Route("Old Route", "5.11a", "Renamed Crag"), datetime.date(2024, 5, 26)
+            ),
+            Ascent(
+                Route("Last Route", "5.7", "Renamed Crag"), datetime.date(2024, 5, 26)
+            ),
+        ]
+
+
+def test_backup(
+    db: AscentDB,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    dest = tmp_path / "backups"
+    argv = ["ascents", "backup", str(db._database), str(dest), "--keep", "1"]
+
+    monkeypatch.setattr("sys.argv", argv)
+
+    __main__.main()
+    __main__.main()
+
+    (backup_path,) = dest.iterdir()
+
+    with db, AscentDB(backup_path) as backup_db:
+        assert backup_db.ascents() == db.ascents()
+
+
+def test_consolidate(
+    db: AscentDB,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    database = tmp_path / "all.db"
+    argv = ["ascents", "consolidate", str(database), str(db._database)]
+
+    monkeypatch.setattr("sys.argv", argv)
+
+    __main__.main()
+
+    with db, AscentDB(database, climber=db._database.stem) as climber_db:
+        assert climber_db.ascents() == db.ascents()
+
+    with pytest.raises(SystemExit, match="already in"):
+        __main__.main()
+
+
+def test_changes(
+    db: AscentDB,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    argv = ["ascents", "changes", str(db._database), "--since", "7"]
+
+    monkeypatch.setattr("sys.argv", argv)
+
+    __main__.main()
+
+    assert json.loads(capsys.readouterr().out) == {
+        "seq": 8,
+        "op": "insert",
+        "route": "Last Route",
+        "grade": "5.7",
+        "crag": "Old Crag",
+        "date": "2023-01-01",
+    }
+
+
+def test_merge(
+    db: AscentDB,
+    empty_db: AscentDB,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    argv = ["ascents", "merge", str(db._database), str(empty_db._database)]
+
+    monkeypatch.setattr("sys.argv", argv)
+
+    __main__.main()
+
+    with db, empty_db:
+        assert empty_db.ascents() == db.ascents()
+
+
+def test_metrics_file(
+    db: AscentDB,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    metrics_file = tmp_path / "metrics.prom"
+    argv = [
+        "ascents",
+        "--metrics-file",
+        str(metrics_file),
+        "analyze",
+        str(db._database),
+    ]
+
+    monkeypatch.setattr("sys.argv", argv)
+
+    try:
+        __main__.main()
+    finally:
+        _metrics.METRICS.enabled = False
+        _metrics.METRICS.reset()
+
+    assert 'ascents_db_calls_total{method="total_count"} 1' in metrics_file.read_text()
+
+
+def test_analyze_watch(
+    db: AscentDB,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def watch_analysis(*args: object) -> Iterator[dict[int, str]]:
+        yield {0: "Header", 1: "Total number of ascents: 8"}
+        yield {0: "Header", 1: "Total number of ascents: 9"}
+        raise KeyboardInterrupt
+
+    argv = ["ascents", "analyze", str(db._database), "--watch", "--interval", "0"]
+
+    monkeypatch.setattr("sys.argv", argv)
+    monkeypatch.setattr(__main__, "watch_analysis", watch_analysis)
+
+    __main__.main()
+
+    assert capsys.readouterr().out == (
+        "Header\n\nTotal number of ascents: 8\n"
+        "\n"
+        "Header\n\nTotal number of ascents: 9\n"
+    )
+
+    for option in (["--read-only"], ["--format", "json"]):
+        monkeypatch.setattr("sys.argv", [*argv, *option])
+
+        with pytest.raises(SystemExit):
+            __main__.main()
+
+        assert "watch" in capsys.readouterr().err
+
+
+def test_redraw_sections() -> None:
+    screen: list[str] = []
+
+    first = __main__.redraw_sections(
+        screen, {0: "Header\nGenerated at 1", 1: "Total: 8", 2: "Max: 5.9"}
+    )
+
+    assert first == "\x1b[H\x1b[2JHeader\nGenerated at 1\n\nTotal: 8\n\nMax: 5.9\n"
+
+    # The header is rewritten in place, and the rest from the first changed
+    # section down
+    output = __main__.redraw_sections(
+        screen, {0: "Header\nGenerated at 2", 2: "Max: 5.10a"}
+    )
+
+    assert output == (
+        "\x1b[1;1HHeader\x1b[K\nGenerated at 2\x1b[K"
+        "\x1b[6;1H\x1b[JMax: 5.10a\n"
+        "\x1b[7;1H"
+    )
+    assert screen == ["Header\nGenerated at 2", "Total: 8", "Max: 5.10a"]
+
+    # A taller section moves those below it
+    output = __main__.redraw_sections(screen, {1: "Total:\n9"})
+
+    assert output == "\x1b[4;1H\x1b[JTotal:\n9\n\nMax: 5.10a\n\x1b[8;1H"
+
+
+def test_shell(
+    confirmed: None,
+    db: AscentDB,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    answers = iter(
+        [
+            # log
+            *["Super New Route", "5.12a", "Some Crag", "2024-05-26"],
+            # drop
+            *["Cool Route", "5.10a", "Some Crag"],
+            # search
+            *["Super*", "", "", "", "grade"],
+        ]
+    )
+
+    monkeypatch.setattr("builtins.input", lambda p: next(answers))
+
+    with db:
+        shell = __main__.AscentShell(db)
+
+        assert shell.names("route").complete("Co") == ["Cool Route"]
+
+        shell.onecmd("log")
+        shell.onecmd("drop")
+
+        assert shell.names("route").complete("S") == [
+            "Some Other Route",
+            "Some Route",
+            "Super New Route",
+        ]
+        assert shell.names("route").complete("Co") == []
+
+        shell.onecmd("search")
+
+        assert capsys.readouterr().out.endswith(
+            "Super New Route 5.12a at Some Crag on 2024-05-26\n"
+        )
+
+        shell.onecmd("analyze json")
+
+        assert json.loads(capsys.readouterr().out)["total_count"] == 8
+
+        # Writes by other connections are picked up on the next lookup
+        with AscentDB(db._database) as other_db:
+            other_db.drop_where(Search(crag="Old Crag"))
+
+        assert "Old Crag" not in shell.names("crag")
+
+        assert shell.onecmd("quit")
+
+
+def test_shell_errors(
+    db: AscentDB,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    answers = iter(
+        [
+            # drop
+            *["Unknown Route", "5.7", "Some Crag"],
+            # log, backed out of
+            *["Unknown Route", "5.7", "Some Crag", "2024-05-26", "n"],
+        ]
+    )
+
+    monkeypatch.setattr("builtins.input", lambda p: next(answers))
+
+    with db:
+        shell = __main__.AscentShell(db)
+
+        shell.onecmd("drop")
+        shell.onecmd("analyze yaml")
+
+        assert capsys.readouterr().out == (
+            "Error: No ascent found matching provided route\n"
+            "Error: Invalid format 'yaml'\n"
+        )
+
+        shell.onecmd("log")
+
+        assert capsys.readouterr().out.endswith("\nCancelled\n")
+        assert shell.complete_analyze("j") == ["json"]
+
+
+def test_convert_requires_date_storage(
+    db: AscentDB,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr("sys.argv", ["ascents", "convert", str(db._database)])
+
+    with pytest.raises(SystemExit):
+        __main__.main()
+
+    assert "--date-storage" in capsys.readouterr().err
+
+
+def test_migrate(
+    db: AscentDB,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr("sys.argv", ["ascents", "migrate", str(db._database)])
+
+    __main__.main()
+
+    assert capsys.readouterr().out.endswith("Schema is up to date, nothing to do\n")
+
+
+def test_archive(
+    db: AscentDB,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        "sys.argv",
+        ["ascents", "archive", str(db._database), "--before", "2023-01-01"],
+    )
+
+    __main__.main()
+
+    out = capsys.readouterr().out
+
+    assert "2020s: 4 ascent(s)\n" in out
+    assert out.endswith("Successfully archived 4 ascent(s)\n")
+
+    with db:
+        assert db.total_count() == 8
@@ -0,0 +1,73 @@
+import datetime
+from pathlib import Path
+
+import pytest
+
+from ascents import _init, _merge
+from ascents._models import Route, Ascent, AscentDB, Search
+from tests.conftest import Ascents, DATE_2022, DATE_2023
+
+
+@pytest.fixture
+def other_db(ascents: Ascents, tmp_path: Path) -> AscentDB:
+    database = tmp_path / "other.db"
+
+    # Julian dates in one database and text dates in the other
+    _init.init_ascent_db(database, "julian")
+
+    with AscentDB(database) as other_db:
+        for ascent in ascents[2:]:
+            other_db.log_ascent(ascent)
+
+        other_db.log_ascent(Ascent(Route("Phone Route", "5.8", "Some Crag"), DATE_2023))
+        other_db.update_where(Search(route="New Route"), date=DATE_2023)
+
+    return other_db
+
+
+@pytest.mark.parametrize(
+    "policy,expected",
+    [
+        ("earliest", DATE_2022),
+        ("latest", DATE_2023),
+        ("a", DATE_2022),
+        ("b", DATE_2023),
+    ],
+)
+def test_merge_ascent_dbs(
+    db: AscentDB,
+    other_db: AscentDB,
+    policy: str,
+    expected: datetime.date,
+) -> None:
+    report = _merge.merge_ascent_dbs(db._database, other_db._database, policy)
+
+    assert report == _merge.MergeReport(
+        buckets=4,
+        differing_buckets=2,
+        copied_to_a=1,
+        copied_to_b=2,
+        conflicts=1,
+    )
+
+    with db, other_db:
+        assert db.ascents() == other_db.ascents()
+        assert db.total_count() == 9
+        assert db.find_ascent(Route("New Route", "5.10d", "New Crag")).date == expected
+
+    report = _merge.merge_ascent_dbs(db._database, other_db._database, policy)
+
+    assert report.differing_buckets == 0
+
+
+def test_merge_invalid_policy(db: AscentDB, other_db: AscentDB) -> None:
+    with pytest.raises(_merge.MergeError):
+        _merge.merge_ascent_dbs(db._database, other_db._database, "newest")
+
+
+def test_merge_climbers_mismatch(db: AscentDB, tmp_path: Path) -> None:
+    database = tmp_path / "climbers.db"
+    _init.init_ascent_db(database, climbers=True)
+
+    with pytest.raises(_merge.MergeError):
+        _merge.merge_ascent_dbs(db._database, database)
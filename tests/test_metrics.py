@@ -0,0 +1,86 @@
+import sqlite3
+from collections.abc import Iterator
+
+import pytest
+
+from ascents import _metrics
+from ascents._models import AscentDB, Search
+
+
+@pytest.fixture
+def metrics(monkeypatch: pytest.MonkeyPatch) -> Iterator[_metrics.Registry]:
+    monkeypatch.setattr(_metrics.METRICS, "enabled", True)
+    _metrics.METRICS.reset()
+
+    yield _metrics.METRICS
+
+    _metrics.METRICS.reset()
+
+
+def test_render() -> None:
+    registry = _metrics.Registry()
+    counter = registry.counter("calls_total", "Calls.")
+    histogram = registry.histogram("duration_seconds", "Durations.")
+
+    counter.inc(method="a")
+    counter.inc(2, method="a")
+    histogram.observe(0.001)
+    histogram.observe(0.2)
+    histogram.observe(10)
+
+    lines = registry.render().splitlines()
+
+    assert lines[:3] == [
+        "# HELP calls_total Calls.",
+        "# TYPE calls_total counter",
+        'calls_total{method="a"} 3',
+    ]
+    assert 'duration_seconds_bucket{le="0.001"} 1' in lines
+    assert 'duration_seconds_bucket{le="0.1"} 1' in lines
+    assert 'duration_seconds_bucket{le="0.5"} 2' in lines
+    assert 'duration_seconds_bucket{le="+Inf"} 3' in lines
+    assert lines[-1] == "duration_seconds_count 3"
+
+
+def test_instrumented(db: AscentDB, metrics: _metrics.Registry) -> None:
+    with db:
+        db.ascents(Search(crag="Old Crag"))
+        db.ascents()
+        list(db.dated_grades())
+        db.drop_where(Search(crag="Old Crag"))
+
+    calls = _metrics.CALLS.values
+    rows = _metrics.ROWS_RETURNED.values
+
+    assert calls[(("method", "ascents"),)] == 2
+    assert rows[(("method", "ascents"),)] == 10
+    assert rows[(("method", "dated_grades"),)] == 8
+    assert _metrics.VM_STEPS.values[(("method", "ascents"),)] >= 0
+    assert sum(_metrics.COMMIT_DURATION.counts[()]) == 1
+
+
+def test_lock_errors(db: AscentDB, metrics: _metrics.Registry) -> None:
+    locker = sqlite3.connect(db._database, autocommit=True)
+
+    with db:
+        db._connection.execute("PRAGMA busy_timeout = 0")
+        db._connection.commit()
+
+        locker.execute("BEGIN EXCLUSIVE")
+
+        try:
+            with pytest.raises(sqlite3.OperationalError):
+                db.total_count()
+        finally:
+            locker.close()
+
+    assert _metrics.LOCK_ERRORS.values[(("method", "total_count"),)] == 1
+
+
+def test_disabled(db: AscentDB) -> None:
+    _metrics.METRICS.reset()
+
+    with db:
+        db.ascents()
+
+    assert not _metrics.CALLS.values
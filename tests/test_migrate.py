@@ -0,0 +1,168 @@
+import dataclasses
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import Ascents
+from ascents import _init, _migrate
+from ascents._models import Route, Ascent, AscentDB, AscentDBError
+
+
+@pytest.fixture
+def legacy_database(ascents: Ascents, tmp_path: Path) -> Path:
+    database = tmp_path / "legacy.db"
+
+    # Schema as written before it was versioned
+    connection = sqlite3.connect(database, autocommit=False)
+    connection.execute(
+        """
+        CREATE TABLE ascents(
+            route TEXT NOT NULL,
+            grade TEXT NOT NULL,
+            crag TEXT NOT NULL,
+            date TEXT NOT NULL,
+            PRIMARY KEY(route, grade, crag)
+        )
+        """
+    )
+    connection.execute("CREATE INDEX ascents_crag ON ascents(crag)")
+    connection.executemany(
+        "INSERT INTO ascents VALUES(?, ?, ?, ?)",
+        [
+            (ascent.route.name, ascent.route.grade, ascent.route.crag, str(ascent.date))
+            for ascent in ascents
+        ],
+    )
+    connection.commit()
+    connection.close()
+
+    return database
+
+
+def schema_version(database: Path) -> int:
+    connection = sqlite3.connect(database)
+
+    try:
+        return _init.get_schema_version(connection)
+    finally:
+        connection.close()
+
+
+def test_migrations_registry() -> None:
+    versions = [migration.version for migration in _migrate.MIGRATIONS]
+
+    assert versions == list(range(1, _init.SCHEMA_VERSION + 1))
+
+
+def test_migrate_ascent_db(legacy_database: Path, ascents: Ascents) -> None:
+    migrations = _migrate.migrate_ascent_db(legacy_database, batch_size=3)
+
+    assert migrations == _migrate.MIGRATIONS
+    assert schema_version(legacy_database) == _init.SCHEMA_VERSION
+    assert _migrate.migrate_ascent_db(legacy_database) == []
+
+    with AscentDB(legacy_database) as db:
+        db._cursor.execute(
+            """
+            SELECT sql
+            FROM sqlite_schema
+            WHERE type = 'index' AND name = 'ascents_crag'
+            """
+        )
+        (sql,) = db._cursor.fetchone()
+
+        assert "grade" in sql
+
+        changes = list(db.changes_since())
+
+    assert [change.ascent for change in changes] == ascents
+    assert {change.op for change in changes} == {"insert"}
+
+
+def test_migrate_resumes(
+    legacy_database: Path,
+    ascents: Ascents,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls = 0
+    migration = _migrate.MIGRATIONS[1]
+
+    def interrupted_backfill(*args: object) -> None:
+        nonlocal calls
+        calls += 1
+
+        if calls == 2:
+            raise KeyboardInterrupt
+
+        migration.backfill(*args)  # type: ignore[arg-type, misc]
+
+    migrations = [
+        _migrate.MIGRATIONS[0],
+        dataclasses.replace(migration, backfill=interrupted_backfill),
+    ]
+
+    monkeypatch.setattr(_migrate, "MIGRATIONS", migrations)
+
+    with pytest.raises(KeyboardInterrupt):
+        _migrate.migrate_ascent_db(legacy_database, batch_size=3)
+
+    assert schema_version(legacy_database) == 1
+
+    # Writes in between are logged by the trigger, not the backfill
+    new_ascent = Ascent(Route("New Route", "5.8", "New Crag"), ascents[0].date)
+
+    with AscentDB(legacy_database) as db:
+        db.log_ascent(new_ascent)
+
+    monkeypatch.setattr(_migrate, "MIGRATIONS", [_migrate.MIGRATIONS[0], migration])
+
+    assert _migrate.migrate_ascent_db(legacy_database, batch_size=3) == [migration]
+
+    with AscentDB(legacy_database) as db:
+        changes = list(db.changes_since())
+
+    logged = [change.ascent for change in changes]
+
+    assert sorted(logged, key=str) == sorted([*ascents, new_ascent], key=str)
+
+
+def test_migrate_current(db: AscentDB) -> None:
+    assert schema_version(db._database) == _init.SCHEMA_VERSION
+    assert _migrate.migrate_ascent_db(db._database) == []
+
+    with db:
+        assert len(list(db.changes_since())) == 8
+
+
+def test_migrate_period_indexes(db: AscentDB) -> None:
+    connection = sqlite3.connect(db._database)
+    connection.execute("DROP INDEX ascents_month")
+    connection.execute("PRAGMA user_version = 3")
+    connection.close()
+
+    assert _migrate.migrate_ascent_db(db._database) == _migrate.MIGRATIONS[3:]
+
+    with db:
+        db._cursor.execute(
+            "SELECT name FROM sqlite_schema WHERE name = 'ascents_month'"
+        )
+        assert db._cursor.fetchone() == ("ascents_month",)
+
+
+def test_migrate_newer_version(db: AscentDB) -> None:
+    connection = sqlite3.connect(db._database)
+    connection.execute(f"PRAGMA user_version = {_init.SCHEMA_VERSION + 1}")
+    connection.close()
+
+    with pytest.raises(_migrate.MigrateError, match="newer"):
+        _migrate.migrate_ascent_db(db._database)
+
+    with pytest.raises(AscentDBError, match="newer"):
+        with db:
+            pass
+
+
+def test_migrate_invalid_batch_size(db: AscentDB) -> None:
+    with pytest.raises(_migrate.MigrateError):
+        _migrate.migrate_ascent_db(db._database, batch_size=0)
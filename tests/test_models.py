@@ -1,10 +1,15 @@
 import datetime
+import functools
+import gc
 import sqlite3
+from pathlib import Path
+from typing import Any
 
 import pytest
 
 from tests.conftest import Ascents, DATE_2022, DATE_2023
-from ascents import _models
+from ascents import _init, _models
+from ascents._cache import CacheInfo
 from ascents._models import (
     Route,
     RouteError,
@@ -13,6 +18,7 @@ from ascents._models import (
     AscentDB,
     AscentDBError,
     Search,
+    Change,
 )
 
 
@@ -21,6 +27,62 @@ def route() -> Route:
     return Route("Some Route", "5.7", "Some Crag")
 
 
+@pytest.mark.parametrize(
+    "lower,higher",
+    [
+        ("5.7", "5.8"),
+        ("5.9", "5.10a"),
+        ("5.10a", "5.10b"),
+        ("5.10d", "5.11a"),
+    ],
+)
+def test_grade_rank(lower: str, higher: str) -> None:
+    assert _models.grade_rank(lower) < _models.grade_rank(higher)
+
+
+def test_grade_rank_invalid() -> None:
+    with pytest.raises(RouteError):
+        _models.grade_rank("5.10+")
+
+
+def test_grade_rank_sql() -> None:
+    connection = sqlite3.connect(":memory:")
+    grades = [grade for grade, _, _ in _init.generate_grade_info_data()]
+
+    for grade in grades:
+        (rank,) = connection.execute(
+            f"SELECT {_init.GRADE_RANK_SQL.format(':grade')}", {"grade": grade}
+        ).fetchone()
+
+        assert rank == _models.grade_rank(grade)
+
+
+def test_search_key() -> None:
+    assert _models.search_key(
+        Search(crag=["B", "A"], date=[DATE_2022])
+    ) == _models.search_key(Search(crag={"A", "B"}, date=["2022-12-01"]))
+    assert _models.search_key(Search(date=DATE_2022)) == _models.search_key(
+        Search(date="2022-12-01")
+    )
+
+
+def test_compare_grades() -> None:
+    grades = ["5.10a", "5.9", "5.10+", "5.11d", "5.7"]
+    grades.sort(key=functools.cmp_to_key(_models.compare_grades))
+
+    assert grades == ["5.10+", "5.7", "5.9", "5.10a", "5.11d"]
+
+
+def test_max_grade_aggregate() -> None:
+    max_grade = _models.MaxGrade()
+
+    for grade in ["5.9", "5.10+", "5.11a", "5.10d"]:
+        max_grade.step(grade)
+
+    assert max_grade.finalize() == "5.11a"
+    assert _models.MaxGrade().finalize() is None
+
+
 class TestRoute:
     @pytest.mark.parametrize(
         "bad_grade",
@@ -114,8 +176,34 @@ def test_adapt_date() -> None:
     assert _models.adapt_date(datetime.date(2023, 1, 1)) == "2023-01-01"
 
 
-def test_convert_date() -> None:
-    assert _models.convert_date(b"2023-01-01") == datetime.date(2023, 1, 1)
+@pytest.mark.parametrize("stored", [b"2023-01-01", b"2459946"])
+def test_convert_date(stored: bytes) -> None:
+    assert _models.convert_date(stored) == datetime.date(2023, 1, 1)
+
+
+@pytest.mark.parametrize(
+    "period,expected",
+    [
+        ("day", datetime.date(2023, 1, 1)),
+        ("week", datetime.date(2023, 1, 7)),
+        ("month", datetime.date(2023, 1, 1)),
+        ("quarter", datetime.date(2023, 3, 1)),
+        ("year", datetime.date(2023, 12, 1)),
+    ],
+)
+def test_next_bucket(period: str, expected: datetime.date) -> None:
+    assert _models.next_bucket(datetime.date(2022, 12, 31), period) == expected
+
+
+def test_fill_buckets() -> None:
+    rows = [(datetime.date(2022, 11, 1), 1), (datetime.date(2023, 2, 1), 2)]
+
+    assert _models.fill_buckets(rows, "month", 0) == [
+        (datetime.date(2022, 11, 1), 1),
+        (datetime.date(2022, 12, 1), 0),
+        (datetime.date(2023, 1, 1), 0),
+        (datetime.date(2023, 2, 1), 2),
+    ]
 
 
 class TestAscentDB:
@@ -137,9 +225,263 @@ class TestAscentDB:
         with pytest.raises(sqlite3.ProgrammingError):
             db.crags()
 
+    def test_not_found(self, tmp_path: Path) -> None:
+        with pytest.raises(AscentDBError):
+            AscentDB(tmp_path / "missing.db")
+
+    def test_memory(self, ascents: Ascents) -> None:
+        db = AscentDB(":memory:")
+
+        with db:
+            db.log_ascent(ascents[0])
+
+        with db:
+            assert db.ascents() == ascents[:1]
+
+        assert db.name == ":memory:"
+        assert AscentDB(":memory:")._uri != db._uri
+
+    def test_memory_close(self) -> None:
+        db = AscentDB(":memory:")
+        keepalive = db._keepalive
+        assert keepalive is not None
+
+        db.close()
+
+        with pytest.raises(sqlite3.ProgrammingError):
+            keepalive.execute("SELECT 1")
+
+        # Also closed once the object is garbage collected
+        db = AscentDB(":memory:")
+        keepalive = db._keepalive
+        assert keepalive is not None
+
+        del db
+        gc.collect()
+
+        with pytest.raises(sqlite3.ProgrammingError):
+            keepalive.execute("SELECT 1")
+
+    def test_uri(self, ascents: Ascents) -> None:
+        uri = "file:shared?mode=memory&cache=shared"
+        keepalive = sqlite3.connect(uri, uri=True)
+
+        try:
+            _init.init_ascent_db(uri)
+
+            with pytest.raises(_init.DatabaseAlreadyExistsError):
+                _init.init_ascent_db(uri)
+
+            db = AscentDB(uri)
+
+            with db:
+                db.log_ascent(ascents[0])
+
+            with AscentDB(uri) as other_db:
+                assert other_db.ascents() == ascents[:1]
+
+            assert db.name == "shared"
+        finally:
+            keepalive.close()
+
+    def test_read_only(self, db: AscentDB, ascents: Ascents) -> None:
+        read_only_db = AscentDB(db._database, read_only=True)
+
+        assert read_only_db._uri is not None
+        assert read_only_db._uri.endswith("?mode=ro&immutable=1")
+
+        with read_only_db:
+            assert read_only_db.total_count() == len(ascents)
+
+            with pytest.raises(sqlite3.OperationalError, match="readonly"):
+                read_only_db.drop_where(Search())
+
+    def test_read_only_uri(self, db: AscentDB) -> None:
+        uri = db._database.resolve().as_uri()
+
+        read_only_db = AscentDB(f"{uri}?mode=ro&cache=private", read_only=True)
+        assert read_only_db._uri == f"{uri}?mode=ro&cache=private&immutable=1"
+
+        with pytest.raises(AscentDBError, match="mode=rw"):
+            AscentDB(f"{uri}?mode=rw", read_only=True)
+
+        with pytest.raises(AscentDBError, match="mode=memory"):
+            AscentDB(":memory:", read_only=True)
+
+    def test_uri_not_found(self, tmp_path: Path) -> None:
+        missing = tmp_path / "missing.db"
+
+        with pytest.raises(AscentDBError, match="not found"):
+            AscentDB(f"{missing.as_uri()}?cache=private")
+
+        assert not missing.exists()
+
+    def test_enter_error_closes(self, tmp_path: Path) -> None:
+        database = tmp_path / "dateless.db"
+        connection = sqlite3.connect(database)
+        connection.execute("CREATE TABLE ascents(route TEXT)")
+        connection.close()
+
+        db = AscentDB(database)
+
+        with pytest.raises(_init.InvalidDateStorageError):
+            db.__enter__()
+
+        with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+            db._connection.execute("SELECT 1")
+
     def test_name(self, db: AscentDB) -> None:
         assert db.name == db._database.name
 
+    def test_cache(self, db: AscentDB, ascents: Ascents) -> None:
+        cached_db = AscentDB(db._database, cache_size=2)
+        search = Search(crag="Old Crag")
+
+        assert db.cache_info() is None
+
+        with cached_db:
+            first = cached_db.ascents(search, order="grade")
+            assert cached_db.ascents(search, order="grade") == first
+            assert cached_db.ascents(Search(crag="Old Crag"), "grade") == first
+            assert cached_db.cache_info() == CacheInfo(2, 1, 2, 1)
+
+            # Writes through another connection
+            with db:
+                db.drop_ascent(ascents[5].route)
+
+            (remaining,) = cached_db.ascents(search, order="grade")
+            assert remaining == ascents[7]
+
+            # Writes through this connection
+            cached_db.drop_ascent(remaining.route)
+            assert cached_db.ascents(search, order="grade") == []
+            assert cached_db.cache_info() == CacheInfo(2, 3, 2, 1)
+
+    def test_grade_functions(self, db: AscentDB) -> None:
+        with db:
+            db._cursor.execute(
+                """
+                SELECT grade_rank('5.10a'), grade_rank('5.10+'), max_grade(grade)
+                FROM ascents
+                """
+            )
+            assert db._cursor.fetchone() == (51, None, "5.12a")
+
+            db._cursor.execute(
+                """
+                SELECT DISTINCT grade
+                FROM ascents
+                WHERE crag = 'Some Crag'
+                ORDER BY grade COLLATE YDS DESC
+                """
+            )
+            assert db._cursor.fetchall() == [("5.12a",), ("5.10a",), ("5.9",), ("5.7",)]
+
+    def test_top_k(self, db: AscentDB, ascents: Ascents) -> None:
+        with db:
+            assert db.top_k(2) == {None: [ascents[0], ascents[5]]}
+            assert db.top_k(2, "crag") == {
+                "Another Crag": [ascents[3]],
+                "New Crag": [ascents[2]],
+                "Old Crag": [ascents[5], ascents[7]],
+                "Some Crag": [ascents[0], ascents[6]],
+            }
+            assert db.top_k(1, "year") == {2022: [ascents[5]], 2023: [ascents[0]]}
+
+            with pytest.raises(AscentDBError):
+                db.top_k(0)
+
+            with pytest.raises(AscentDBError):
+                db.top_k(1, "grade")
+
+    def test_top_k_climber(self, ascents: Ascents, tmp_path: Path) -> None:
+        database = tmp_path / "climbers.db"
+        _init.init_ascent_db(database, climbers=True)
+
+        for climber, climber_ascents in (("alice", ascents[:4]), ("bob", ascents)):
+            with AscentDB(database, climber=climber) as db:
+                for ascent in climber_ascents:
+                    db.log_ascent(ascent)
+
+        with AscentDB(database, climber="alice") as db:
+            assert db.top_k(1, "crag")["Some Crag"] == [ascents[0]]
+            assert "Old Crag" not in db.top_k(1, "crag")
+
+    def test_climbers(self, ascents: Ascents, tmp_path: Path) -> None:
+        database = tmp_path / "climbers.db"
+        _init.init_ascent_db(database, climbers=True)
+
+        alice = AscentDB(database, climber="alice")
+        bob = AscentDB(database, climber="o'bob")
+
+        with alice:
+            for ascent in ascents:
+                alice.log_ascent(ascent)
+
+        with bob:
+            bob.log_ascent(ascents[0])
+            bob.update_where(Search(route=ascents[0].route.name), grade="5.13a")
+
+        with alice:
+            assert sorted(map(repr, alice.ascents())) == sorted(map(repr, ascents))
+            assert alice.drop_where(Search(crag="Some Crag")) == 4
+
+        with bob:
+            (ascent,) = bob.ascents()
+            assert ascent.route.grade == "5.13a"
+
+            bob.drop_ascent(ascent.route)
+            assert bob.is_empty()
+
+        with AscentDB(database) as everyone:
+            assert everyone.total_count() == len(ascents) - 4
+
+            with pytest.raises(AscentDBError, match="climber is required"):
+                everyone.log_ascent(ascents[0])
+
+            # Even a dry run, which would otherwise count everyone's rows
+            with pytest.raises(AscentDBError, match="climber is required"):
+                everyone.drop_where(Search(crag="Some Crag"), dry_run=True)
+
+            with pytest.raises(AscentDBError, match="climber is required"):
+                everyone.update_where(Search(), grade="5.9", dry_run=True)
+
+        assert alice.name == "climbers.db (alice)"
+
+    def test_changes_since(self, db: AscentDB, ascents: Ascents) -> None:
+        with db:
+            logged = list(db.changes_since())
+
+            assert [change.ascent for change in logged] == ascents
+            assert {change.op for change in logged} == {"insert"}
+
+            seq = logged[-1].seq
+            db.update_where(Search(route="Classic Route"), date=DATE_2022)
+            changes = db.changes_since(seq)
+
+            delete, insert = changes
+            assert delete.op == "delete" and delete.ascent == ascents[0]
+            assert insert.op == "insert" and insert.ascent.date == DATE_2022
+            assert list(db.changes_since(insert.seq)) == []
+
+    def test_changes_since_climber(self, ascents: Ascents, tmp_path: Path) -> None:
+        database = tmp_path / "climbers.db"
+        _init.init_ascent_db(database, "julian", climbers=True)
+
+        for climber, ascent in zip(["alice", "bob"], ascents):
+            with AscentDB(database, climber=climber) as db:
+                db.log_ascent(ascent)
+
+        with AscentDB(database, climber="bob") as db:
+            (change,) = db.changes_since()
+
+        assert change == Change(2, "insert", ascents[1], "bob")
+
+    def test_climber_single_climber_db(self, db: AscentDB) -> None:
+        with pytest.raises(AscentDBError, match="not a multi-climber"):
+            with AscentDB(db._database, climber="alice"):
+                pass
+
     def test_crags(self, db: AscentDB) -> None:
         with db:
             crags = db.crags()
@@ -151,6 +493,45 @@ class TestAscentDB:
             "Some Crag",
         ]
 
+    @pytest.mark.parametrize(
+        "crag,expected",
+        [
+            ("Old Crag", True),
+            ("old crag", False),
+            ("Unknown Crag", False),
+        ],
+    )
+    def test_crag_exists(self, db: AscentDB, crag: str, expected: bool) -> None:
+        with db:
+            assert db.crag_exists(crag) is expected
+
+    def test_similar_crags(self, db: AscentDB, ascents: Ascents) -> None:
+        with db:
+            assert db.similar_crags("Sum Crag") == ["Some Crag"]
+
+            index = db._name_indexes["crags"]
+            db.similar_crags("Nu Crag")
+            assert db._name_indexes["crags"] is index
+
+            # Writes through this connection
+            db.log_ascent(Ascent(Route("Route", "5.9", "Sum Crag"), DATE_2022))
+            assert db.similar_crags("Sum Crag")[0] == "Sum Crag"
+
+            # Writes through another connection
+            db.release()
+
+            with AscentDB(db._database) as other_db:
+                other_db.drop_ascent(Route("Route", "5.9", "Sum Crag"))
+
+            assert db.similar_crags("Sum Crag") == ["Some Crag"]
+
+    def test_is_empty(self, db: AscentDB, empty_db: AscentDB) -> None:
+        with db:
+            assert not db.is_empty()
+
+        with empty_db:
+            assert empty_db.is_empty()
+
     def test_log_ascent(
         self,
         db: AscentDB,
@@ -271,6 +652,234 @@ class TestAscentDB:
             (2023, "5.12a"),
         ]
 
+    def test_drop_where(self, db: AscentDB) -> None:
+        search = Search(crag="Some Crag")
+
+        with db:
+            assert db.drop_where(search, dry_run=True) == 4
+            assert db.total_count() == 8
+
+            assert db.drop_where(search) == 4
+            assert db.total_count() == 4
+            assert not db.crag_exists("Some Crag")
+
+    def test_update_where(self, db: AscentDB) -> None:
+        search = Search(crag="Old Crag")
+
+        with db:
+            assert db.update_where(search, crag="Renamed Crag", dry_run=True) == 2
+            assert db.crag_exists("Old Crag")
+
+            assert db.update_where(search, crag="Renamed Crag") == 2
+            assert not db.crag_exists("Old Crag")
+
+            assert db.ascents(Search(crag="Renamed Crag"), "grade") == [
+                Ascent(Route("Old Route", "5.11a", "Renamed Crag"), DATE_2022),
+                Ascent(Route("Last Route", "5.7", "Renamed Crag"), DATE_2023),
+            ]
+
+    def test_update_where_duplicate(self, db: AscentDB) -> None:
+        with db:
+            with pytest.raises(AscentDBError, match=r"duplicates"):
+                db.update_where(Search(grade="5.10a"), route="Same", crag="Same")
+
+            assert db.ascents(Search(route="Same")) == []
+
+    @pytest.mark.parametrize(
+        "changes,error",
+        [
+            ({}, AscentDBError),
+            ({"grade": "5.10"}, RouteError),
+            ({"date": datetime.date.today() + datetime.timedelta(days=1)}, AscentError),
+        ],
+    )
+    def test_update_where_invalid(
+        self,
+        db: AscentDB,
+        changes: dict[str, Any],
+        error: type[Exception],
+    ) -> None:
+        with db:
+            with pytest.raises(error):
+                db.update_where(Search(), **changes)
+
+    def test_find_similar(self, db: AscentDB) -> None:
+        near_duplicate = Ascent(Route("some route ", "5.7", "Some Crag"), DATE_2022)
+
+        with db:
+            db.log_ascent(near_duplicate)
+            similar = db.find_similar(Route("Some Route", "5.7", "Some Crag"))
+
+            # Only the crag probed is indexed
+            assert list(db._name_indexes) == [("routes", "Some Crag")]
+            assert db._route_index_cache is None
+
+        assert similar == [near_duplicate]
+
+    def test_duplicates(self, db: AscentDB) -> None:
+        near_duplicates = [
+            Ascent(Route("Classic  Route", "5.12a", "Some Crag"), DATE_2022),
+            Ascent(Route("Old Route", "5.11b", "Old Crag"), DATE_2023),
+        ]
+
+        with db:
+            assert db.duplicates() == []
+
+            for ascent in near_duplicates:
+                db.log_ascent(ascent)
+
+            duplicates = db.duplicates()
+
+        assert duplicates == [
+            [
+                Ascent(Route("Old Route", "5.11a", "Old Crag"), DATE_2022),
+                Ascent(Route("Old Route", "5.11b", "Old Crag"), DATE_2023),
+            ],
+            [
+                Ascent(Route("Classic  Route", "5.12a", "Some Crag"), DATE_2022),
+                Ascent(Route("Classic Route", "5.12a", "Some Crag"), DATE_2023),
+            ],
+        ]
+
+    def test_duplicates_reuses_index(self, db: AscentDB) -> None:
+        near_duplicate = Ascent(Route("Old  Route", "5.11a", "Old Crag"), DATE_2023)
+
+        with db:
+            assert db.duplicates() == []
+            indexes = db._route_indexes()
+
+            assert db._route_indexes() is indexes
+
+            db.log_ascent(near_duplicate)
+
+            assert db._route_indexes() is not indexes
+            assert len(db.duplicates()) == 1
+
+    def test_duplicates_climbers(self, tmp_path: Path) -> None:
+        database = tmp_path / "climbers.db"
+        _init.init_ascent_db(database, climbers=True)
+
+        routes = [Route("Old", "5.9", "Some Crag"), Route("New", "5.9", "Some Crag")]
+
+        for climber in ("ann", "bob"):
+            with AscentDB(database, climber=climber) as db:
+                for route in routes:
+                    db.log_ascent(Ascent(route, DATE_2022))
+
+        # The same routes logged by different climbers are not duplicates
+        with AscentDB(database) as everyone:
+            assert everyone.duplicates() == []
+            everyone.release()
+
+            with AscentDB(database, climber="bob") as bob:
+                bob.log_ascent(Ascent(Route("Old ", "5.9", "Some Crag"), DATE_2023))
+
+            (cluster,) = everyone.duplicates()
+
+        assert [ascent.route.name for ascent in cluster] == ["Old", "Old "]
+
+    @pytest.mark.parametrize(
+        "period,expected",
+        [
+            (
+                "week",
+                [
+                    (datetime.date(2022, 11, 28), 4),
+                    (datetime.date(2022, 12, 5), 0),
+                    (datetime.date(2022, 12, 12), 0),
+                    (datetime.date(2022, 12, 19), 0),
+                    (datetime.date(2022, 12, 26), 4),
+                ],
+            ),
+            (
+                "quarter",
+                [
+                    (datetime.date(2022, 10, 1), 4),
+                    (datetime.date(2023, 1, 1), 4),
+                ],
+            ),
+            (
+                "year",
+                [
+                    (datetime.date(2022, 1, 1), 4),
+                    (datetime.date(2023, 1, 1), 4),
+                ],
+            ),
+        ],
+    )
+    def test_counts_by(
+        self,
+        db: AscentDB,
+        period: str,
+        expected: list[tuple[datetime.date, int]],
+    ) -> None:
+        with db:
+            assert db.counts_by(period) == expected
+
+    def test_counts_by_day(self, db: AscentDB) -> None:
+        with db:
+            counts = db.counts_by("day")
+
+        assert len(counts) == 32
+        assert counts[0] == (DATE_2022, 4)
+        assert counts[1] == (datetime.date(2022, 12, 2), 0)
+        assert counts[-1] == (DATE_2023, 4)
+
+    def test_counts_by_empty(self, empty_db: AscentDB) -> None:
+        with empty_db:
+            assert empty_db.counts_by("month") == []
+
+    def test_max_grade_by(self, db: AscentDB) -> None:
+        with db:
+            max_grade_by_month = db.max_grade_by("month")
+
+        assert max_grade_by_month == [
+            (datetime.date(2022, 12, 1), "5.11a"),
+            (datetime.date(2023, 1, 1), "5.12a"),
+        ]
+
+    def test_max_grade_by_week(self, db: AscentDB) -> None:
+        with db:
+            max_grade_by_week = db.max_grade_by("week")
+
+        assert max_grade_by_week == [
+            (datetime.date(2022, 11, 28), "5.11a"),
+            (datetime.date(2022, 12, 5), None),
+            (datetime.date(2022, 12, 12), None),
+            (datetime.date(2022, 12, 19), None),
+            (datetime.date(2022, 12, 26), "5.12a"),
+        ]
+
+    @pytest.mark.parametrize("period", list(_models.PERIODS))
+    def test_periods_indexed(self, db: AscentDB, period: str) -> None:
+        key = _models.PERIODS[period]
+
+        with db:
+            db._cursor.execute(
+                f"""
+                EXPLAIN QUERY PLAN
+                SELECT max_grade(grade) FROM ascents GROUP BY {key} ORDER BY {key}
+                """
+            )
+            (plan,) = [row[-1] for row in db._cursor.fetchall()]
+
+        assert "USING INDEX" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_dated_grades(self, db: AscentDB, ascents: Ascents) -> None:
+        with db:
+            dated_grades = list(db.dated_grades())
+
+        assert sorted(dated_grades) == sorted(
+            (ascent.date, ascent.route.grade) for ascent in ascents
+        )
+        assert [date for date, _ in dated_grades] == [DATE_2022] * 4 + [DATE_2023] * 4
+
+    def test_invalid_period(self, db: AscentDB) -> None:
+        with db:
+            with pytest.raises(AscentDBError):
+                db.counts_by("decade")
+
     @pytest.mark.parametrize(
         "search,order,expected",
         [
@@ -331,12 +940,52 @@ class TestAscentDB:
                     Ascent(Route("Cool Route", "5.10a", "Some Crag"), DATE_2022),
                 ],
             ),
+            (
+                Search(date="2022-12-*", grade="5.1*", glob=True),
+                "grade",
+                [
+                    Ascent(Route("Old Route", "5.11a", "Old Crag"), DATE_2022),
+                    Ascent(Route("New Route", "5.10d", "New Crag"), DATE_2022),
+                    Ascent(Route("Cool Route", "5.10a", "Some Crag"), DATE_2022),
+                ],
+            ),
             (
                 # Search is still case sensitive in glob mode
                 Search(route="some route", glob=True),
                 "grade",
                 [],
             ),
+            (
+                Search(crag=["Old Crag", "New Crag"], date=[DATE_2022, "2024-01-01"]),
+                "grade",
+                [
+                    Ascent(Route("Old Route", "5.11a", "Old Crag"), DATE_2022),
+                    Ascent(Route("New Route", "5.10d", "New Crag"), DATE_2022),
+                ],
+            ),
+            (
+                Search(grade={"5.7", "5.12a"}),
+                "date",
+                [
+                    Ascent(Route("Classic Route", "5.12a", "Some Crag"), DATE_2023),
+                    Ascent(Route("Last Route", "5.7", "Old Crag"), DATE_2023),
+                    Ascent(Route("Some Route", "5.7", "Some Crag"), DATE_2023),
+                ],
+            ),
+            (
+                Search(route=["Old*", "New*"], date=["2022-*"], glob=True),
+                "grade",
+                [
+                    Ascent(Route("Old Route", "5.11a", "Old Crag"), DATE_2022),
+                    Ascent(Route("New Route", "5.10d", "New Crag"), DATE_2022),
+                ],
+            ),
+            (
+                # Empty collections match nothing
+                Search(crag=[]),
+                "grade",
+                [],
+            ),
         ],
     )
     def test_ascents(
@@ -351,6 +1000,54 @@ class TestAscentDB:
 
         assert actual == expected
 
+    def test_ascents_large_set(
+        self,
+        db: AscentDB,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        search = Search(crag=["Old Crag", "New Crag"], date=[DATE_2022, DATE_2023])
+
+        with db:
+            expected = db.ascents(search)
+
+            # Passed as JSON arrays instead
+            monkeypatch.setattr(_models, "IN_LIST_LIMIT", 1)
+            where_clause, params = db._where_clause(search)
+
+            assert "json_each" in where_clause
+            assert params["date"] == '["2022-12-01", "2023-01-01"]'
+            assert db.ascents(search) == expected
+            assert len(expected) == 3
+
+    def test_ascents_compiled_once_per_shape(self, db: AscentDB) -> None:
+        searches = [
+            Search(crag="Old Crag", grade=["5.7", "5.11a", "5.12a"]),
+            Search(grade={"5.9", "5.10a", "5.10d", "5.7"}, crag="Some Crag"),
+        ]
+
+        with db:
+            shapes = [db._compile_search(search)[0] for search in searches]
+
+            # Lists of 3 and 4 values are both padded to 4
+            assert shapes[0] == shapes[1]
+
+            _, params = db._compile_search(searches[0])
+            assert params["grade_3"] == "5.12a"
+
+            assert db.ascents(searches[0]) == [
+                Ascent(Route("Last Route", "5.7", "Old Crag"), DATE_2023),
+                Ascent(Route("Old Route", "5.11a", "Old Crag"), DATE_2022),
+            ]
+
+            hits = _models.compile_ascents_query.cache_info().hits
+            assert len(db.ascents(searches[1])) == 3
+            assert _models.compile_ascents_query.cache_info().hits == hits + 1
+
+    def test_list_size(self) -> None:
+        sizes = [_models.list_size(count) for count in (0, 1, 2, 3, 5, 64, 65)]
+
+        assert sizes == [0, 1, 2, 4, 8, 64, 65]
+
     def test_ascents_invalid_order(self, db: AscentDB) -> None:
         with db:
             with pytest.raises(AscentDBError):
@@ -0,0 +1,44 @@
+import datetime
+
+import pytest
+
+from ascents import _optimize
+from ascents._models import Route, Ascent, AscentDB, Search
+
+
+@pytest.fixture
+def dropped_db(empty_db: AscentDB) -> AscentDB:
+    with empty_db:
+        for i in range(1000):
+            route = Route(f"Route {i}", "5.9", "Some Crag")
+            empty_db.log_ascent(Ascent(route, datetime.date(2024, 1, 1)))
+
+        empty_db.drop_where(Search())
+
+    return empty_db
+
+
+def test_optimize_ascent_db(dropped_db: AscentDB) -> None:
+    report = _optimize.optimize_ascent_db(dropped_db._database)
+
+    assert [step for step, _ in report.timings] == ["analyze", "incremental vacuum"]
+    assert report.before.auto_vacuum == 2
+    assert report.before.freelist_count > 0
+    assert report.after.freelist_count == 0
+    assert report.after.size < report.before.size
+
+
+def test_optimize_ascent_db_page_size(dropped_db: AscentDB) -> None:
+    report = _optimize.optimize_ascent_db(dropped_db._database, page_size=8192)
+
+    assert [step for step, _ in report.timings] == ["analyze", "vacuum"]
+    assert report.after.page_size == 8192
+    assert report.after.freelist_count == 0
+
+    with dropped_db:
+        assert dropped_db.is_empty()
+
+
+def test_optimize_ascent_db_invalid_page_size(db: AscentDB) -> None:
+    with pytest.raises(_optimize.OptimizeError):
+        _optimize.optimize_ascent_db(db._database, page_size=1000)
@@ -0,0 +1,87 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from ascents import _profiles
+from ascents._models import AscentDB
+from ascents._profiles import ConnectionProfile, PROFILES
+
+
+@pytest.fixture
+def config() -> Path:
+    return Path(os.environ[_profiles.CONFIG_ENV_VAR])
+
+
+def test_pragmas() -> None:
+    profile = ConnectionProfile(mmap_size=1024, synchronous="OFF")
+
+    assert profile.pragmas() == [
+        "PRAGMA mmap_size = 1024",
+        "PRAGMA cache_size = -2000",
+        "PRAGMA temp_store = DEFAULT",
+        "PRAGMA synchronous = OFF",
+    ]
+
+
+@pytest.mark.parametrize(
+    "pragmas",
+    [
+        {"mmap_size": "big"},
+        {"temp_store": "memory"},
+        {"synchronous": "SOMETIMES"},
+    ],
+)
+def test_invalid_profile(pragmas: dict[str, str]) -> None:
+    with pytest.raises(_profiles.ProfileError):
+        ConnectionProfile(**pragmas)  # type: ignore[arg-type]
+
+
+class TestResolveProfile:
+    def test_default(self) -> None:
+        assert _profiles.resolve_profile() == PROFILES["safe-default"]
+
+    def test_explicit(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv(_profiles.PROFILE_ENV_VAR, "bulk-load")
+
+        assert _profiles.resolve_profile("read-analytics") == PROFILES["read-analytics"]
+
+    def test_env_var(self, monkeypatch: pytest.MonkeyPatch, config: Path) -> None:
+        monkeypatch.setenv(_profiles.PROFILE_ENV_VAR, "bulk-load")
+        config.write_text('[connection]\nprofile = "read-analytics"\n')
+
+        assert _profiles.resolve_profile() == PROFILES["bulk-load"]
+
+    def test_config(self, config: Path) -> None:
+        config.write_text(
+            '[connection]\nprofile = "read-analytics"\nsynchronous = "FULL"\n'
+        )
+
+        profile = _profiles.resolve_profile()
+
+        assert profile.mmap_size == PROFILES["read-analytics"].mmap_size
+        assert profile.synchronous == "FULL"
+
+    @pytest.mark.parametrize(
+        "contents",
+        [
+            '[connection]\nprofile = "fast"\n',
+            "[connection]\npage_size = 8192\n",
+            "[connection\n",
+        ],
+    )
+    def test_invalid(self, config: Path, contents: str) -> None:
+        config.write_text(contents)
+
+        with pytest.raises(_profiles.ProfileError):
+            _profiles.resolve_profile()
+
+
+def test_ascent_db_profile(db: AscentDB) -> None:
+    with AscentDB(db._database, profile="read-analytics") as analytics_db:
+        connection = analytics_db._connection
+
+        assert connection.execute("PRAGMA cache_size").fetchone()[0] == -65536
+        assert connection.execute("PRAGMA temp_store").fetchone()[0] == 2
+        assert connection.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert analytics_db.total_count() == 8